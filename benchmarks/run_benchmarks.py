@@ -0,0 +1,428 @@
+"""
+Offline end-to-end benchmarks for mcp-server-browser-use.
+
+Serves the fixture site in benchmarks/fixtures (plus generated long-list and paginated
+search pages) on localhost, points the server at the deterministic "scripted" LLM
+provider, and drives run_browser_agent, run_deep_research and the mcp-browser-cli entry
+point at each requested concurrency level. No network access or API keys are needed;
+only a local Playwright Chromium.
+
+Usage:
+    python benchmarks/run_benchmarks.py --concurrency 1,2,4 --output bench.json
+    python benchmarks/run_benchmarks.py --scenarios browser_agent --repeat 3 --llm-latency 0.5
+
+Each scenario/concurrency pair reports wall time, per-run latency, per-step phase
+latencies (state capture, LLM call, actions), browser launch and context creation cost,
+peak RSS of this process tree, and throughput, as JSON. The browser_launch scenario
+compares cold launches against fast-start launches from the warmed profile template.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+import psutil
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+SCENARIOS = ("browser_agent", "deep_research", "cli", "browser_launch")
+SEARCH_RESULTS_PER_PAGE = 10
+SEARCH_TOTAL_RESULTS = 45
+RSS_SAMPLE_INTERVAL = 0.1
+
+
+class FixtureHandler(SimpleHTTPRequestHandler):
+    """Static files from the fixtures directory plus generated /list, /search and /submit pages."""
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        if url.path == "/list":
+            n = int(query.get("n", ["500"])[0])
+            items = "\n".join(f'<li id="item-{i}">Item {i}: part number PN-{i:05d}</li>' for i in range(1, n + 1))
+            return self._html(f"Long list ({n} items)", f"<ol>\n{items}\n</ol>")
+        if url.path == "/search":
+            term = query.get("q", [""])[0]
+            page = int(query.get("page", ["1"])[0])
+            pages = -(-SEARCH_TOTAL_RESULTS // SEARCH_RESULTS_PER_PAGE)
+            first = (page - 1) * SEARCH_RESULTS_PER_PAGE + 1
+            last = min(first + SEARCH_RESULTS_PER_PAGE - 1, SEARCH_TOTAL_RESULTS)
+            rows = "\n".join(f'<li><a href="/list?n={i}">{term} result {i}</a></li>' for i in range(first, last + 1))
+            nav = f'<a id="next" href="/search?q={term}&page={page + 1}">Next page</a>' if page < pages else "<p>Last page</p>"
+            return self._html(f"Search: {term} (page {page} of {pages})", f"<ul>\n{rows}\n</ul>\n{nav}")
+        if url.path == "/submit":
+            fields = "\n".join(f"<dt>{k}</dt><dd>{v[0]}</dd>" for k, v in query.items())
+            return self._html("Thanks for your message", f"<dl>\n{fields}\n</dl>")
+        return super().do_GET()
+
+    def _html(self, title: str, body: str):
+        content = f"<!DOCTYPE html><html><head><title>{title}</title></head><body><h1>{title}</h1>\n{body}\n</body></html>".encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fixture_server() -> ThreadingHTTPServer:
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), partial(FixtureHandler, directory=str(FIXTURES_DIR)))
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+
+def build_script(base_url: str, llm_latency: float) -> Dict[str, Any]:
+    """Response script for the scripted LLM. Agent scripts are matched on the [bench:*] tag in each task."""
+    return {
+        "latency_seconds": llm_latency,
+        "agents": [
+            {"match": "[bench:form]", "steps": [
+                [{"go_to_url": {"url": f"{base_url}/form.html"}}],
+                [{"input_text": {"index": 0, "text": "Ada Lovelace"}}, {"input_text": {"index": 1, "text": "ada@example.com"}}],
+                [{"input_text": {"index": 3, "text": "Benchmark message"}}, {"click_element_by_index": {"index": 4}}],
+                [{"done": {"text": "Form submitted.", "success": True}}],
+            ]},
+            {"match": "[bench:list]", "steps": [
+                [{"go_to_url": {"url": f"{base_url}/list?n=500"}}],
+                [{"scroll_down": {"amount": 5000}}],
+                [{"extract_content": {"goal": "part number of item 250"}}],
+                [{"done": {"text": "PN-00250", "success": True}}],
+            ]},
+            {"match": "[bench:search]", "steps": [
+                [{"go_to_url": {"url": f"{base_url}/search?q=widget&page=1"}}],
+                [{"go_to_url": {"url": f"{base_url}/search?q=widget&page=2"}}],
+                [{"go_to_url": {"url": f"{base_url}/search?q=widget&page=3"}}],
+                [{"done": {"text": "Found widget results 1-30.", "success": True}}],
+            ]},
+            {"match": "[bench:pdf]", "steps": [
+                [{"go_to_url": {"url": f"{base_url}/report.pdf"}}],
+                [{"done": {"text": "Revenue: 1,204,000 USD", "success": True}}],
+            ]},
+        ],
+        "plan": ["Collect part numbers from the catalogue list", "Review search results for widgets"],
+        "queries": [["[bench:list] part numbers"], ["[bench:search] widget results", "[bench:pdf] quarterly revenue"]],
+        "report": "# Benchmark Report\n\nPart numbers and widget search results were collected from the fixture site.",
+    }
+
+
+BROWSER_TASKS = [
+    "[bench:form] Fill in and submit the contact form.",
+    "[bench:list] Find the part number of item 250 in the long list.",
+    "[bench:search] Collect the first three pages of widget search results.",
+    "[bench:pdf] Read the revenue figure from the quarterly report PDF.",
+]
+RESEARCH_TOPIC = "[bench:research] Catalogue part numbers and widget availability"
+
+
+def configure_environment(
+        script_path: str, work_dir: str, headless: bool, use_vision: bool, max_steps: int, request_policy: str,
+        shared_research_browser: bool) -> Dict[str, str]:
+    """Points the server settings at the scripted LLM. Must run before mcp_server_browser_use is imported."""
+    overrides = {
+        "MCP_LLM_PROVIDER": "scripted",
+        "MCP_LLM_MODEL_NAME": script_path,
+        "MCP_BROWSER_HEADLESS": str(headless).lower(),
+        "MCP_AGENT_TOOL_USE_VISION": str(use_vision).lower(),
+        "MCP_AGENT_TOOL_MAX_STEPS": str(max_steps),
+        "MCP_BROWSER_REQUEST_POLICY": request_policy,
+        "MCP_RESEARCH_TOOL_SHARED_BROWSER": str(shared_research_browser).lower(),
+        "MCP_AGENT_TOOL_HISTORY_PATH": "",
+        "MCP_RESEARCH_TOOL_SAVE_DIR": os.path.join(work_dir, "research"),
+        "MCP_SERVER_ANONYMIZED_TELEMETRY": "false",
+        "MCP_SERVER_LOGGING_LEVEL": os.environ.get("MCP_SERVER_LOGGING_LEVEL", "WARNING"),
+        "ANONYMIZED_TELEMETRY": "false",
+    }
+    os.environ.update(overrides)
+    return overrides
+
+
+class RssSampler:
+    """Tracks the peak resident memory of a process and all of its descendants (browsers included)."""
+
+    def __init__(self, pid: Optional[int] = None):
+        self.pid = pid or os.getpid()
+        self.peak_bytes = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def sample(self) -> int:
+        try:
+            root = psutil.Process(self.pid)
+            procs = [root, *root.children(recursive=True)]
+        except psutil.Error:
+            return 0
+        total = 0
+        for proc in procs:
+            try:
+                total += proc.memory_info().rss
+            except psutil.Error:
+                continue
+        self.peak_bytes = max(self.peak_bytes, total)
+        return total
+
+    async def __aenter__(self):
+        async def loop():
+            while True:
+                self.sample()
+                await asyncio.sleep(RSS_SAMPLE_INTERVAL)
+
+        self._task = asyncio.create_task(loop())
+        return self
+
+    async def __aexit__(self, *exc):
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self.sample()
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "mean": round(statistics.fmean(ordered), 4),
+        "p50": round(ordered[len(ordered) // 2], 4),
+        "p90": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.9))], 4),
+        "max": round(ordered[-1], 4),
+    }
+
+
+def histogram_summary(snapshot: Dict[str, Any], name: str, label: Optional[str] = None) -> Dict[str, Any]:
+    """Per-label (or overall) count/avg/p50/p90 from a metrics registry snapshot."""
+    series = snapshot.get(f"mcp_browser_{name}", {}).get("series", [])
+    fields = ("count", "avg", "p50", "p90", "max")
+    if label is None:
+        return {k: series[0][k] for k in fields} if series else {"count": 0}
+    return {s["labels"].get(label, ""): {k: s[k] for k in fields} for s in series}
+
+
+async def run_tool_batch(server_module, tool: str, arguments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    async def one(args: Dict[str, Any]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            content = await server_module.server_instance.call_tool(tool, args)
+            text = "".join(getattr(c, "text", "") for c in content)
+            error = text if text.startswith("Error") else None
+        except Exception as e:
+            error = str(e)
+        return {"seconds": time.perf_counter() - start, "error": error}
+
+    return await asyncio.gather(*(one(args) for args in arguments))
+
+
+async def run_cli_batch(tasks: List[str]) -> List[Dict[str, Any]]:
+    """Runs each task in its own mcp-browser-cli process, so every run pays the full cold start."""
+    command = [sys.executable, "-c", "from mcp_server_browser_use.cli import app; app()", "run-browser-agent"]
+
+    async def one(task: str) -> Dict[str, Any]:
+        start = time.perf_counter()
+        proc = await asyncio.create_subprocess_exec(
+            *command, task, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+        )
+        sampler = RssSampler(proc.pid)
+        async with sampler:
+            output, _ = await proc.communicate()
+        failed = proc.returncode != 0 or b"Error:" in output
+        return {
+            "seconds": time.perf_counter() - start,
+            "error": output.decode(errors="replace")[-500:] if failed else None,
+            "peak_rss_bytes": sampler.peak_bytes,
+        }
+
+    return await asyncio.gather(*(one(task) for task in tasks))
+
+
+async def run_launch_batch(base_url: str, count: int, fast_start: bool, template_dir: str) -> List[Dict[str, Any]]:
+    """Launches count browsers in parallel and loads the fixture index in each: launch, first page and total time."""
+    from mcp_server_browser_use._internal.browser.custom_browser import CustomBrowser, CustomBrowserConfig
+    from mcp_server_browser_use._internal.browser.custom_context import CustomBrowserContextConfig
+
+    headless = os.environ.get("MCP_BROWSER_HEADLESS", "true") == "true"
+
+    async def one() -> Dict[str, Any]:
+        browser = CustomBrowser(config=CustomBrowserConfig(headless=headless, fast_start=fast_start, profile_template_dir=template_dir))
+        context = None
+        start = time.perf_counter()
+        launch_seconds = None
+        error = None
+        try:
+            await browser.get_playwright_browser()
+            launch_seconds = time.perf_counter() - start
+            context = await browser.new_context(config=CustomBrowserContextConfig(force_new_context=True))
+            page = await context.get_current_page()
+            await page.goto(base_url)
+        except Exception as e:
+            error = str(e)
+        total_seconds = time.perf_counter() - start
+        if context:
+            await context.close()
+        await browser.close()
+        return {"seconds": total_seconds, "launch_seconds": launch_seconds, "error": error}
+
+    return await asyncio.gather(*(one() for _ in range(count)))
+
+
+async def run_launch_scenario(base_url: str, concurrency: int, repeat: int, work_dir: str) -> Dict[str, Any]:
+    """Cold (plain Playwright launch) vs warm (fast start from the profile template) browser starts."""
+    from mcp_server_browser_use._internal.browser.fast_start import get_profile_template
+
+    template_dir = os.path.join(work_dir, "profile-template")
+    template = get_profile_template(template_dir)
+    await run_launch_batch(base_url, 1, True, template_dir) # Builds the template; not counted
+    result: Dict[str, Any] = {
+        "scenario": "browser_launch",
+        "concurrency": concurrency,
+        "template_build_seconds": round(template.build_seconds, 3) if template.build_seconds else None,
+    }
+    for label, fast_start in (("cold", False), ("warm", True)):
+        runs: List[Dict[str, Any]] = []
+        sampler = RssSampler()
+        async with sampler:
+            for _ in range(repeat):
+                runs += await run_launch_batch(base_url, concurrency, fast_start, template_dir)
+        errors = [run["error"] for run in runs if run["error"]]
+        result[label] = {
+            "runs": len(runs),
+            "ok": len(runs) - len(errors),
+            "errors": errors[:5],
+            "launch_seconds": summarize([run["launch_seconds"] for run in runs if run["launch_seconds"] is not None]),
+            "first_page_seconds": summarize([run["seconds"] for run in runs if not run["error"]]),
+            "peak_rss_mb": round(sampler.peak_bytes / 2**20, 1),
+        }
+    cold, warm = result["cold"]["launch_seconds"], result["warm"]["launch_seconds"]
+    if cold.get("count") and warm.get("count"):
+        result["launch_speedup_p50"] = round(cold["p50"] / warm["p50"], 2) if warm["p50"] else None
+    return result
+
+
+async def run_scenario(server_module, metrics, scenario: str, concurrency: int, repeat: int) -> Dict[str, Any]:
+    metrics.reset()
+    runs: List[Dict[str, Any]] = []
+    sampler = RssSampler()
+    wall_start = time.perf_counter()
+    async with sampler:
+        for _ in range(repeat):
+            if scenario == "browser_agent":
+                batch = [{"task": BROWSER_TASKS[i % len(BROWSER_TASKS)]} for i in range(concurrency)]
+                runs += await run_tool_batch(server_module, "run_browser_agent", batch)
+            elif scenario == "deep_research":
+                batch = [{"research_task": RESEARCH_TOPIC} for _ in range(concurrency)]
+                runs += await run_tool_batch(server_module, "run_deep_research", batch)
+            else:
+                runs += await run_cli_batch([BROWSER_TASKS[i % len(BROWSER_TASKS)] for i in range(concurrency)])
+    wall_seconds = time.perf_counter() - wall_start
+
+    snapshot = metrics.snapshot()
+    errors = [run["error"] for run in runs if run["error"]]
+    peak_rss = max([sampler.peak_bytes] + [run.get("peak_rss_bytes", 0) for run in runs])
+    result = {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "runs": len(runs),
+        "ok": len(runs) - len(errors),
+        "errors": errors[:5],
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_runs_per_minute": round(len(runs) / wall_seconds * 60, 3) if wall_seconds else None,
+        "run_seconds": summarize([run["seconds"] for run in runs]),
+        "peak_rss_mb": round(peak_rss / 2**20, 1),
+    }
+    if scenario != "cli": # CLI runs are separate processes; their metrics never reach this registry
+        result["step_phase_seconds"] = histogram_summary(snapshot, "agent_step_phase_seconds", "phase")
+        result["browser_launch_seconds"] = histogram_summary(snapshot, "browser_launch_seconds")
+        result["context_create_seconds"] = histogram_summary(snapshot, "context_create_seconds")
+        result["llm_request_seconds"] = histogram_summary(snapshot, "llm_request_seconds", "provider")
+    if scenario == "deep_research":
+        result["research_node_seconds"] = histogram_summary(snapshot, "research_node_seconds", "node")
+    return result
+
+
+async def main_async(args) -> Dict[str, Any]:
+    httpd = start_fixture_server()
+    base_url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    work_dir = tempfile.mkdtemp(prefix="mcp-browser-bench-")
+    results = []
+    try:
+        script_path = os.path.join(work_dir, "script.json")
+        with open(script_path, "w", encoding="utf-8") as f:
+            json.dump(build_script(base_url, args.llm_latency), f, indent=2)
+        overrides = configure_environment(script_path, work_dir, not args.headful, args.vision, args.max_steps, args.request_policy,
+                                          args.shared_research_browser)
+
+        from mcp_server_browser_use import server as server_module
+        from mcp_server_browser_use._internal.utils.metrics import metrics
+
+        async with server_module.server_lifespan(server_module.server_instance):
+            for scenario in args.scenarios:
+                for concurrency in args.concurrency:
+                    print(f"Running {scenario} at concurrency {concurrency}...", file=sys.stderr)
+                    if scenario == "browser_launch":
+                        results.append(await run_launch_scenario(base_url, concurrency, args.repeat, work_dir))
+                    else:
+                        results.append(await run_scenario(server_module, metrics, scenario, concurrency, args.repeat))
+    finally:
+        httpd.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "headless": not args.headful,
+            "use_vision": args.vision,
+            "llm_latency_seconds": args.llm_latency,
+            "settings": {k: v for k, v in overrides.items() if k.startswith("MCP_") and k != "MCP_LLM_MODEL_NAME"},
+        },
+        "results": results,
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmarks for mcp-server-browser-use.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"Comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", default="1,2,4", help="Comma-separated concurrency levels.")
+    parser.add_argument("--repeat", type=int, default=1, help="Batches per scenario and concurrency level.")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Simulated seconds per LLM call.")
+    parser.add_argument("--max-steps", type=int, default=10, help="Agent step limit per run.")
+    parser.add_argument("--vision", action="store_true", help="Capture screenshots for the LLM (use_vision).")
+    parser.add_argument("--headful", action="store_true", help="Show browser windows.")
+    parser.add_argument("--request-policy", default="full", choices=("full", "vision-lite", "text-only", "auto"),
+                        help="Request interception preset for browser contexts.")
+    parser.add_argument("--shared-research-browser", action="store_true",
+                        help="Run deep research sub-agents as contexts in one shared browser.")
+    parser.add_argument("--output", help="Write the JSON results to this file instead of stdout.")
+    args = parser.parse_args(argv)
+    args.scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenario(s): {', '.join(sorted(unknown))}")
+    args.concurrency = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    return args
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    report = json.dumps(asyncio.run(main_async(args)), indent=2)
+    if args.output:
+        Path(args.output).write_text(report, encoding="utf-8")
+        print(f"Results written to {args.output}", file=sys.stderr)
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
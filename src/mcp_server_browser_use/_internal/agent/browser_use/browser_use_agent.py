@@ -59,13 +59,198 @@ from browser_use.telemetry.views import (
 from browser_use.utils import check_env_variables, time_execution_async, time_execution_sync
 from browser_use.agent.service import Agent, AgentHookFunc
 
+from ...browser.custom_context import CustomBrowserContext
+from ...browser.stable_ids import StableElementIds
+from ...utils.step_timings import StepTiming, StepTimings, bind_step, current_step, record_saved, step_phase
+from .dom_diff import DomDiffMessageManager, diff_message_manager
+from .history_compaction import HistoryCompactor
+from .trajectory_cache import Trajectory
+
 load_dotenv()
 logger = logging.getLogger(__name__)
 
 SKIP_LLM_API_KEY_VERIFICATION = os.environ.get('SKIP_LLM_API_KEY_VERIFICATION', 'false').lower()[0] in 'ty1'
 
+UNCHANGED_SCREENSHOT_NOTE = '\n[Screenshot omitted: the page looks the same as in the previous screenshot.]'
+
 
 class BrowserUseAgent(Agent):
+    def __init__(
+            self, *args, pipelined: bool = False, dom_diff: bool = False, dom_diff_max_change: float = 0.3,
+            history_token_budget: Optional[int] = None, history_keep_steps: int = 4,
+            compaction_llm: Optional[BaseChatModel] = None, **kwargs
+    ):
+        super().__init__(*args, **kwargs)
+        self._unpaused = asyncio.Event() # Set unless paused; stop() sets it too so a paused run can exit
+        self._unpaused.set()
+        self._step_task: Optional[asyncio.Task] = None
+        self.trajectory: Optional[Trajectory] = None # Cached steps replayed before the LLM takes over
+        # Pipelined steps overlap state capture and defer the progress hooks and trace checkpoint until the next LLM call
+        self.pipelined = pipelined
+        if isinstance(self.browser_context, CustomBrowserContext):
+            self.browser_context.pipelined_state = pipelined # Pooled contexts keep the attribute between runs
+        self.step_timings = StepTimings()
+        self._bookkeeping: Optional[asyncio.Task] = None
+        # DOM diff mode: element changes against a page snapshot kept in the conversation, with stable element indices
+        self.dom_diff = dom_diff
+        self.diff_manager: Optional[DomDiffMessageManager] = None # The same object as _message_manager, typed for its stats
+        if dom_diff:
+            self._message_manager = self.diff_manager = diff_message_manager(self._message_manager, dom_diff_max_change)
+            if self.memory:
+                self.memory.message_manager = self._message_manager
+        if isinstance(self.browser_context, CustomBrowserContext):
+            self.browser_context.element_ids = StableElementIds() if dom_diff else None
+        # Older steps are summarized (by compaction_llm if given) once the history nears the budget
+        self.compactor: Optional[HistoryCompactor] = None
+        if history_token_budget:
+            self.compactor = HistoryCompactor(compaction_llm or self.llm, history_token_budget, history_keep_steps)
+
+    def pause(self) -> None:
+        """Pauses the agent before its next LLM call or action (the base class also prints to stdout, the MCP transport)."""
+        logger.info('⏸️ Agent paused')
+        self.state.paused = True
+        self._unpaused.clear()
+
+    def resume(self) -> None:
+        logger.info('▶️ Agent resumed')
+        self.state.paused = False
+        self._unpaused.set()
+
+    def stop(self) -> None:
+        """Stops the agent, cancelling its in-flight step: the pending LLM request and Playwright call are abandoned."""
+        logger.info('⏹️ Agent stopping')
+        self.state.stopped = True
+        self._unpaused.set()
+        if self._step_task and not self._step_task.done():
+            self._step_task.cancel()
+
+    def _resume_after_interrupt(self) -> None:
+        super().resume() # Ctrl+C also killed the browser, which the base class relaunches
+        self._unpaused.set()
+
+    async def _next_step(self, step_info: AgentStepInfo, timing: StepTiming) -> None:
+        bind_step(timing) # Runs as its own task, so the binding ends with the step
+        if self.compactor:
+            self.compactor.start(self._message_manager) # Summarizes while the step captures the page
+        if not (self.trajectory and self.trajectory.active and await self._replay_step(step_info, self.trajectory)):
+            await self.step(step_info)
+
+    async def _replay_step(self, step_info: AgentStepInfo, trajectory: Trajectory) -> bool:
+        """Executes the next recorded step without asking the LLM; False once the page no longer matches the recording."""
+        recorded = trajectory.next_step()
+        if recorded is None or recorded.model_output is None:
+            return False
+        step_start_time = time.time()
+        state = await self.browser_context.get_state(cache_clickable_elements_hashes=True)
+        if not trajectory.same_site(recorded, state.url):
+            trajectory.diverge(f'now on {state.url}')
+            return False
+
+        model_output = recorded.model_output.model_copy(deep=True)
+        actions = []
+        for i, action in enumerate(model_output.action):
+            element = recorded.state.interacted_element[i] if i < len(recorded.state.interacted_element) else None
+            action = await self._update_action_indices(element, action, state) # Re-resolved via HistoryTreeProcessor
+            if action is None:
+                trajectory.diverge(f'element for action {i + 1} not found')
+                return False
+            actions.append(type(action).model_validate(trajectory.substitute(action.model_dump(exclude_none=True))))
+        model_output.action = actions
+
+        # Leave the conversation as if the LLM had chosen these actions, so it can take over at any step
+        self._message_manager.add_state_message(state, self.state.last_result, step_info, self.settings.use_vision)
+        tokens = self._message_manager.state.history.current_tokens
+        self._message_manager._remove_last_state_message()
+        self._message_manager.add_model_output(model_output)
+        await self._flush_bookkeeping()
+        if self.compactor:
+            await self.compactor.apply(self._message_manager, wait=False) # No LLM call to get ready for
+        self.state.n_steps += 1
+        if self.register_new_step_callback:
+            if inspect.iscoroutinefunction(self.register_new_step_callback):
+                await self.register_new_step_callback(state, model_output, self.state.n_steps)
+            else:
+                self.register_new_step_callback(state, model_output, self.state.n_steps)
+
+        logger.info(f'🔁 Replaying cached step {trajectory.position + 1}/{len(trajectory.steps)}')
+        result = await self.multi_act(actions)
+        self.state.last_result = result
+        trajectory.advance()
+        if any(r.error for r in result):
+            trajectory.diverge('a replayed action failed') # The LLM sees the error in its next state message
+        else:
+            self.state.consecutive_failures = 0
+        self._make_history_item(model_output, state, result, StepMetadata(
+            step_number=self.state.n_steps,
+            step_start_time=step_start_time,
+            step_end_time=time.time(),
+            input_tokens=tokens,
+        ))
+        return True
+
+    def _present_screenshot(self, input_messages: list[BaseMessage]):
+        """Fixes the state message's image for the screenshot pipeline: its real MIME type, or a note instead of a duplicate."""
+        frame = getattr(getattr(self.browser_context, 'screenshots', None), 'last_frame', None)
+        if frame is None or not input_messages or not isinstance(input_messages[-1].content, list):
+            return
+        message = input_messages[-1]
+        content = []
+        for part in message.content:
+            if isinstance(part, dict) and part.get('type') == 'image_url':
+                if frame.duplicate:
+                    continue
+                url = part['image_url']['url'].replace('data:image/png;', f'data:{frame.mime_type};', 1)
+                part = {**part, 'image_url': {**part['image_url'], 'url': url}}
+            elif frame.duplicate and isinstance(part, dict) and part.get('type') == 'text':
+                part = {**part, 'text': part['text'] + UNCHANGED_SCREENSHOT_NOTE}
+            content.append(part)
+        message.content = content
+
+    async def _step_bookkeeping(self, previous: Optional[asyncio.Task], hook: Awaitable[None]) -> float:
+        """Runs a step hook after the previous bookkeeping; returns the seconds spent in both."""
+        spent = await previous if previous else 0.0
+        start = time.perf_counter()
+        async with step_phase('bookkeeping'):
+            await hook
+        return spent + time.perf_counter() - start
+
+    async def _end_of_step(self, on_step_end: AgentHookFunc | None) -> None:
+        if on_step_end is not None:
+            await on_step_end(self)
+        if tracer := getattr(self.browser_context, 'tracer', None):
+            await tracer.checkpoint()
+
+    async def _flush_bookkeeping(self) -> None:
+        """Waits for deferred hooks before the step's model output exists, so they see the state they were queued for."""
+        task, self._bookkeeping = self._bookkeeping, None
+        if task is None:
+            return
+        start = time.perf_counter()
+        try:
+            spent = await task
+        except Exception as e:
+            logger.warning(f'Step hook failed: {e}')
+            return
+        if timing := current_step():
+            timing.add('bookkeeping', spent)
+        record_saved(spent - (time.perf_counter() - start)) # Only the part that overlapped this step's state capture
+
+    async def get_next_action(self, input_messages: list[BaseMessage]) -> AgentOutput:
+        self._present_screenshot(input_messages)
+        await self._flush_bookkeeping()
+        if self.compactor and await self.compactor.apply(self._message_manager):
+            input_messages = self._message_manager.get_messages()
+        async with step_phase('llm'):
+            return await super().get_next_action(input_messages)
+
+    async def multi_act(
+            self,
+            actions: list[ActionModel],
+            check_for_new_elements: bool = True,
+    ) -> list[ActionResult]:
+        async with step_phase('actions'):
+            return await super().multi_act(actions, check_for_new_elements)
+
     @time_execution_async('--run (agent)')
     async def run(
             self, max_steps: int = 100, on_step_start: AgentHookFunc | None = None,
@@ -81,7 +266,7 @@ class BrowserUseAgent(Agent):
         signal_handler = SignalHandler(
             loop=loop,
             pause_callback=self.pause,
-            resume_callback=self.resume,
+            resume_callback=self._resume_after_interrupt,
             custom_exit_callback=None,  # No special cleanup needed on forced exit
             exit_on_second_int=True,
         )
@@ -104,11 +289,8 @@ class BrowserUseAgent(Agent):
                 self.state.last_result = result
 
             for step in range(max_steps):
-                # Check if waiting for user input after Ctrl+C
-                while self.state.paused:
-                    await asyncio.sleep(0.5)
-                    if self.state.stopped:
-                        break
+                # Returns at once unless paused; resume() and stop() wake it
+                await self._unpaused.wait()
 
                 # Check if we should stop due to too many failures
                 if self.state.consecutive_failures >= self.settings.max_failures:
@@ -120,19 +302,34 @@ class BrowserUseAgent(Agent):
                     logger.info('Agent stopped')
                     break
 
-                while self.state.paused:
-                    await asyncio.sleep(0.2)  # Small delay to prevent CPU spinning
-                    if self.state.stopped:  # Allow stopping while paused
-                        break
-
+                timing = self.step_timings.begin(self.state.n_steps)
+                step_start = time.perf_counter()
                 if on_step_start is not None:
-                    await on_step_start(self)
+                    if self.pipelined:
+                        self._bookkeeping = asyncio.create_task(self._step_bookkeeping(self._bookkeeping, on_step_start(self)))
+                    else:
+                        timing.add('bookkeeping', await self._step_bookkeeping(None, on_step_start(self)))
 
                 step_info = AgentStepInfo(step_number=step, max_steps=max_steps)
-                await self.step(step_info)
+                # A task of its own, so stop() can cancel the step without cancelling the run
+                self._step_task = asyncio.create_task(self._next_step(step_info, timing))
+                try:
+                    await self._step_task
+                except (InterruptedError, asyncio.CancelledError):
+                    run_task = asyncio.current_task()
+                    if not self.state.stopped or (run_task is not None and run_task.cancelling()):
+                        raise
+                finally:
+                    self._step_task = None
+                if self.state.stopped:
+                    logger.info('Agent stopped')
+                    break
 
-                if on_step_end is not None:
-                    await on_step_end(self)
+                if self.pipelined:
+                    self._bookkeeping = asyncio.create_task(self._step_bookkeeping(self._bookkeeping, self._end_of_step(on_step_end)))
+                else:
+                    timing.add('bookkeeping', await self._step_bookkeeping(None, self._end_of_step(on_step_end)))
+                timing.wall = time.perf_counter() - step_start
 
                 if self.state.history.is_done():
                     if self.settings.validate_output and step < max_steps - 1:
@@ -155,6 +352,23 @@ class BrowserUseAgent(Agent):
             # Unregister signal handlers before cleanup
             signal_handler.unregister()
 
+            if self.compactor:
+                self.compactor.cancel()
+
+            if self._bookkeeping:
+                # The last step's hooks and trace checkpoint, which nothing is left to overlap with
+                start = time.perf_counter()
+                [spent] = await asyncio.gather(self._bookkeeping, return_exceptions=True)
+                self._bookkeeping = None
+                if self.step_timings.steps and isinstance(spent, float):
+                    self.step_timings.steps[-1].add('bookkeeping', spent)
+                    self.step_timings.steps[-1].wall += time.perf_counter() - start
+
+            if tracer := getattr(self.browser_context, 'tracer', None):
+                # Errors, max_steps and max_failures all end the run without a successful done action
+                history = self.state.history
+                await tracer.finish(failed=not history.is_done() or history.is_successful() is False)
+
             self.telemetry.capture(
                 AgentEndTelemetryEvent(
                     agent_id=self.state.agent_id,
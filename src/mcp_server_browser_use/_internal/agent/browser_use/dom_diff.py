@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import dataclasses
+import logging
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from browser_use.agent.message_manager.service import MessageManager
+from browser_use.agent.message_manager.views import ManagedMessage
+from browser_use.agent.views import ActionResult, AgentStepInfo
+from browser_use.browser.views import BrowserState
+from langchain_core.messages import HumanMessage
+
+from ...utils.metrics import DOM_DIFF_TOKENS_SAVED, DOM_STATES
+
+logger = logging.getLogger(__name__)
+
+ELEMENT_LINE = re.compile(r"^\t*\*?\[(\d+)\]\*?<")
+NEW_MARKER = re.compile(r"^(\t*)\*\[(\d+)\]\*")
+
+
+def element_blocks(elements_text: str) -> Dict[Optional[int], str]:
+    """Splits an element listing into one block per index: its line plus the page text that follows it."""
+    blocks: Dict[Optional[int], List[str]] = {}
+    index: Optional[int] = None
+    for line in elements_text.split("\n"):
+        line = NEW_MARKER.sub(r"\1[\2]", line) # "New since last step" markers would show up as changes
+        match = ELEMENT_LINE.match(line)
+        if match:
+            index = int(match.group(1))
+        blocks.setdefault(index, []).append(line)
+    return {index: "\n".join(lines) for index, lines in blocks.items()}
+
+
+@dataclass
+class PageSnapshot:
+    """The full element listing the agent last received, kept in its conversation so later states can be diffs."""
+    step: int
+    url: str
+    blocks: Dict[Optional[int], str]
+    message: Optional[ManagedMessage] = None
+
+
+@dataclass
+class DomDiffStats:
+    full_states: int = 0
+    diff_states: int = 0
+    element_tokens_full: int = 0 # Element listings as full states every step would have sent them
+    element_tokens_sent: int = 0 # Snapshots and diffs actually sent
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "full_states": self.full_states,
+            "diff_states": self.diff_states,
+            "element_tokens_full": self.element_tokens_full,
+            "element_tokens_sent": self.element_tokens_sent,
+            "tokens_saved": self.element_tokens_full - self.element_tokens_sent,
+        }
+
+
+class _RenderedElements:
+    """Stands in for the element tree in AgentMessagePrompt, which only asks it for its listing."""
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def clickable_elements_to_string(self, include_attributes: Optional[List[str]] = None) -> str:
+        return self.text
+
+
+class DomDiffMessageManager(MessageManager):
+    """
+    A MessageManager that sends the page's interactive elements as diffs.
+
+    State messages are dropped from the conversation after each step, so a diff against
+    the previous step would point at elements the LLM no longer sees. Instead, a full
+    listing is kept in the conversation as a page snapshot, and later state messages only
+    list elements added, removed or changed since that snapshot; indices stay valid because
+    the browser context keeps them stable (StableElementIds). A new snapshot replaces the
+    old one after navigation or once more than max_change of the listing has changed.
+
+    Every call still carries the snapshot, but it sits in the unchanging prefix of the
+    conversation that provider prompt caches serve, while a full listing at the end of the
+    prompt is new input every step. The stats count element listing tokens both ways.
+    """
+
+    def __init__(self, *args, max_change: float = 0.3, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_change = max_change
+        self.snapshot: Optional[PageSnapshot] = None
+        self._pending: Optional[PageSnapshot] = None # Sent in the current state message, kept once the step is over
+        self.stats = DomDiffStats()
+
+    def add_state_message(
+            self,
+            state: BrowserState,
+            result: Optional[List[ActionResult]] = None,
+            step_info: Optional[AgentStepInfo] = None,
+            use_vision=True,
+    ) -> None:
+        elements_text = state.element_tree.clickable_elements_to_string(include_attributes=self.settings.include_attributes)
+        blocks = element_blocks(elements_text)
+        step = step_info.step_number + 1 if step_info else self.stats.full_states + self.stats.diff_states + 1
+        diff = self._diff(state.url, blocks)
+        full_tokens = self._count_text_tokens(elements_text)
+        if diff is None:
+            self._drop_snapshot() # Superseded by this full state
+            self._pending = PageSnapshot(step, state.url, blocks)
+            sent_tokens = full_tokens
+            self.stats.full_states += 1
+            DOM_STATES.inc(kind="full")
+        else:
+            self._pending = None
+            elements_text = diff
+            sent_tokens = self._count_text_tokens(diff)
+            self.stats.diff_states += 1
+            DOM_STATES.inc(kind="diff")
+        self.stats.element_tokens_full += full_tokens
+        self.stats.element_tokens_sent += sent_tokens
+        DOM_DIFF_TOKENS_SAVED.inc(max(0, full_tokens - sent_tokens))
+        super().add_state_message(dataclasses.replace(state, element_tree=_RenderedElements(elements_text)), result, step_info, use_vision)
+
+    def _diff(self, url: str, blocks: Dict[Optional[int], str]) -> Optional[str]:
+        """The listing of what changed since the snapshot, or None when a full state should be sent."""
+        snapshot = self.snapshot
+        if snapshot is None or url != snapshot.url or not snapshot.blocks:
+            return None
+        added = [blocks[index] for index in blocks if index is not None and index not in snapshot.blocks]
+        removed = [index for index in snapshot.blocks if index is not None and index not in blocks]
+        changed = [
+            blocks[index] for index in blocks
+            if index is not None and index in snapshot.blocks and blocks[index] != snapshot.blocks[index]
+        ]
+        if blocks.get(None, "") != snapshot.blocks.get(None, ""): # Page text before the first element
+            changed.insert(0, blocks.get(None) or "(no text before the first element)")
+        if len(added) + len(removed) + len(changed) > self.max_change * len(snapshot.blocks):
+            return None
+        if not (added or removed or changed):
+            return f"No changes since the page snapshot of step {snapshot.step}; its elements and indices are current."
+        lines = [f"Changes since the page snapshot of step {snapshot.step}; all other elements there are unchanged:"]
+        if added:
+            lines += ["Added:"] + added
+        if changed:
+            lines += ["Changed (now):"] + changed
+        if removed:
+            lines.append("Removed: " + ", ".join(f"[{index}]" for index in sorted(removed)))
+        return "\n".join(lines)
+
+    def _remove_last_state_message(self) -> None:
+        super()._remove_last_state_message()
+        if self._pending is None:
+            return
+        # The full listing the LLM just saw becomes the snapshot later states are diffed against
+        snapshot, self._pending = self._pending, None
+        self._drop_snapshot()
+        elements = "\n".join(block for block in snapshot.blocks.values())
+        self._add_message_with_tokens(
+            HumanMessage(content=f"Page snapshot of step {snapshot.step} ({snapshot.url}); "
+                                 f"later states only list element changes against it:\n{elements}"),
+            message_type="page_snapshot",
+        )
+        snapshot.message = self.state.history.messages[-1]
+        self.snapshot = snapshot
+
+    def _drop_snapshot(self):
+        snapshot, self.snapshot = self.snapshot, None
+        if snapshot is None or snapshot.message is None:
+            return
+        messages = self.state.history.messages
+        for i, managed in enumerate(messages):
+            if managed is snapshot.message: # Gone already if history was condensed
+                self.state.history.current_tokens -= managed.metadata.tokens
+                messages.pop(i)
+                break
+
+
+def diff_message_manager(manager: MessageManager, max_change: float) -> DomDiffMessageManager:
+    """A DomDiffMessageManager taking over manager's task, system prompt, settings and conversation."""
+    return DomDiffMessageManager(
+        task=manager.task,
+        system_message=manager.system_prompt,
+        settings=manager.settings,
+        state=manager.state,
+        max_change=max_change,
+    )
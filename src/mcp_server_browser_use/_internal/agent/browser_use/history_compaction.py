@@ -0,0 +1,278 @@
+import asyncio
+import json
+import logging
+import re
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from browser_use.agent.message_manager.service import MessageManager
+from browser_use.agent.message_manager.views import ManagedMessage, MessageMetadata
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+from ...utils.metrics import HISTORY_COMPACTIONS, HISTORY_TOKENS_COMPACTED
+from ...utils.step_timings import record_saved, step_phase
+
+logger = logging.getLogger(__name__)
+
+COMPACT_AT = 0.8 # Fraction of the budget at which compaction starts, leaving room for the state message
+MEMORY_TYPE = "memory" # Also the type browser-use's procedural memory keeps, so either can fold the other's blocks
+PINNED_TYPES = {"init", "page_snapshot"}
+HISTORY_START = "[Your task history memory starts here]"
+NEW_TASK_PREFIX = "Your new ultimate task is"
+FACT_PREFIX = "Action result: "
+MEMORY_HEADER = "Memory of the task so far: steps before the last {keep} were summarized to save context."
+FACT_SECTION = re.compile(r"^\W*facts\b", re.IGNORECASE)
+OTHER_SECTION = re.compile(r"^\W*(progress|failed attempts)\b", re.IGNORECASE)
+# Values a summary must not lose: URLs, e-mail addresses and numbers (prices, dates, counts, IDs)
+SALIENT = re.compile(r"https?://[^\s)\]>\"']+|[\w.+-]+@[\w-]+(?:\.[\w-]+)+|\d+(?:[.,:/-]\d+)*")
+
+COMPACTION_PROMPT = """You compact the history of a browser automation agent so it can continue its task with a shorter context.
+You receive its earlier memory blocks, the steps it took (its evaluation, memory, next goal and actions) and the results its actions extracted.
+Write a memory block for the agent with these sections:
+Progress: what has been done so far and where the agent is now, in order.
+Facts: every piece of information found or extracted that may be needed for the task.
+Copy values exactly: names, numbers, prices, dates, URLs, e-mail addresses. Never drop a fact, only shorten its wording.
+Failed attempts: approaches that did not work, so they are not repeated.
+Write plain text, at most {words} words. Do not add anything that is not in the history."""
+
+
+def _text(message: BaseMessage) -> str:
+    if isinstance(message.content, str):
+        return message.content
+    return "\n".join(part["text"] for part in message.content if isinstance(part, dict) and "text" in part)
+
+
+def _pinned(managed: ManagedMessage) -> bool:
+    """Messages compaction never touches: the prompt, the task, and DOM diff mode's page snapshot."""
+    if managed.metadata.message_type in PINNED_TYPES:
+        return True
+    text = _text(managed.message) if isinstance(managed.message, HumanMessage) else ""
+    return text == HISTORY_START or text.startswith(NEW_TASK_PREFIX)
+
+
+def _ends_step(messages: List[ManagedMessage], i: int) -> bool:
+    """True for the (empty) tool message that follows a step's model output."""
+    if i == 0 or not isinstance(messages[i].message, ToolMessage):
+        return False
+    previous = messages[i - 1].message
+    return isinstance(previous, AIMessage) and bool(previous.tool_calls)
+
+
+def completed_steps(messages: List[ManagedMessage]) -> List[List[ManagedMessage]]:
+    """The unpinned messages of each completed step: its action results, plan, model output and tool message."""
+    steps: List[List[ManagedMessage]] = []
+    current: List[ManagedMessage] = []
+    for i, managed in enumerate(messages):
+        if _pinned(managed):
+            continue
+        current.append(managed)
+        if _ends_step(messages, i):
+            steps.append(current)
+            current = []
+    return steps # Messages after the last model output belong to the step in progress
+
+
+def render(messages: List[ManagedMessage]) -> str:
+    """The compacted messages as text for the summary model."""
+    lines = []
+    for managed in messages:
+        message = managed.message
+        if managed.metadata.message_type == MEMORY_TYPE:
+            lines.append(f"Earlier memory:\n{_text(message)}")
+        elif isinstance(message, AIMessage) and message.tool_calls:
+            args = message.tool_calls[0]["args"]
+            state = args.get("current_state", {})
+            lines.append(
+                f"Step: evaluation: {state.get('evaluation_previous_goal', '')} | memory: {state.get('memory', '')} | "
+                f"next goal: {state.get('next_goal', '')} | actions: {json.dumps(args.get('action', []))}")
+        elif isinstance(message, ToolMessage):
+            continue
+        elif isinstance(message, AIMessage):
+            lines.append(f"Plan: {_text(message)}")
+        else:
+            lines.append(_text(message))
+    return "\n".join(line for line in lines if line.strip())
+
+
+def _fact_section(memory: str) -> str:
+    """The Facts sections of a memory block written by the compactor."""
+    lines, inside = [], False
+    for line in memory.split("\n"):
+        if FACT_SECTION.match(line):
+            inside = True
+        elif OTHER_SECTION.match(line):
+            inside = False
+        if inside:
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def facts(messages: List[ManagedMessage]) -> List[str]:
+    """What the compacted steps extracted, plus the facts of earlier memory blocks."""
+    found = []
+    for managed in messages:
+        text = _text(managed.message)
+        if managed.metadata.message_type == MEMORY_TYPE:
+            found.append(_fact_section(text))
+        elif isinstance(managed.message, HumanMessage) and text.startswith(FACT_PREFIX):
+            found.append(text[len(FACT_PREFIX):])
+    return found
+
+
+def missing_fact_lines(summary: str, fact_texts: List[str]) -> List[str]:
+    """Lines of the facts with a URL, address or number the summary does not contain."""
+    missing = []
+    for text in fact_texts:
+        for line in text.split("\n"):
+            line = line.strip().removeprefix("- ") # Carried over from an earlier block's verbatim list
+            if any(value not in summary for value in SALIENT.findall(line)) and line not in missing:
+                missing.append(line)
+    return missing
+
+
+@dataclass
+class CompactionStats:
+    compactions: int = 0
+    fallbacks: int = 0 # The summary model failed; the block was built from the agent's own memory and the facts
+    discarded: int = 0 # The history changed while the summary was being written
+    steps_compacted: int = 0
+    tokens_removed: int = 0 # Net of the memory blocks that replaced them
+    facts_restored: int = 0 # Fact lines the summary dropped a value from, appended verbatim
+    peak_history_tokens: int = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "compactions": self.compactions,
+            "fallbacks": self.fallbacks,
+            "discarded": self.discarded,
+            "steps_compacted": self.steps_compacted,
+            "tokens_removed": self.tokens_removed,
+            "facts_restored": self.facts_restored,
+            "peak_history_tokens": self.peak_history_tokens,
+        }
+
+
+@dataclass
+class _Pending:
+    messages: List[ManagedMessage]
+    steps: int
+    task: "asyncio.Task[Optional[str]]"
+    started: float
+    finished: Optional[float] = None
+
+    def __post_init__(self):
+        self.task.add_done_callback(lambda _: setattr(self, "finished", time.perf_counter()))
+
+
+class HistoryCompactor:
+    """
+    Keeps an agent's message history under a token budget by summarizing older steps.
+
+    browser-use re-sends the whole conversation every step, and max_input_tokens only cuts
+    the state message once the history has outgrown it. Once the history passes COMPACT_AT
+    of token_budget, every completed step but the last keep_steps is summarized, together
+    with earlier memory blocks, into one memory block by llm (ideally a cheaper model than
+    the agent's). The summary is written while the step captures the page state and is
+    spliced in before the step's LLM call. Extracted facts survive: any fact line whose URL,
+    address or number is missing from the summary is appended to the block verbatim.
+    """
+
+    def __init__(self, llm: BaseChatModel, token_budget: int, keep_steps: int = 4):
+        self.llm = llm
+        self.token_budget = token_budget
+        self.keep_steps = max(1, keep_steps)
+        self.summary_tokens = max(200, token_budget // 8)
+        self.stats = CompactionStats()
+        self._pending: Optional[_Pending] = None
+
+    def start(self, manager: MessageManager) -> None:
+        """Starts summarizing older steps in the background if the history is near the budget."""
+        history = manager.state.history
+        self.stats.peak_history_tokens = max(self.stats.peak_history_tokens, history.current_tokens)
+        if self._pending is not None or history.current_tokens <= COMPACT_AT * self.token_budget:
+            return
+        steps = completed_steps(history.messages)[:-self.keep_steps]
+        if len(steps) < 2:
+            return # Nothing to gain; the recent steps alone are over the budget
+        messages = [managed for step in steps for managed in step]
+        self._pending = _Pending(messages, len(steps), asyncio.create_task(self._summarize(messages)), time.perf_counter())
+
+    async def apply(self, manager: MessageManager, wait: bool = True) -> bool:
+        """Replaces the summarized steps with their memory block; returns whether the history changed."""
+        pending = self._pending
+        if pending is None or (not wait and not pending.task.done()):
+            return False
+        self._pending = None
+        waiting = time.perf_counter()
+        summary = await pending.task
+        record_saved(min(waiting, pending.finished or waiting) - pending.started) # The part that overlapped the step
+        history = manager.state.history
+        ids = {id(managed) for managed in pending.messages}
+        positions = [i for i, managed in enumerate(history.messages) if id(managed) in ids]
+        if len(positions) != len(pending.messages):
+            self.stats.discarded += 1 # e.g. rewritten by procedural memory meanwhile
+            HISTORY_COMPACTIONS.inc(result="discarded")
+            return False
+
+        fallback = summary is None
+        fact_texts = facts(pending.messages)
+        if fallback:
+            summary = self._fallback_summary(pending.messages)
+        restored = missing_fact_lines(summary, fact_texts)
+        content = f"{MEMORY_HEADER.format(keep=self.keep_steps)}\n{summary}"
+        if restored:
+            content += "\nFacts kept verbatim:\n" + "\n".join(f"- {line}" for line in restored)
+        message = manager._filter_sensitive_data(HumanMessage(content=content))
+        block = ManagedMessage(message=message, metadata=MessageMetadata(tokens=manager._count_tokens(message), message_type=MEMORY_TYPE))
+        removed = sum(managed.metadata.tokens for managed in pending.messages)
+        if block.metadata.tokens >= removed:
+            self.stats.discarded += 1
+            HISTORY_COMPACTIONS.inc(result="discarded")
+            return False
+
+        kept = [managed for managed in history.messages if id(managed) not in ids]
+        kept.insert(positions[0], block) # Where the oldest summarized step was, so pinned messages keep their order
+        history.messages[:] = kept
+        history.current_tokens += block.metadata.tokens - removed
+        self.stats.compactions += 1
+        self.stats.fallbacks += fallback
+        self.stats.steps_compacted += pending.steps
+        self.stats.tokens_removed += removed - block.metadata.tokens
+        self.stats.facts_restored += len(restored)
+        HISTORY_COMPACTIONS.inc(result="fallback" if fallback else "summarized")
+        HISTORY_TOKENS_COMPACTED.inc(removed - block.metadata.tokens)
+        logger.info(f"Compacted {pending.steps} steps of history: {removed} -> {block.metadata.tokens} tokens "
+                    f"({len(restored)} fact lines kept verbatim), history now {history.current_tokens} tokens.")
+        return True
+
+    def cancel(self) -> None:
+        if self._pending is not None:
+            self._pending.task.cancel()
+            self._pending = None
+
+    async def _summarize(self, messages: List[ManagedMessage]) -> Optional[str]:
+        prompt = [
+            SystemMessage(content=COMPACTION_PROMPT.format(words=self.summary_tokens // 2)),
+            HumanMessage(content=render(messages)),
+        ]
+        try:
+            async with step_phase("compaction"):
+                response = await self.llm.ainvoke(prompt)
+        except Exception as e:
+            logger.warning(f"History summary failed, compacting without it: {e}")
+            return None
+        return _text(response).strip() or None
+
+    def _fallback_summary(self, messages: List[ManagedMessage]) -> str:
+        """The agent's own running memory from the last compacted step, and every fact verbatim."""
+        parts = []
+        outputs = [managed.message for managed in messages if isinstance(managed.message, AIMessage) and managed.message.tool_calls]
+        if outputs:
+            state = outputs[-1].tool_calls[0]["args"].get("current_state", {})
+            parts.append(f"Progress: {state.get('memory', '')}")
+        fact_texts = [text for text in facts(messages) if text]
+        if fact_texts:
+            parts.append("Facts:\n" + "\n".join(text.removeprefix("Facts:\n") for text in fact_texts))
+        return "\n".join(parts)
@@ -0,0 +1,263 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple, Type
+from urllib.parse import urlsplit
+
+from browser_use.agent.views import AgentHistory, AgentHistoryList, AgentOutput
+
+from ...utils.metrics import LLM_CALLS_SAVED, TRAJECTORY_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TRAJECTORY_DIR = os.path.join(os.path.expanduser("~"), ".cache", "mcp-server-browser-use", "trajectories")
+
+# Task parameters, in the order they are replaced by "{}" to form the template
+PARAMETER_PATTERN = re.compile(
+    r"(?P<url>https?://\S+?)(?=[\s,;)]|\.?$|\.\s)"
+    r"|(?P<email>[\w.+-]+@[\w-]+(?:\.[\w-]+)+)"
+    r"|\"(?P<double>[^\"]+)\"|“(?P<curly>[^”]+)”|'(?P<single>[^']+)'"
+    r"|(?P<number>(?<![\w.])\d+(?:[.,:/-]\d+)*(?![\w]))"
+)
+DOMAIN_PATTERN = re.compile(r"\b((?:[a-z0-9-]+\.)+[a-z]{2,})\b", re.IGNORECASE)
+NUMBER_PATTERN = re.compile(r"\d+(?:[.,:/-]\d+)*")
+URL_PATTERN = re.compile(r"https?://\S+")
+
+
+def task_template(task: str) -> Tuple[str, List[str]]:
+    """Splits a task into a template and its parameters: URLs, e-mail addresses, quoted strings and numbers."""
+    params: List[str] = []
+
+    def replace(match: re.Match) -> str:
+        params.append(next(value for value in match.groupdict().values() if value is not None))
+        return "{}"
+
+    template = PARAMETER_PATTERN.sub(replace, task.strip())
+    return re.sub(r"\s+", " ", template).lower(), params
+
+
+def start_domain(task: str) -> str:
+    """The domain a task starts on: its first URL, else the first domain name it mentions."""
+    for match in PARAMETER_PATTERN.finditer(task):
+        if match.group("url"):
+            return (urlsplit(match.group("url")).hostname or "").removeprefix("www.")
+    for match in DOMAIN_PATTERN.finditer(task):
+        if "@" not in task[max(0, match.start() - 1):match.start()]:
+            return match.group(1).lower().removeprefix("www.")
+    return ""
+
+
+def replace_values(text: str, substitutions: List[Tuple[str, str]]) -> str:
+    """Replaces whole values only: an old value inside a longer word or number (e.g. "2" in "1234") is left alone."""
+    if not substitutions:
+        return text
+    mapping = dict(substitutions)
+    alternatives = "|".join(re.escape(old) for old, _ in substitutions) # Longest first, so the longest match wins
+    return re.sub(rf"(?<![\w.])(?:{alternatives})(?!\w|\.\w)", lambda match: mapping[match.group(0)], text)
+
+
+def _host(url: Optional[str]) -> str:
+    return (urlsplit(url or "").hostname or "").removeprefix("www.")
+
+
+@dataclass
+class Trajectory:
+    """A recorded action sequence being replayed in a new run, with the old run's parameters mapped to the new ones."""
+    key: str
+    steps: List[AgentHistory]
+    substitutions: List[Tuple[str, str]] = field(default_factory=list) # (recorded value, new value), longest first
+    position: int = 0
+    diverged_at: Optional[int] = None
+    divergence: Optional[str] = None
+
+    @property
+    def active(self) -> bool:
+        return self.diverged_at is None and self.position < len(self.steps)
+
+    @property
+    def replayed(self) -> int:
+        return self.position if self.diverged_at is None else self.diverged_at
+
+    def next_step(self) -> Optional[AgentHistory]:
+        return self.steps[self.position] if self.active else None
+
+    def advance(self):
+        self.position += 1
+
+    def diverge(self, reason: str):
+        self.diverged_at = self.position
+        self.divergence = reason
+        logger.info(f"Trajectory replay diverged at step {self.position + 1}/{len(self.steps)} ({reason}); continuing with the LLM.")
+
+    def same_site(self, recorded: AgentHistory, current_url: str) -> bool:
+        return _host(recorded.state.url) == _host(current_url) or not recorded.state.url.startswith("http")
+
+    def substitute(self, value: Any) -> Any:
+        """Applies the parameter mapping to every string inside an action's parameters; numbers are not swapped inside URLs."""
+        if isinstance(value, str):
+            in_urls = [(old, new) for old, new in self.substitutions if not NUMBER_PATTERN.fullmatch(old)]
+            parts, position = [], 0
+            for match in URL_PATTERN.finditer(value):
+                parts.append(replace_values(value[position:match.start()], self.substitutions))
+                parts.append(replace_values(match.group(0), in_urls))
+                position = match.end()
+            parts.append(replace_values(value[position:], self.substitutions))
+            return "".join(parts)
+        if isinstance(value, dict):
+            return {k: self.substitute(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self.substitute(v) for v in value]
+        return value
+
+
+@dataclass
+class TrajectoryCacheStats:
+    lookups: int = 0
+    hits: int = 0
+    recorded: int = 0
+    replayed_steps: int = 0 # Steps executed from a trajectory, i.e. LLM calls saved
+    divergences: int = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.lookups, 3) if self.lookups else None,
+            "recorded": self.recorded,
+            "llm_calls_saved": self.replayed_steps,
+            "divergences": self.divergences,
+        }
+
+
+class TrajectoryCache:
+    """
+    Successful agent trajectories on disk, keyed by task template and start domain.
+
+    A task like 'Search "usb cable" on amazon.com and give me the 3 cheapest' is stored
+    under the template 'search {} on amazon.com and give me the {} cheapest'; a later
+    task with other quoted strings, numbers or URLs in the same places replays the
+    recorded actions with those values swapped in. Only steps without errors are kept,
+    and the final done step never is, since its answer belongs to the old run.
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_entries: int = 500):
+        self.directory = directory or DEFAULT_TRAJECTORY_DIR
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.stats = TrajectoryCacheStats()
+
+    @staticmethod
+    def key_for(task: str) -> str:
+        template, _ = task_template(task)
+        return f"{start_domain(task)}|{template}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(key.encode()).hexdigest()[:32] + ".json")
+
+    def lookup(self, task: str, output_model: Type[AgentOutput]) -> Optional[Trajectory]:
+        """The trajectory recorded for this task's template, prepared for replay with this task's parameters."""
+        key = self.key_for(task)
+        self.stats.lookups += 1
+        entry = self._read(self._path(key))
+        _, params = task_template(task)
+        steps = None
+        if entry and entry.get("key") == key and len(entry.get("params", [])) == len(params):
+            try:
+                steps = self._load_steps(entry["history"], output_model)
+            except Exception as e:
+                logger.warning(f"Ignoring cached trajectory for '{key}': {e}") # e.g. recorded with other controller actions
+        if entry is None or not steps:
+            TRAJECTORY_LOOKUPS.inc(result="miss")
+            return None
+        self.stats.hits += 1
+        TRAJECTORY_LOOKUPS.inc(result="hit")
+        substitutions = sorted(
+            ((old, new) for old, new in zip(entry["params"], params) if old != new), key=lambda pair: len(pair[0]), reverse=True)
+        logger.info(f"Replaying cached trajectory for '{key}' ({len(steps)} steps).")
+        return Trajectory(key=key, steps=steps, substitutions=substitutions)
+
+    @staticmethod
+    def _load_steps(history: List[Dict[str, Any]], output_model: Type[AgentOutput]) -> List[AgentHistory]:
+        for item in history: # Same enrichment as AgentHistoryList.load_from_file
+            item["model_output"] = output_model.model_validate(item["model_output"])
+            item["state"].setdefault("interacted_element", None)
+        return AgentHistoryList.model_validate({"history": history}).history
+
+    def record(self, task: str, history: AgentHistoryList) -> bool:
+        """Stores the replayable steps of a successful run; returns whether anything was stored."""
+        if not history.is_successful():
+            return False
+        steps = []
+        for item in history.history:
+            if not item.model_output or any(result.is_done for result in item.result):
+                continue
+            if any(result.error for result in item.result):
+                continue # Replaying a failed step reproduces the failure
+            dump = item.model_dump()
+            dump["state"]["screenshot"] = None
+            steps.append(dump)
+        if not steps:
+            return False
+        key = self.key_for(task)
+        _, params = task_template(task)
+        self._write(self._path(key), {"key": key, "params": params, "recorded_at": time.time(), "history": steps})
+        self.stats.recorded += 1
+        logger.info(f"Recorded trajectory for '{key}' ({len(steps)} steps).")
+        return True
+
+    def record_replay(self, trajectory: Trajectory):
+        self.stats.replayed_steps += trajectory.replayed
+        LLM_CALLS_SAVED.inc(trajectory.replayed)
+        if trajectory.diverged_at is not None:
+            self.stats.divergences += 1
+
+    def _read(self, path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read trajectory {path}: {e}")
+            return None
+
+    def _write(self, path: str, entry: Dict[str, Any]):
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp, path)
+            self._evict()
+
+    def _evict(self):
+        """Drops the oldest trajectories beyond max_entries."""
+        try:
+            paths = [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith(".json")]
+        except OSError:
+            return
+        if len(paths) <= self.max_entries:
+            return
+        paths.sort(key=lambda path: os.stat(path).st_mtime)
+        for path in paths[:len(paths) - self.max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+_caches: Dict[str, TrajectoryCache] = {}
+
+
+def get_trajectory_cache(directory: Optional[str] = None, max_entries: int = 500) -> TrajectoryCache:
+    """Process-wide cache per directory, so hit-rate stats cover every run."""
+    key = os.path.abspath(directory or DEFAULT_TRAJECTORY_DIR)
+    if key not in _caches:
+        _caches[key] = TrajectoryCache(key, max_entries)
+    return _caches[key]
@@ -5,7 +5,7 @@ import os
 import pdb
 import uuid
 from pathlib import Path
-from typing import List, Dict, Any, TypedDict, Optional, Sequence, Annotated
+from typing import List, Dict, Any, TypedDict, Optional, Sequence, Annotated, Awaitable, Callable, Union
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
 
@@ -20,29 +20,70 @@ from langchain_openai import ChatOpenAI  # Replace with your actual LLM import
 from pydantic import BaseModel, Field
 import operator
 
-from browser_use.browser.browser import BrowserConfig
 from browser_use.browser.context import BrowserContextWindowSize
 
 # Langgraph imports
 from langgraph.graph import StateGraph, END
 from ...controller.custom_controller import CustomController
 from ...utils import llm_provider
-from ...browser.custom_browser import CustomBrowser
+from ...browser.custom_browser import CustomBrowser, CustomBrowserConfig
 from ...browser.custom_context import CustomBrowserContext, CustomBrowserContextConfig
+from ...browser.request_filter import resolve_request_policy
+from ...browser.cdp_fleet import CdpFleet
+from ...browser.shared_browser import SharedBrowser
 from ...agent.browser_use.browser_use_agent import BrowserUseAgent
-from ...utils.mcp_client import setup_mcp_client_and_tools
+from ...utils.agent_registry import get_agent_registry
+from ...utils.mcp_client import get_mcp_session_manager
+from ...utils.metrics import RESEARCH_NODE_SECONDS
 
 logger = logging.getLogger(__name__)
 
+# Where sub-agents lease their contexts when they do not launch a browser each
+ContextSource = Union[SharedBrowser, CdpFleet]
+
 # Constants
 REPORT_FILENAME = "report.md"
 PLAN_FILENAME = "research_plan.md"
 SEARCH_INFO_FILENAME = "search_info.json"
+# browser_config keys passed through to each sub-agent's CustomBrowserContextConfig
+CONTEXT_CONFIG_PREFIXES = ("response_cache_", "storage_state", "trace_mode", "trace_sample", "trace_ring", "screenshot_")
 
 _AGENT_STOP_FLAGS = {}
 _BROWSER_AGENT_INSTANCES = {}
 
 
+def build_sub_agent_browser_config(browser_config: Dict[str, Any]) -> CustomBrowserConfig:
+    """CustomBrowserConfig for sub-agent browsers, from the deep research browser_config dict."""
+    window_w = browser_config.get("window_width", 1280)
+    window_h = browser_config.get("window_height", 1100)
+    browser_user_data_dir = browser_config.get("user_data_dir", None)
+    use_own_browser = browser_config.get("use_own_browser", False)
+    browser_binary_path = browser_config.get("browser_binary_path", None)
+
+    extra_args = [f"--window-size={window_w},{window_h}"]
+    if browser_user_data_dir:
+        extra_args.append(f"--user-data-dir={browser_user_data_dir}")
+    if use_own_browser:
+        browser_binary_path = os.getenv("CHROME_PATH", None) or browser_binary_path
+        if browser_binary_path == "": browser_binary_path = None
+        chrome_user_data = os.getenv("CHROME_USER_DATA", None)
+        if chrome_user_data: extra_args += [f"--user-data-dir={chrome_user_data}"]
+    else:
+        browser_binary_path = None
+
+    return CustomBrowserConfig(
+        headless=browser_config.get("headless", False),
+        disable_security=browser_config.get("disable_security", False),
+        browser_binary_path=browser_binary_path,
+        extra_browser_args=extra_args,
+        wss_url=browser_config.get("wss_url", None),
+        cdp_url=browser_config.get("cdp_url", None),
+        fast_start=browser_config.get("fast_start", False),
+        profile_template_dir=browser_config.get("profile_template_dir", None),
+        debugging_port_range=browser_config.get("debugging_port_range", None),
+    )
+
+
 async def run_single_browser_task(
         task_query: str,
         task_id: str,
@@ -50,61 +91,47 @@ async def run_single_browser_task(
         browser_config: Dict[str, Any],
         stop_event: threading.Event,
         use_vision: bool = False,
+        shared_browser: Optional[ContextSource] = None,
 ) -> Dict[str, Any]:
     """
     Runs a single BrowserUseAgent task.
-    Manages browser creation and closing for this specific task.
+    Manages browser creation and closing for this specific task, or leases a context from
+    shared_browser when the run shares one browser (or a CDP fleet) between its sub-agents.
     """
     if not BrowserUseAgent:
         return {"query": task_query, "error": "BrowserUseAgent components not available."}
 
     # --- Browser Setup ---
     # These should ideally come from the main agent's config
-    headless = browser_config.get("headless", False)
     window_w = browser_config.get("window_width", 1280)
     window_h = browser_config.get("window_height", 1100)
-    browser_user_data_dir = browser_config.get("user_data_dir", None)
-    use_own_browser = browser_config.get("use_own_browser", False)
-    browser_binary_path = browser_config.get("browser_binary_path", None)
-    wss_url = browser_config.get("wss_url", None)
-    cdp_url = browser_config.get("cdp_url", None)
-    disable_security = browser_config.get("disable_security", False)
     save_downloads_path = browser_config.get("save_downloads_path", None)
     trace_path = browser_config.get("trace_path", None)
+    request_policy = resolve_request_policy(browser_config.get("request_policy", "full"), use_vision)
 
-    bu_browser = None
+    bu_browser: Optional[CustomBrowser] = None # Only set when this task launches its own browser
     bu_browser_context = None
+    task_key = None
     try:
         logger.info(f"Starting browser task for query: {task_query}")
-        extra_args = [f"--window-size={window_w},{window_h}"]
-        if browser_user_data_dir:
-            extra_args.append(f"--user-data-dir={browser_user_data_dir}")
-        if use_own_browser:
-            browser_binary_path = os.getenv("CHROME_PATH", None) or browser_binary_path
-            if browser_binary_path == "": browser_binary_path = None
-            chrome_user_data = os.getenv("CHROME_USER_DATA", None)
-            if chrome_user_data: extra_args += [f"--user-data-dir={chrome_user_data}"]
-        else:
-            browser_binary_path = None
-
-        bu_browser = CustomBrowser(
-            config=BrowserConfig(
-                headless=headless,
-                disable_security=disable_security,
-                browser_binary_path=browser_binary_path,
-                extra_browser_args=extra_args,
-                wss_url=wss_url,
-                cdp_url=cdp_url,
-            )
-        )
-
         context_config = CustomBrowserContextConfig(
             save_downloads_path=save_downloads_path,
             trace_path=trace_path,
             browser_window_size=BrowserContextWindowSize(width=window_w, height=window_h),
-            force_new_context=True
+            force_new_context=True,
+            request_policy=request_policy,
+            blocked_domains=browser_config.get("blocked_domains", []),
+            max_resource_bytes=browser_config.get("max_resource_bytes", None),
+            **{
+                key: value for key, value in browser_config.items()
+                if key.startswith(CONTEXT_CONFIG_PREFIXES)
+            },
         )
-        bu_browser_context = await bu_browser.new_context(config=context_config)
+        if shared_browser:
+            bu_browser_context = await shared_browser.new_context(context_config)
+        else:
+            bu_browser = CustomBrowser(config=build_sub_agent_browser_config(browser_config))
+            bu_browser_context = await bu_browser.new_context(config=context_config)
 
         # Simple controller example, replace with your actual implementation if needed
         bu_controller = CustomController()
@@ -122,18 +149,28 @@ async def run_single_browser_task(
         PDF cannot directly extract _content, please try to download first, then using read_file, if you can't save or read, please try other methods.
         """
 
+        compaction_llm_config = browser_config.get("compaction_llm_config", None)
+        compaction_llm = llm_provider.get_llm_model(**compaction_llm_config) if compaction_llm_config else None
+
         bu_agent_instance = BrowserUseAgent(
             task=bu_task_prompt,
             llm=llm,  # Use the passed LLM
-            browser=bu_browser,
+            browser=bu_browser_context.browser,
             browser_context=bu_browser_context,
             controller=bu_controller,
             use_vision=use_vision,
+            pipelined=browser_config.get("pipelined_steps", False),
+            dom_diff=browser_config.get("dom_diff", False),
+            dom_diff_max_change=browser_config.get("dom_diff_max_change", 0.3),
+            history_token_budget=browser_config.get("history_token_budget", None),
+            history_keep_steps=browser_config.get("history_keep_steps", 4),
+            compaction_llm=compaction_llm,
         )
 
-        # Store instance for potential stop() call
+        # Store instance for potential stop() call; the registry also lets list_agents/stop_agent reach it
         task_key = f"{task_id}_{uuid.uuid4()}"
         _BROWSER_AGENT_INSTANCES[task_key] = bu_agent_instance
+        get_agent_registry().register(task_key, "research_subagent", task_query, bu_agent_instance)
 
         # --- Run with Stop Check ---
         # BrowserUseAgent needs to internally check a stop signal or have a stop method.
@@ -152,7 +189,7 @@ async def run_single_browser_task(
 
         final_data = result.final_result()
 
-        if stop_event.is_set():
+        if stop_event.is_set() or bu_agent_instance.state.stopped: # Whole research stopped, or this sub-agent via stop_agent
             logger.info(f"Browser task for '{task_query}' stopped during execution.")
             return {"query": task_query, "result": final_data, "status": "stopped"}
         else:
@@ -165,12 +202,15 @@ async def run_single_browser_task(
     finally:
         if bu_browser_context:
             try:
-                await bu_browser_context.close()
+                if shared_browser:
+                    await shared_browser.close_context(bu_browser_context)
+                else:
+                    await bu_browser_context.close()
                 bu_browser_context = None
                 logger.info("Closed browser context.")
             except Exception as e:
                 logger.error(f"Error closing browser context: {e}")
-        if bu_browser:
+        if bu_browser: # The shared browser outlives its sub-agents
             try:
                 await bu_browser._close_without_httpxclients()
                 bu_browser = None
@@ -178,8 +218,10 @@ async def run_single_browser_task(
             except Exception as e:
                 logger.error(f"Error closing browser: {e}")
 
-        if task_key in _BROWSER_AGENT_INSTANCES:
+        if task_key and task_key in _BROWSER_AGENT_INSTANCES:
             del _BROWSER_AGENT_INSTANCES[task_key]
+        if task_key:
+            get_agent_registry().unregister(task_key)
 
 
 class BrowserSearchInput(BaseModel):
@@ -193,7 +235,8 @@ async def _run_browser_search_tool(
         llm: Any,  # Injected dependency
         browser_config: Dict[str, Any],
         stop_event: threading.Event,
-        max_parallel_browsers: int = 1
+        max_parallel_browsers: int = 1,
+        shared_browser: Optional[ContextSource] = None,
 ) -> List[Dict[str, Any]]:
     """
     Internal function to execute parallel browser searches based on LLM-provided queries.
@@ -218,8 +261,9 @@ async def _run_browser_search_tool(
                 task_id,
                 llm,  # Pass the main LLM (or a dedicated one if needed)
                 browser_config,
-                stop_event
+                stop_event,
                 # use_vision could be added here if needed
+                shared_browser=shared_browser,
             )
 
     tasks = [task_wrapper(query) for query in queries]
@@ -247,6 +291,7 @@ def create_browser_search_tool(
         task_id: str,
         stop_event: threading.Event,
         max_parallel_browsers: int = 1,
+        shared_browser: Optional[ContextSource] = None,
 ) -> StructuredTool:
     """Factory function to create the browser search tool with necessary dependencies."""
     # Use partial to bind the dependencies that aren't part of the LLM call arguments
@@ -257,7 +302,8 @@ def create_browser_search_tool(
         llm=llm,
         browser_config=browser_config,
         stop_event=stop_event,
-        max_parallel_browsers=max_parallel_browsers
+        max_parallel_browsers=max_parallel_browsers,
+        shared_browser=shared_browser,
     )
 
     return StructuredTool.from_function(
@@ -295,12 +341,27 @@ class DeepResearchState(TypedDict):
     stop_requested: bool  # Flag to signal termination
     # Add other state variables as needed
     error_message: Optional[str]  # To store errors
+    progress_callback: Optional[Callable[[Dict[str, Any]], Awaitable[None]]]  # Receives progress events, if set
 
     messages: List[BaseMessage]
 
 
 # --- Langgraph Nodes ---
 
+PROGRESS_PREVIEW_CHARS = 500
+
+
+async def _report_progress(state: DeepResearchState, event: str, **data):
+    """Sends a progress event to the run's progress_callback. Failures are logged and never break the graph."""
+    callback = state.get('progress_callback')
+    if not callback:
+        return
+    payload = {"task_id": state.get('task_id'), "event": event, "total_steps": len(state.get('research_plan') or []), **data}
+    try:
+        await callback(payload)
+    except Exception as e:
+        logger.debug(f"Progress callback failed for event '{event}': {e}")
+
 def _load_previous_state(task_id: str, output_dir: str) -> Dict[str, Any]:
     """Loads state from files if they exist."""
     state_updates = {}
@@ -397,6 +458,8 @@ async def planning_node(state: DeepResearchState) -> Dict[str, Any]:
         # based on existing_results, but for now, we just use the loaded plan.
         if output_dir:
             _save_plan_to_md(existing_plan, output_dir)  # Ensure it's saved initially if output_dir exists
+        await _report_progress(state, "plan_ready", plan=[item['task'] for item in existing_plan],
+                               completed_steps=state['current_step_index'])
         return {"research_plan": existing_plan}  # Return the loaded plan
 
     logger.info(f"Generating new research plan for topic: {topic}")
@@ -445,6 +508,8 @@ async def planning_node(state: DeepResearchState) -> Dict[str, Any]:
         logger.info(f"Generated research plan with {len(new_plan)} steps.")
         if output_dir:
             _save_plan_to_md(new_plan, output_dir)
+        await _report_progress(state, "plan_ready", plan=[item['task'] for item in new_plan],
+                               completed_steps=0, total_steps=len(new_plan))
 
         return {
             "research_plan": new_plan,
@@ -486,6 +551,8 @@ async def research_execution_node(state: DeepResearchState) -> Dict[str, Any]:
         return {"current_step_index": current_index + 1}  # Move to next step
 
     logger.info(f"Executing research step {current_step['step']}: {current_step['task']}")
+    await _report_progress(state, "step_start", step=current_step['step'], task=current_step['task'],
+                           completed_steps=current_index)
 
     # Bind tools to the LLM for this call
     llm_with_tools = llm.bind_tools(tools)
@@ -510,6 +577,7 @@ async def research_execution_node(state: DeepResearchState) -> Dict[str, Any]:
 
         tool_results = []
         executed_tool_names = []
+        step_search_results = []
 
         if not isinstance(ai_response, AIMessage) or not ai_response.tool_calls:
             # LLM didn't call a tool. Maybe it answered directly? Or failed?
@@ -568,6 +636,7 @@ async def research_execution_node(state: DeepResearchState) -> Dict[str, Any]:
                 current_search_results = state.get('search_results', [])
                 if browser_tool_called:  # Specific handling for browser tool output
                     current_search_results.extend(tool_output)
+                    step_search_results.extend(tool_output)
                 else:  # Handle other tool outputs (e.g., file tools return strings)
                     # Store it associated with the step? Or a generic log?
                     # Let's just log it for now. Need better handling for diverse tool outputs.
@@ -610,6 +679,16 @@ async def research_execution_node(state: DeepResearchState) -> Dict[str, Any]:
             _save_plan_to_md(plan, output_dir)
             _save_search_results_to_json(current_search_results, output_dir)
 
+        await _report_progress(
+            state, "step_end", step=current_step['step'], task=current_step['task'], status=current_step['status'],
+            completed_steps=current_index + 1,
+            results=[{
+                "query": r.get("query"),
+                "status": r.get("status"),
+                "result": str(r.get("result") or r.get("error") or "")[:PROGRESS_PREVIEW_CHARS],
+            } for r in step_search_results if isinstance(r, dict)],
+        )
+
         return {
             "research_plan": plan,
             "search_results": current_search_results,  # Update with new results
@@ -652,6 +731,7 @@ async def synthesis_node(state: DeepResearchState) -> Dict[str, Any]:
         return {"final_report": report}
 
     logger.info(f"Synthesizing report from {len(search_results)} collected search result entries.")
+    await _report_progress(state, "synthesis_start", completed_steps=len(plan), result_count=len(search_results))
 
     # Prepare context for the LLM
     # Format search results nicely, maybe group by query or original plan step
@@ -730,6 +810,8 @@ async def synthesis_node(state: DeepResearchState) -> Dict[str, Any]:
         logger.info("Successfully synthesized the final report.")
         if output_dir:
             _save_report_to_md(final_report_md, output_dir)
+        await _report_progress(state, "report_ready", completed_steps=len(plan),
+                               report_preview=final_report_md[:PROGRESS_PREVIEW_CHARS])
         return {"final_report": final_report_md}
 
     except Exception as e:
@@ -737,6 +819,16 @@ async def synthesis_node(state: DeepResearchState) -> Dict[str, Any]:
         return {"error_message": f"LLM Error during synthesis: {e}"}
 
 
+def timed_node(name: str, node: Callable[[DeepResearchState], Awaitable[Dict[str, Any]]]):
+    """Wraps a graph node so each execution is recorded in research_node_seconds."""
+
+    async def wrapper(state: DeepResearchState) -> Dict[str, Any]:
+        async with RESEARCH_NODE_SECONDS.time_async(node=name):
+            return await node(state)
+
+    return wrapper
+
+
 # --- Langgraph Edges and Conditional Logic ---
 
 def should_continue(state: DeepResearchState) -> str:
@@ -770,7 +862,13 @@ def should_continue(state: DeepResearchState) -> str:
 # --- DeepSearchAgent Class ---
 
 class DeepResearchAgent:
-    def __init__(self, llm: Any, browser_config: Dict[str, Any], mcp_server_config: Optional[Dict[str, Any]] = None):
+    def __init__(
+            self,
+            llm: Any,
+            browser_config: Dict[str, Any],
+            mcp_server_config: Optional[Dict[str, Any]] = None,
+            browser_fleet: Optional[CdpFleet] = None,
+    ):
         """
         Initializes the DeepSearchAgent.
 
@@ -779,9 +877,12 @@ class DeepResearchAgent:
             browser_config: Configuration dictionary for the BrowserUseAgent tool.
                             Example: {"headless": True, "window_width": 1280, ...}
             mcp_server_config: Optional configuration for the MCP client.
+            browser_fleet: Optional CDP fleet owned by the caller; sub-agents are placed on its
+                           least-loaded endpoint instead of launching browsers.
         """
         self.llm = llm
         self.browser_config = browser_config
+        self.browser_fleet = browser_fleet
         self.mcp_server_config = mcp_server_config
         self.mcp_client = None
         self.stopped = False
@@ -789,6 +890,7 @@ class DeepResearchAgent:
         self.current_task_id: Optional[str] = None
         self.stop_event: Optional[threading.Event] = None
         self.runner: Optional[asyncio.Task] = None  # To hold the asyncio task for run
+        self.shared_browser: Optional[ContextSource] = None  # One browser or fleet for all sub-agents of a run, if enabled
 
     async def _setup_tools(self, task_id: str, stop_event: threading.Event, max_parallel_browsers: int = 1) -> List[
         Tool]:
@@ -799,7 +901,8 @@ class DeepResearchAgent:
             browser_config=self.browser_config,
             task_id=task_id,
             stop_event=stop_event,
-            max_parallel_browsers=max_parallel_browsers
+            max_parallel_browsers=max_parallel_browsers,
+            shared_browser=self.shared_browser,
         )
         tools += [browser_use_tool]
         # Add MCP tools if config is provided
@@ -807,7 +910,7 @@ class DeepResearchAgent:
             try:
                 logger.info("Setting up MCP client and tools...")
                 if not self.mcp_client:
-                    self.mcp_client = await setup_mcp_client_and_tools(self.mcp_server_config)
+                    self.mcp_client = await get_mcp_session_manager(self.mcp_server_config)
                 mcp_tools = self.mcp_client.get_tools()
                 logger.info(f"Loaded {len(mcp_tools)} MCP tools.")
                 tools.extend(mcp_tools)
@@ -819,18 +922,17 @@ class DeepResearchAgent:
         return tools_map.values()
 
     async def close_mcp_client(self):
-        if self.mcp_client:
-            await self.mcp_client.__aexit__(None, None, None)
-            self.mcp_client = None
+        # Sessions are shared process-wide; just drop our reference
+        self.mcp_client = None
 
     def _compile_graph(self) -> StateGraph:
         """Compiles the Langgraph state machine."""
         workflow = StateGraph(DeepResearchState)
 
         # Add nodes
-        workflow.add_node("plan_research", planning_node)
-        workflow.add_node("execute_research", research_execution_node)
-        workflow.add_node("synthesize_report", synthesis_node)
+        workflow.add_node("plan_research", timed_node("plan_research", planning_node))
+        workflow.add_node("execute_research", timed_node("execute_research", research_execution_node))
+        workflow.add_node("synthesize_report", timed_node("synthesize_report", synthesis_node))
         workflow.add_node("end_run", lambda state: logger.info("--- Reached End Run Node ---") or {})  # Simple end node
 
         # Define edges
@@ -854,7 +956,8 @@ class DeepResearchAgent:
         app = workflow.compile()
         return app
 
-    async def run(self, topic: str, save_dir: Optional[str] = None, task_id: Optional[str] = None, max_parallel_browsers: int = 1) -> Dict[
+    async def run(self, topic: str, save_dir: Optional[str] = None, task_id: Optional[str] = None, max_parallel_browsers: int = 1,
+                  progress_callback: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None) -> Dict[
         str, Any]:
         """
         Starts the deep research process.
@@ -864,6 +967,7 @@ class DeepResearchAgent:
             save_dir: Optional directory to save outputs for this task. If None, operates in memory-only mode.
             task_id: Optional existing task ID to resume. If None, a new ID is generated.
             max_parallel_browsers: Max parallel browsers for the search tool.
+            progress_callback: Optional async callable receiving progress events (plan, step start/end, report).
 
         Returns:
              A dictionary containing the final status, message, task_id, and final_state.
@@ -886,6 +990,20 @@ class DeepResearchAgent:
 
         self.stop_event = threading.Event()
         _AGENT_STOP_FLAGS[self.current_task_id] = self.stop_event
+        if self.browser_fleet:
+            self.shared_browser = self.browser_fleet # Owned by the caller, so it outlives this run
+        elif self.browser_config.get("cdp_urls"):
+            self.shared_browser = CdpFleet(
+                self.browser_config["cdp_urls"],
+                max_contexts_per_endpoint=self.browser_config.get("fleet_max_contexts", None),
+                probe_interval=self.browser_config.get("fleet_probe_interval", 30.0),
+            )
+            await self.shared_browser.start()
+        elif self.browser_config.get("shared_browser"):
+            self.shared_browser = SharedBrowser(
+                build_sub_agent_browser_config(self.browser_config),
+                max_tab_restarts=self.browser_config.get("max_tab_restarts", 2),
+            )
         agent_tools = await self._setup_tools(self.current_task_id, self.stop_event, max_parallel_browsers)
         initial_state: DeepResearchState = {
             "task_id": self.current_task_id,
@@ -901,6 +1019,7 @@ class DeepResearchAgent:
             "current_step_index": 0,
             "stop_requested": False,
             "error_message": None,
+            "progress_callback": progress_callback,
         }
 
         loaded_state = {}
@@ -964,8 +1083,14 @@ class DeepResearchAgent:
             self.stop_event = None
             self.current_task_id = None
             self.runner = None  # Mark runner as finished
-            if self.mcp_client:
-                await self.mcp_client.__aexit__(None, None, None)
+            await self.close_mcp_client()
+            if self.shared_browser and self.shared_browser is not self.browser_fleet:
+                logger.info(f"Closing shared research browser ({self.shared_browser.stats()})")
+                try:
+                    await self.shared_browser.close()
+                except Exception as e:
+                    logger.error(f"Error closing shared research browser: {e}")
+            self.shared_browser = None
 
             # Construct result with report_file_path if available
             result = {
@@ -994,8 +1119,7 @@ class DeepResearchAgent:
             agent_instance = _BROWSER_AGENT_INSTANCES.get(key)
             try:
                 if agent_instance:
-                    # Assuming BU agent has an async stop method
-                    await agent_instance.stop()
+                    agent_instance.stop() # Cancels its in-flight step; run_single_browser_task then releases the context
                     logger.info(f"Called stop() on browser agent instance {key}")
             except Exception as e:
                 logger.error(f"Error calling stop() on browser agent instance {key}: {e}")
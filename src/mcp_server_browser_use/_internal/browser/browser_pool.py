@@ -0,0 +1,507 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+from urllib.parse import urlsplit
+
+from browser_use.browser.browser import BrowserConfig
+
+from ..utils.metrics import QUEUE_WAIT_SECONDS
+from .custom_browser import CustomBrowser
+from .custom_context import CustomBrowserContext, CustomBrowserContextConfig
+from .process_supervisor import get_process_supervisor
+from .storage_state import snapshot_cookies
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class WaitStats:
+    """Running summary of how long callers waited to acquire a slot, mirrored to queue_wait_seconds{stage} when stage is set."""
+    stage: Optional[str] = None
+    count: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+    last_seconds: float = 0.0
+
+    def record(self, seconds: float):
+        self.count += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.last_seconds = seconds
+        if self.stage:
+            QUEUE_WAIT_SECONDS.observe(seconds, stage=self.stage)
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "avg_seconds": self.total_seconds / self.count if self.count else 0.0,
+            "max_seconds": self.max_seconds,
+            "last_seconds": self.last_seconds,
+        }
+
+
+@dataclass
+class PooledBrowser:
+    """A browser owned by the pool plus the bookkeeping needed to recycle it."""
+    browser: CustomBrowser
+    created_at: float = field(default_factory=time.monotonic)
+    last_used_at: float = field(default_factory=time.monotonic)
+    uses: int = 0
+
+
+class BrowserPool:
+    """
+    Keeps a set of pre-launched browsers that callers lease one at a time.
+
+    Each lease hands out a whole browser; the caller creates its own context on it
+    and gives the browser back with release(). Browsers are recycled after max_uses
+    leases or when the process supervisor reports them over its memory or age limit,
+    and idle browsers above min_size are closed after idle_timeout seconds.
+    """
+
+    def __init__(
+            self,
+            browser_config: BrowserConfig,
+            min_size: int = 1,
+            max_size: int = 3,
+            idle_timeout: float = 300.0,
+            max_uses: int = 20,
+    ):
+        if max_size < 1:
+            raise ValueError("Browser pool max_size must be at least 1")
+        self.browser_config = browser_config
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.max_uses = max_uses
+
+        self._idle: List[PooledBrowser] = []
+        self._leased: Dict[int, PooledBrowser] = {}
+        self._launching = 0
+        self._condition = asyncio.Condition()
+        self._reaper: Optional[asyncio.Task] = None
+        self._refills: Set[asyncio.Task] = set()
+        self._closed = False
+        self.acquire_wait = WaitStats(stage="browser_pool")
+
+    @property
+    def size(self) -> int:
+        return len(self._idle) + len(self._leased) + self._launching
+
+    async def start(self):
+        """Pre-launches min_size browsers and starts the idle reaper."""
+        async with self._condition:
+            to_launch = max(0, self.min_size - self.size)
+            self._launching += to_launch
+        if to_launch:
+            logger.info(f"Warming browser pool with {to_launch} browser(s).")
+            results = await asyncio.gather(*(self._launch() for _ in range(to_launch)), return_exceptions=True)
+            async with self._condition:
+                self._launching -= to_launch
+                for res in results:
+                    if isinstance(res, PooledBrowser):
+                        self._idle.append(res)
+                    else:
+                        logger.error(f"Failed to pre-launch pooled browser: {res}")
+                self._condition.notify_all()
+        if self._reaper is None and self.idle_timeout > 0:
+            self._reaper = asyncio.create_task(self._reap_idle_loop())
+
+    async def acquire(self) -> CustomBrowser:
+        """Leases a browser, launching a new one if the pool has room, otherwise waiting for a release."""
+        if self._closed:
+            raise RuntimeError("Browser pool is closed")
+
+        wait_start = time.monotonic()
+        entry: Optional[PooledBrowser] = None
+        stale: List[PooledBrowser] = []
+        supervisor = get_process_supervisor()
+        async with self._condition:
+            while not self._closed: # close() wakes every waiter, so this is re-checked after each wait
+                while self._idle:
+                    candidate = self._idle.pop()  # LIFO keeps the warmest browser in use
+                    if candidate.browser.is_connected() and not supervisor.recycle_reason(candidate.browser):
+                        entry = candidate
+                        break
+                    stale.append(candidate)
+                if entry or self.size < self.max_size:
+                    break
+                await self._condition.wait()
+            closed = self._closed
+            if entry is None and not closed:
+                self._launching += 1
+
+        for dead in stale:
+            if reason := supervisor.recycle_reason(dead.browser):
+                logger.info(f"Recycling idle pooled browser over its {reason} limit.")
+                supervisor.record_recycle(reason)
+            else:
+                logger.warning("Dropping disconnected browser from pool.")
+            await self._close_entry(dead)
+        if closed:
+            raise RuntimeError("Browser pool is closed")
+
+        launched = entry is None
+        if launched:
+            try:
+                entry = await self._launch()
+            except Exception:
+                async with self._condition:
+                    self._launching -= 1
+                    self._condition.notify()
+                raise
+
+        async with self._condition:
+            if launched:
+                self._launching -= 1
+            closed = self._closed
+            if not closed:
+                entry.uses += 1
+                entry.last_used_at = time.monotonic()
+                self._leased[id(entry.browser)] = entry
+                self.acquire_wait.record(time.monotonic() - wait_start)
+        if closed: # Closed meanwhile; close() never saw this browser, so it is closed here
+            await self._close_entry(entry)
+            raise RuntimeError("Browser pool is closed")
+        logger.debug(f"Leased pooled browser (use {entry.uses}/{self.max_uses}, pool size {self.size}).")
+        return entry.browser
+
+    async def release(self, browser: CustomBrowser, discard: bool = False):
+        """Returns a leased browser; it is closed instead if discarded, disconnected or worn out."""
+        async with self._condition:
+            entry = self._leased.pop(id(browser), None)
+            if entry is None:
+                logger.warning("Tried to release a browser that is not leased from this pool.")
+                return
+            entry.last_used_at = time.monotonic()
+            over_limit = get_process_supervisor().recycle_reason(browser)
+            recycle = discard or self._closed or entry.uses >= self.max_uses or not browser.is_connected() or bool(over_limit)
+            if not recycle:
+                self._idle.append(entry)
+            self._condition.notify()
+
+        if recycle:
+            if over_limit:
+                get_process_supervisor().record_recycle(over_limit)
+            logger.info(f"Recycling pooled browser after {entry.uses} use(s){f' (over its {over_limit} limit)' if over_limit else ''}.")
+            await self._close_entry(entry)
+            if not self._closed:
+                task = asyncio.create_task(self._refill())
+                self._refills.add(task)
+                task.add_done_callback(self._refills.discard)
+
+    async def close(self):
+        """Closes every browser, including leased ones, and stops the reaper."""
+        self._closed = True
+        if self._reaper:
+            self._reaper.cancel()
+            self._reaper = None
+        async with self._condition:
+            entries = self._idle + list(self._leased.values())
+            self._idle = []
+            self._leased = {}
+            self._condition.notify_all()
+        for entry in entries:
+            await self._close_entry(entry)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "idle": len(self._idle),
+            "leased": len(self._leased),
+            "launching": self._launching,
+            "debugging_ports": sorted(entry.browser.debugging_port for entry in (*self._idle, *self._leased.values())
+                                      if entry.browser.debugging_port),
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "acquire_wait": self.acquire_wait.snapshot(),
+        }
+
+    async def _launch(self) -> PooledBrowser:
+        browser = CustomBrowser(config=self.browser_config)
+        try:
+            await browser.get_playwright_browser()
+        except Exception:
+            await browser._close_without_httpxclients()
+            raise
+        return PooledBrowser(browser=browser)
+
+    async def _refill(self):
+        """Tops the pool back up to min_size after a browser was recycled."""
+        async with self._condition:
+            missing = self.min_size - self.size
+            if missing <= 0 or self._closed:
+                return
+            self._launching += missing
+        for _ in range(missing):
+            entry = None
+            try:
+                entry = await self._launch()
+            except Exception as e:
+                logger.error(f"Failed to refill browser pool: {e}")
+            async with self._condition:
+                self._launching -= 1
+                if entry:
+                    self._idle.append(entry)
+                self._condition.notify()
+
+    async def _reap_idle_loop(self):
+        interval = max(1.0, min(self.idle_timeout / 2, 30.0))
+        while not self._closed:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            expired: List[PooledBrowser] = []
+            async with self._condition:
+                for entry in list(self._idle):
+                    if self.size <= self.min_size:
+                        break
+                    if now - entry.last_used_at >= self.idle_timeout:
+                        self._idle.remove(entry)
+                        expired.append(entry)
+            for entry in expired:
+                logger.info("Closing idle pooled browser.")
+                await self._close_entry(entry)
+
+    @staticmethod
+    async def _close_entry(entry: PooledBrowser):
+        try:
+            # Skip the httpx client sweep of Browser.close(); it would also close clients the LLMs still use.
+            await entry.browser._close_without_httpxclients()
+        except Exception as e:
+            logger.error(f"Error closing pooled browser: {e}")
+
+
+# Storage wiped for every origin a pooled context visited; cookies are cleared context-wide separately
+CONTEXT_RESET_STORAGE_TYPES = "local_storage,indexeddb,websql,cache_storage,service_workers,file_systems"
+
+
+@dataclass
+class PooledContext:
+    """A pre-created context on the pool's browser plus the origins it touched since the last reset."""
+    context: CustomBrowserContext
+    uses: int = 0
+    origins: Set[str] = field(default_factory=set)
+
+
+class ContextPool:
+    """
+    Pre-created, isolated contexts on one long-lived browser.
+
+    Each caller leases its own context, so concurrent agents never share tabs, cookies
+    or navigation state. On release the context is reset (fresh tab, cookies and
+    storage cleared) instead of being closed, which is much cheaper than creating a
+    new one. Contexts that fail a health check or reach max_uses are evicted.
+    """
+
+    def __init__(
+            self,
+            browser: CustomBrowser,
+            context_config: CustomBrowserContextConfig,
+            min_size: int = 2,
+            max_size: int = 5,
+            max_uses: int = 50,
+            health_timeout: float = 5.0,
+    ):
+        if max_size < 1:
+            raise ValueError("Context pool max_size must be at least 1")
+        self.browser = browser
+        # Pooled contexts must be real, separate Playwright contexts even on a CDP/binary-path browser
+        self.context_config = context_config.model_copy(update={"force_new_context": True})
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max_size
+        self.max_uses = max_uses
+        self.health_timeout = health_timeout
+
+        self._idle: List[PooledContext] = []
+        self._leased: Dict[int, PooledContext] = {}
+        self._creating = 0
+        self._condition = asyncio.Condition()
+        self._closed = False
+        self.acquire_wait = WaitStats(stage="context_pool")
+
+    @property
+    def size(self) -> int:
+        return len(self._idle) + len(self._leased) + self._creating
+
+    async def start(self):
+        """Launches the browser if needed and pre-creates min_size contexts."""
+        await self.browser.get_playwright_browser()
+        async with self._condition:
+            to_create = max(0, self.min_size - self.size)
+            self._creating += to_create
+        if not to_create:
+            return
+        logger.info(f"Pre-creating {to_create} browser context(s) on the shared browser.")
+        results = await asyncio.gather(*(self._create() for _ in range(to_create)), return_exceptions=True)
+        async with self._condition:
+            self._creating -= to_create
+            for res in results:
+                if isinstance(res, PooledContext):
+                    self._idle.append(res)
+                else:
+                    logger.error(f"Failed to pre-create pooled context: {res}")
+            self._condition.notify_all()
+
+    def owns(self, context: CustomBrowserContext) -> bool:
+        return id(context) in self._leased
+
+    async def acquire(self) -> CustomBrowserContext:
+        """Leases a context, creating one if the pool has room, otherwise waiting for a release."""
+        wait_start = time.monotonic()
+        while True:
+            if self._closed:
+                raise RuntimeError("Context pool is closed")
+            entry: Optional[PooledContext] = None
+            async with self._condition:
+                while not self._closed and not self._idle and self.size >= self.max_size:
+                    await self._condition.wait()
+                if self._closed:
+                    raise RuntimeError("Context pool is closed")
+                if self._idle:
+                    entry = self._idle.pop()
+                    self._leased[id(entry.context)] = entry # Holds the slot while the health check runs
+                else:
+                    self._creating += 1
+
+            if entry is None:
+                try:
+                    entry = await self._create()
+                finally:
+                    async with self._condition:
+                        self._creating -= 1
+                        if entry:
+                            self._leased[id(entry.context)] = entry
+                        self._condition.notify()
+                assert entry is not None # _create raised otherwise
+            elif not await self._is_healthy(entry.context):
+                logger.warning("Evicting unhealthy pooled browser context.")
+                async with self._condition:
+                    self._leased.pop(id(entry.context), None)
+                    self._condition.notify()
+                await self._close_entry(entry)
+                continue
+
+            entry.uses += 1
+            self.acquire_wait.record(time.monotonic() - wait_start)
+            return entry.context
+
+    async def release(self, context: CustomBrowserContext):
+        """Resets a leased context and returns it to the pool, or evicts it if the reset or health check fails."""
+        entry = self._leased.get(id(context))
+        if entry is None:
+            logger.warning("Tried to release a context that is not leased from this pool; closing it.")
+            await context.close()
+            return
+
+        keep = not self._closed and entry.uses < self.max_uses
+        if keep:
+            reset_start = time.monotonic()
+            try:
+                await self._reset(entry)
+                keep = await self._is_healthy(context)
+            except Exception as e:
+                logger.warning(f"Failed to reset pooled browser context: {e}")
+                keep = False
+            logger.debug(f"Reset pooled browser context in {time.monotonic() - reset_start:.3f}s")
+
+        async with self._condition:
+            self._leased.pop(id(context), None)
+            if keep:
+                self._idle.append(entry)
+            self._condition.notify()
+        if not keep:
+            logger.info(f"Evicting pooled browser context after {entry.uses} use(s).")
+            await self._close_entry(entry)
+
+    async def close(self):
+        """Closes every context, including leased ones. The browser itself is left to the caller."""
+        self._closed = True
+        async with self._condition:
+            entries = self._idle + list(self._leased.values())
+            self._idle = []
+            self._leased = {}
+            self._condition.notify_all()
+        for entry in entries:
+            await self._close_entry(entry)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "idle": len(self._idle),
+            "leased": len(self._leased),
+            "creating": self._creating,
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "acquire_wait": self.acquire_wait.snapshot(),
+        }
+
+    async def _create(self) -> PooledContext:
+        context = await self.browser.new_context(config=self.context_config)
+        session = await context.get_session()
+        entry = PooledContext(context=context)
+
+        def track_origin(frame):
+            parts = urlsplit(frame.url)
+            if parts.scheme in ("http", "https"):
+                entry.origins.add(f"{parts.scheme}://{parts.netloc}")
+
+        def track_page(page):
+            page.on("framenavigated", track_origin)
+
+        for page in session.context.pages:
+            track_page(page)
+        session.context.on("page", track_page)
+        return entry
+
+    async def _reset(self, entry: PooledContext):
+        """Brings a context back to a blank state without recreating it."""
+        context = entry.context
+        session = await context.get_session()
+        pw_context = session.context
+
+        # A fresh tab drops sessionStorage and history; closing the old ones drops everything they held
+        fresh_page = await pw_context.new_page()
+        for page in list(pw_context.pages):
+            if page is not fresh_page:
+                await page.close()
+        await pw_context.clear_cookies()
+        await pw_context.clear_permissions()
+        if cookies := snapshot_cookies(context.load_storage_state()):
+            await pw_context.add_cookies(cookies) # Every lease starts signed in
+
+        if entry.origins:
+            cdp = await pw_context.new_cdp_session(fresh_page)
+            try:
+                for origin in entry.origins:
+                    await cdp.send("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": CONTEXT_RESET_STORAGE_TYPES})
+            finally:
+                await cdp.detach()
+            entry.origins.clear()
+
+        context.request_filter.reset_stats() # Counters are per lease
+        context.screenshots.reset_stats()
+        await context.restart_trace() # Traces are per lease too
+        context.active_tab = fresh_page
+        context.state.target_id = None
+        session.cached_state = None
+        session.cached_state_clickable_elements_hashes = None
+
+    async def _is_healthy(self, context: CustomBrowserContext) -> bool:
+        if not self.browser.is_connected() or context.session is None:
+            return False
+        try:
+            pages = context.session.context.pages
+            if not pages:
+                return False
+            await asyncio.wait_for(pages[0].evaluate("1"), timeout=self.health_timeout)
+            return True
+        except Exception as e:
+            logger.debug(f"Pooled browser context failed health check: {e}")
+            return False
+
+    @staticmethod
+    async def _close_entry(entry: PooledContext):
+        try:
+            await entry.context.close()
+        except Exception as e:
+            logger.error(f"Error closing pooled browser context: {e}")
@@ -0,0 +1,250 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from .custom_browser import CustomBrowser, CustomBrowserConfig
+from .custom_context import CustomBrowserContext, CustomBrowserContextConfig
+from .port_allocator import devtools_port_ready
+
+logger = logging.getLogger(__name__)
+
+MAX_PROBE_BACKOFF = 8 # Evicted endpoints are re-probed at most every probe_interval * MAX_PROBE_BACKOFF seconds
+
+
+def parse_cdp_urls(value: Optional[str]) -> List[str]:
+    """Comma-separated CDP endpoints from a setting, without duplicates."""
+    urls = []
+    for url in (value or "").split(","):
+        url = url.strip().rstrip("/")
+        if url and url not in urls:
+            urls.append(url)
+    return urls
+
+
+async def cdp_endpoint_ready(url: str, timeout: float) -> bool:
+    """Cheap /json/version check before a Playwright connection is attempted; ws:// endpoints are only checked by connecting."""
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https"):
+        return True
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    return await devtools_port_ready(port, host=parts.hostname or "127.0.0.1", timeout=timeout, ssl=parts.scheme == "https")
+
+
+@dataclass
+class FleetEndpoint:
+    """One external browser in the fleet and its placement bookkeeping."""
+    url: str
+    browser: Optional[CustomBrowser] = None
+    healthy: bool = False
+    open_contexts: int = 0
+    placed: int = 0
+    failures: int = 0 # Consecutive failed probes or connection losses
+    evictions: int = 0
+    last_error: Optional[str] = None
+    last_probe_at: float = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "open_contexts": self.open_contexts,
+            "placed": self.placed,
+            "evictions": self.evictions,
+            "last_error": self.last_error,
+        }
+
+
+class CdpFleet:
+    """
+    Spreads browser contexts over several externally managed browsers reached over CDP.
+
+    Every endpoint is probed (a /json/version request, then a Playwright connection) and
+    each new context goes to the healthy endpoint with the fewest open contexts. An
+    endpoint whose connection drops or whose context creation fails is evicted, and a
+    background task re-probes evicted endpoints with exponential backoff until they come
+    back. Contexts have the same new_context/close_context interface as SharedBrowser.
+    """
+
+    def __init__(
+            self,
+            urls: List[str],
+            browser_config: Optional[CustomBrowserConfig] = None,
+            max_contexts_per_endpoint: Optional[int] = None,
+            probe_interval: float = 30.0,
+            probe_timeout: float = 5.0,
+    ):
+        if not urls:
+            raise ValueError("A CDP fleet needs at least one endpoint")
+        self.browser_config = browser_config or CustomBrowserConfig()
+        self.max_contexts_per_endpoint = max_contexts_per_endpoint
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.endpoints = [FleetEndpoint(url) for url in urls]
+        self._placements: Dict[int, FleetEndpoint] = {} # id(context) -> endpoint
+        self._condition = asyncio.Condition()
+        self._prober: Optional[asyncio.Task] = None
+        self._started = False
+        self._closed = False
+
+    async def start(self):
+        """Probes every endpoint once and starts the background re-prober. Idempotent."""
+        if self._started:
+            return
+        self._started = True
+        await asyncio.gather(*(self._probe(endpoint) for endpoint in self.endpoints))
+        healthy = sum(endpoint.healthy for endpoint in self.endpoints)
+        logger.info(f"CDP fleet ready: {healthy}/{len(self.endpoints)} endpoint(s) healthy.")
+        if self.probe_interval > 0:
+            self._prober = asyncio.create_task(self._probe_loop())
+
+    async def _probe(self, endpoint: FleetEndpoint):
+        endpoint.last_probe_at = time.monotonic()
+        browser = None
+        try:
+            if not await cdp_endpoint_ready(endpoint.url, self.probe_timeout):
+                raise ConnectionError("DevTools endpoint did not answer /json/version")
+            browser = CustomBrowser(config=self.browser_config.model_copy(update={"cdp_url": endpoint.url}))
+            await asyncio.wait_for(browser.get_playwright_browser(), self.probe_timeout)
+        except Exception as e:
+            if browser:
+                await self._disconnect(browser)
+            endpoint.failures += 1
+            endpoint.last_error = str(e) or type(e).__name__
+            logger.warning(f"CDP endpoint {endpoint.url} is unavailable: {endpoint.last_error}")
+            return
+        async with self._condition:
+            endpoint.browser = browser
+            endpoint.healthy = True
+            endpoint.failures = 0
+            endpoint.last_error = None
+            self._condition.notify_all()
+        logger.info(f"CDP endpoint {endpoint.url} is healthy.")
+
+    async def _evict(self, endpoint: FleetEndpoint, reason: str):
+        """Takes an endpoint out of rotation; the prober reconnects once it answers again."""
+        async with self._condition:
+            if not endpoint.healthy:
+                return
+            endpoint.healthy = False
+            endpoint.failures += 1
+            endpoint.evictions += 1
+            endpoint.last_error = reason
+            endpoint.last_probe_at = time.monotonic()
+            endpoint.open_contexts = 0 # Its contexts died with the connection
+            for key in [key for key, placed in self._placements.items() if placed is endpoint]:
+                del self._placements[key]
+            browser, endpoint.browser = endpoint.browser, None
+            self._condition.notify_all() # Waiters re-check whether any endpoint is left
+        logger.warning(f"Evicted CDP endpoint {endpoint.url}: {reason}")
+        if browser:
+            await self._disconnect(browser)
+
+    @staticmethod
+    async def _disconnect(browser: CustomBrowser):
+        try:
+            await browser.close() # Only drops the CDP connection; the remote browser keeps running
+        except Exception as e:
+            logger.debug(f"Error disconnecting from CDP endpoint: {e}")
+
+    async def _probe_loop(self):
+        while not self._closed:
+            await asyncio.sleep(self.probe_interval)
+            now = time.monotonic()
+            for endpoint in self.endpoints:
+                if endpoint.healthy:
+                    if endpoint.browser is None or not endpoint.browser.is_connected():
+                        await self._evict(endpoint, "connection lost")
+                    continue
+                backoff = self.probe_interval * min(2 ** max(endpoint.failures - 1, 0), MAX_PROBE_BACKOFF)
+                if now - endpoint.last_probe_at >= backoff:
+                    await self._probe(endpoint)
+
+    def _pick(self) -> Optional[FleetEndpoint]:
+        candidates = [
+            endpoint for endpoint in self.endpoints
+            if endpoint.healthy and (not self.max_contexts_per_endpoint or endpoint.open_contexts < self.max_contexts_per_endpoint)
+        ]
+        return min(candidates, key=lambda endpoint: (endpoint.open_contexts, endpoint.placed), default=None)
+
+    async def new_context(self, config: CustomBrowserContextConfig) -> CustomBrowserContext:
+        """A new context on the least-loaded healthy endpoint, waiting while every healthy endpoint is full."""
+        config = config.model_copy(update={"force_new_context": True}) # Never reuse the remote browser's default context
+        while True:
+            async with self._condition:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("CDP fleet is closed")
+                    if not any(endpoint.healthy for endpoint in self.endpoints):
+                        raise RuntimeError(f"No healthy CDP endpoint among {len(self.endpoints)} configured")
+                    endpoint = self._pick()
+                    if endpoint:
+                        break
+                    await self._condition.wait()
+                endpoint.open_contexts += 1
+                endpoint.placed += 1
+                browser = endpoint.browser
+                assert browser is not None # Set whenever the endpoint is healthy
+            context = None
+            try:
+                context = await browser.new_context(config=config)
+                await context.get_session() # Create the Playwright context now, so a dead endpoint fails here
+            except Exception as e:
+                if context:
+                    try:
+                        await context.close()
+                    except Exception:
+                        pass
+                async with self._condition:
+                    endpoint.open_contexts = max(0, endpoint.open_contexts - 1)
+                    endpoint.placed -= 1
+                    self._condition.notify()
+                if browser.is_connected():
+                    raise
+                await self._evict(endpoint, f"context creation failed: {e}")
+                continue # Place it on another endpoint
+            async with self._condition:
+                self._placements[id(context)] = endpoint
+            logger.info(f"Placed browser context on {endpoint.url} ({endpoint.open_contexts} open).")
+            return context
+
+    async def close_context(self, context: CustomBrowserContext):
+        async with self._condition:
+            endpoint = self._placements.pop(id(context), None)
+            if endpoint:
+                endpoint.open_contexts = max(0, endpoint.open_contexts - 1)
+                self._condition.notify()
+        try:
+            await context.close()
+        except Exception as e:
+            logger.debug(f"Error closing fleet context: {e}")
+
+    def endpoint_of(self, context: CustomBrowserContext) -> Optional[FleetEndpoint]:
+        return self._placements.get(id(context))
+
+    async def close(self):
+        self._closed = True
+        if self._prober:
+            self._prober.cancel()
+            await asyncio.gather(self._prober, return_exceptions=True)
+            self._prober = None
+        async with self._condition:
+            browsers = [endpoint.browser for endpoint in self.endpoints if endpoint.browser]
+            for endpoint in self.endpoints:
+                endpoint.browser = None
+                endpoint.healthy = False
+                endpoint.open_contexts = 0
+            self._placements.clear()
+            self._condition.notify_all()
+        for browser in browsers:
+            await self._disconnect(browser)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "endpoints": [endpoint.snapshot() for endpoint in self.endpoints],
+            "healthy": sum(endpoint.healthy for endpoint in self.endpoints),
+            "open_contexts": sum(endpoint.open_contexts for endpoint in self.endpoints),
+            "max_contexts_per_endpoint": self.max_contexts_per_endpoint,
+        }
@@ -1,6 +1,7 @@
 import asyncio
-import gc
 import pdb
+import shutil
+from typing import Optional, Tuple
 
 from playwright.async_api import Browser as PlaywrightBrowser
 from playwright.async_api import (
@@ -10,7 +11,7 @@ from playwright.async_api import (
     Playwright,
     async_playwright,
 )
-from browser_use.browser.browser import Browser, IN_DOCKER
+from browser_use.browser.browser import Browser, BrowserConfig, IN_DOCKER
 from browser_use.browser.context import BrowserContext, BrowserContextConfig
 from playwright.async_api import BrowserContext as PlaywrightBrowserContext
 import logging
@@ -25,14 +26,30 @@ from browser_use.browser.chrome import (
 from browser_use.browser.context import BrowserContext, BrowserContextConfig
 from browser_use.browser.utils.screen_resolution import get_screen_resolution, get_window_adjustments
 from browser_use.utils import time_execution_async
-import socket
+
+import psutil
 
 from .custom_context import CustomBrowserContext, CustomBrowserContextConfig
+from .fast_start import fast_start_args, get_profile_template, spawn_chromium
+from .port_allocator import devtools_port_ready, get_port_allocator
+from .process_supervisor import find_chrome_root, get_process_supervisor
+from ..utils.metrics import BROWSER_LAUNCH_SECONDS
 
 logger = logging.getLogger(__name__)
 
 
+class CustomBrowserConfig(BrowserConfig):
+    fast_start: bool = False  # launch builtin Chromium from a clone of a pre-warmed profile template
+    profile_template_dir: Optional[str] = None  # where the warmed template is kept (default: ~/.cache/mcp-server-browser-use)
+    debugging_port_range: Optional[Tuple[int, int]] = None  # remote-debugging ports leased to builtin Chromium (default: 9222-9321)
+
+
 class CustomBrowser(Browser):
+    debugging_port: Optional[int] = None  # remote-debugging port of the launched Chromium, for CDP reattachment
+
+    @property
+    def debugging_url(self) -> Optional[str]:
+        return f"http://127.0.0.1:{self.debugging_port}" if self.debugging_port else None
 
     async def new_context(self, config: CustomBrowserContextConfig | None = None) -> CustomBrowserContext:
         """Create a browser context"""
@@ -41,8 +58,42 @@ class CustomBrowser(Browser):
         merged_config = {**browser_config, **context_config}
         return CustomBrowserContext(config=CustomBrowserContextConfig(**merged_config), browser=self)
 
+    def is_connected(self) -> bool:
+        """Whether the underlying Playwright browser has been launched and is still connected."""
+        return self.playwright_browser is not None and self.playwright_browser.is_connected()
+
+    def uses_fast_start(self) -> bool:
+        return (
+            getattr(self.config, "fast_start", False)
+            and self.config.browser_class == "chromium"
+            and not (self.config.cdp_url or self.config.wss_url or self.config.browser_binary_path)
+            and not any(arg.startswith("--user-data-dir") for arg in self.config.extra_browser_args)
+        )
+
+    async def _init(self):
+        mode = "cdp" if self.config.cdp_url else "wss" if self.config.wss_url else "binary" if self.config.browser_binary_path else "builtin"
+        if self.uses_fast_start():
+            mode = "fast_start"
+        async with BROWSER_LAUNCH_SECONDS.time_async(mode=mode):
+            playwright_browser = await super()._init()
+        await self._track_chrome_process()
+        return playwright_browser
+
+    async def _track_chrome_process(self):
+        """Registers the launched Chromium tree with the process supervisor; remote CDP/WSS browsers are not ours to watch."""
+        root = getattr(self, '_chrome_subprocess', None)
+        if root is None and self.debugging_port and not (self.config.cdp_url or self.config.wss_url):
+            root = await asyncio.to_thread(find_chrome_root, self.debugging_port)
+            # Playwright closes its own browser gracefully; this only lets close() kill leftover renderers too
+            self._chrome_subprocess = root
+        if root is not None:
+            label = f"port {self.debugging_port}" if self.debugging_port else f"pid {root.pid}"
+            get_process_supervisor().track(self, root, label)
+
     async def _setup_builtin_browser(self, playwright: Playwright) -> PlaywrightBrowser:
         """Sets up and returns a Playwright Browser instance with anti-detection measures."""
+        if self.uses_fast_start():
+            return await self._setup_fast_start_browser(playwright)
         assert self.config.browser_binary_path is None, 'browser_binary_path should be None if trying to use the builtin browsers'
 
         if self.config.headless:
@@ -69,10 +120,16 @@ class CustomBrowser(Browser):
         if not contain_window_size:
             chrome_args.add(f'--window-size={screen_size["width"]},{screen_size["height"]}')
 
-        # check if port 9222 is already taken, if so remove the remote-debugging-port arg to prevent conflicts
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            if s.connect_ex(('localhost', 9222)) == 0:
-                chrome_args.remove('--remote-debugging-port=9222')
+        # Swap browser-use's fixed port 9222 for a leased one, so parallel launches each stay CDP-addressable
+        requested_port = next((arg for arg in self.config.extra_browser_args if arg.startswith('--remote-debugging-port=')), None)
+        leased_port = None
+        if requested_port:
+            self.debugging_port = int(requested_port.split('=', 1)[1])
+        elif self.config.browser_class == 'chromium':
+            chrome_args.discard('--remote-debugging-port=9222')
+            leased_port = await get_port_allocator(getattr(self.config, 'debugging_port_range', None)).acquire()
+            if leased_port:
+                chrome_args.add(f'--remote-debugging-port={leased_port}')
 
         browser_class = getattr(playwright, self.config.browser_class)
         args = {
@@ -91,15 +148,57 @@ class CustomBrowser(Browser):
             ],
         }
 
-        browser = await browser_class.launch(
-            headless=self.config.headless,
-            args=args[self.config.browser_class],
-            proxy=self.config.proxy.model_dump() if self.config.proxy else None,
-            handle_sigterm=False,
-            handle_sigint=False,
-        )
+        try:
+            browser = await browser_class.launch(
+                headless=self.config.headless,
+                args=args[self.config.browser_class],
+                proxy=self.config.proxy.model_dump() if self.config.proxy else None,
+                handle_sigterm=False,
+                handle_sigint=False,
+            )
+        except BaseException:
+            self._release_debugging_port(leased_port)
+            raise
+        if leased_port:
+            if await devtools_port_ready(leased_port):
+                self.debugging_port = leased_port
+                self._leased_debugging_port = leased_port
+            else:
+                # Another process bound the port between the probe and the launch
+                logger.warning(f"Chromium did not open remote-debugging port {leased_port}; it is only reachable through Playwright.")
+                self._release_debugging_port(leased_port)
         return browser
 
+    def _release_debugging_port(self, port: Optional[int]):
+        get_port_allocator(getattr(self.config, 'debugging_port_range', None)).release(port)
+
+    async def _setup_fast_start_browser(self, playwright: Playwright) -> PlaywrightBrowser:
+        """Spawns Chromium on a clone of the warmed profile template and connects to it over CDP."""
+        executable = playwright.chromium.executable_path
+        extra_args = list(self.config.extra_browser_args)
+        if not any("--window-size" in arg for arg in extra_args):
+            extra_args.append('--window-size=1920,1080')
+        args = fast_start_args(self.config.headless, self.config.disable_security, extra_args)
+        template = get_profile_template(getattr(self.config, "profile_template_dir", None))
+        await template.ensure(playwright, executable, args)
+
+        self._fast_start_profile_dir = await asyncio.to_thread(template.clone) # A full copy where reflinks are unsupported
+        try:
+            process, cdp_url = await spawn_chromium(executable, self._fast_start_profile_dir, args)
+            self._chrome_subprocess = psutil.Process(process.pid)
+            self.debugging_port = int(cdp_url.rsplit(':', 1)[1]) # OS-assigned, so it never collides
+            return await playwright.chromium.connect_over_cdp(cdp_url)
+        except BaseException:
+            if chrome_proc := getattr(self, '_chrome_subprocess', None):
+                chrome_proc.kill()
+            await asyncio.to_thread(shutil.rmtree, self._fast_start_profile_dir, ignore_errors=True)
+            self._fast_start_profile_dir = None
+            raise
+
+    async def close(self):
+        """Closes the browser without Browser.close()'s sweep of every httpx client in the process, which would break cached LLM clients."""
+        await self._close_without_httpxclients()
+
     async def _close_without_httpxclients(self):
         if self.config.keep_alive:
             return
@@ -127,4 +226,10 @@ class CustomBrowser(Browser):
             self.playwright_browser = None
             self.playwright = None
             self._chrome_subprocess = None
-            gc.collect()
+            self._release_debugging_port(getattr(self, '_leased_debugging_port', None))
+            self._leased_debugging_port = None
+            self.debugging_port = None
+            if profile_dir := getattr(self, '_fast_start_profile_dir', None):
+                self._fast_start_profile_dir = None
+                await asyncio.to_thread(shutil.rmtree, profile_dir, ignore_errors=True)
+            get_process_supervisor().untrack(self) # Survivors of the kill above are reaped on a later tick
@@ -1,19 +1,80 @@
-import json
+import asyncio
 import logging
-import os
+import time
 
 from browser_use.browser.browser import Browser, IN_DOCKER
 from browser_use.browser.context import BrowserContext, BrowserContextConfig
+from browser_use.dom.service import DomService
 from playwright.async_api import Browser as PlaywrightBrowser
 from playwright.async_api import BrowserContext as PlaywrightBrowserContext
-from typing import Optional
+from playwright.async_api import Page
+from playwright.async_api import StorageState
+from typing import Any, Callable, Dict, List, Optional
 from browser_use.browser.context import BrowserContextState
+from browser_use.browser.views import BrowserError, BrowserState
+
+from ..utils.metrics import CONTEXT_CREATE_SECONDS
+from ..utils.step_timings import record_saved, step_phase
+from .request_filter import RequestFilter
+from .response_cache import get_response_cache
+from .screenshot import ScreenshotPipeline
+from .stable_ids import RELABEL_HIGHLIGHTS_JS, StableElementIds
+from .storage_state import get_storage_state_store, snapshot_cookies
+from .trace_sampler import ContextTracer
 
 logger = logging.getLogger(__name__)
 
 
 class CustomBrowserContextConfig(BrowserContextConfig):
     force_new_context: bool = False  # force to create new context
+    # Request interception: a preset ("full", "vision-lite", "text-only"), optionally overridden per field
+    request_policy: str = "full"
+    blocked_resource_types: Optional[List[str]] = None  # None keeps the preset's resource types
+    blocked_domains: List[str] = []  # Added to the preset's ad/analytics blocklist
+    max_resource_bytes: Optional[int] = None  # None keeps the preset's size limit
+    # Shared on-disk HTTP response cache
+    response_cache_enabled: bool = False
+    response_cache_dir: Optional[str] = None  # None uses ~/.cache/mcp-server-browser-use/http-cache
+    response_cache_max_bytes: int = 512 * 1024 * 1024
+    response_cache_static_ttl: Optional[float] = None  # Fixed TTL for scripts, stylesheets, fonts and images
+    response_cache_respect_cache_control: bool = True
+    # Named storage-state snapshot (cookies, localStorage, IndexedDB) applied to new contexts
+    storage_state: Optional[str] = None
+    storage_state_dir: Optional[str] = None  # None uses ~/.cache/mcp-server-browser-use/storage-states
+    # Tracing when trace_path is set: "always", "sampled" (1 in trace_sample_rate runs) or "on-failure"
+    trace_mode: str = "always"
+    trace_sample_rate: int = 10
+    trace_ring_size: int = 5  # on-failure: step chunks kept until the run ends
+    # Screenshots sent to vision LLMs
+    screenshot_format: str = "png"  # "png", "jpeg" or "webp"
+    screenshot_quality: int = 80  # jpeg/webp only
+    screenshot_max_width: Optional[int] = None  # Downscale wider screenshots to this many pixels
+    screenshot_crop_to_viewport: bool = False  # Clip to the visual viewport (no scrollbars, follows pinch-zoom)
+    screenshot_dedupe: bool = False  # Skip the image when the page looks the same as in the last one sent
+    screenshot_dedupe_threshold: int = 2  # Max differing bits of the 64-bit perceptual hash
+
+
+def _run_to_completion(coro):
+    """Runs a coroutine that never awaits anything, like DomService._construct_dom_tree, in the calling thread."""
+    try:
+        coro.send(None)
+    except StopIteration as done:
+        return done.value
+    coro.close()
+    raise RuntimeError("Coroutine suspended outside an event loop")
+
+
+class _ThreadedDomService(DomService):
+    """Builds the element tree in a worker thread, calling on_evaluated once buildDomTree.js has run (and drawn its highlights)."""
+
+    def __init__(self, page: Page, on_evaluated: Optional[Callable[[], None]] = None):
+        super().__init__(page)
+        self.on_evaluated = on_evaluated
+
+    async def _construct_dom_tree(self, eval_page: dict):
+        if self.on_evaluated:
+            self.on_evaluated()
+        return await asyncio.to_thread(_run_to_completion, super()._construct_dom_tree(eval_page))
 
 
 class CustomBrowserContext(BrowserContext):
@@ -24,9 +85,204 @@ class CustomBrowserContext(BrowserContext):
             state: Optional[BrowserContextState] = None,
     ):
         super(CustomBrowserContext, self).__init__(browser=browser, config=config, state=state)
+        self.request_filter = RequestFilter(
+            policy=getattr(self.config, "request_policy", "full"),
+            blocked_resource_types=getattr(self.config, "blocked_resource_types", None),
+            blocked_domains=getattr(self.config, "blocked_domains", []),
+            max_resource_bytes=getattr(self.config, "max_resource_bytes", None),
+        )
+        self.response_cache = None
+        if getattr(self.config, "response_cache_enabled", False):
+            self.response_cache = get_response_cache(
+                cache_dir=getattr(self.config, "response_cache_dir", None),
+                max_bytes=getattr(self.config, "response_cache_max_bytes", 512 * 1024 * 1024),
+                static_ttl=getattr(self.config, "response_cache_static_ttl", None),
+                respect_cache_control=getattr(self.config, "response_cache_respect_cache_control", True),
+            )
+            self.request_filter.response_cache = self.response_cache
+        self.storage_state_store = get_storage_state_store(getattr(self.config, "storage_state_dir", None))
+        self.tracer: Optional[ContextTracer] = None
+        if self.config.trace_path:
+            self.tracer = ContextTracer(
+                self.config.trace_path,
+                mode=getattr(self.config, "trace_mode", "always"),
+                sample_rate=getattr(self.config, "trace_sample_rate", 10),
+                ring_size=getattr(self.config, "trace_ring_size", 5),
+            )
+        self._trace_runs = 0
+        self.screenshots = ScreenshotPipeline(
+            image_format=getattr(self.config, "screenshot_format", "png"),
+            quality=getattr(self.config, "screenshot_quality", 80),
+            max_width=getattr(self.config, "screenshot_max_width", None),
+            crop_to_viewport=getattr(self.config, "screenshot_crop_to_viewport", False),
+            dedupe=getattr(self.config, "screenshot_dedupe", False),
+            dedupe_threshold=getattr(self.config, "screenshot_dedupe_threshold", 2),
+        )
+        self.pipelined_state = False # Set by pipelined agents: capture DOM, screenshot and page info concurrently
+        self.element_ids: Optional[StableElementIds] = None # Set by DOM-diff agents: keep element indices stable on a page
+
+    def load_storage_state(self) -> Optional[StorageState]:
+        name = getattr(self.config, "storage_state", None)
+        if not name:
+            return None
+        state = self.storage_state_store.load(name)
+        if state is None:
+            logger.info(f"Storage state '{name}' not saved yet; starting with an empty session.")
+        else:
+            logger.info(f"Applying storage state '{name}': {len(state.get('cookies', []))} cookies, {len(state.get('origins', []))} origins.")
+        return state
+
+    async def save_storage_state(self, name: Optional[str] = None) -> Dict[str, Any]:
+        """Saves this context's cookies, localStorage and IndexedDB to a named snapshot (default: the one it was created from)."""
+        name = name or getattr(self.config, "storage_state", None)
+        if not name:
+            raise ValueError("No storage state name given and none configured for this context.")
+        session = await self.get_session()
+        summary = await self.storage_state_store.save(session.context, name)
+        logger.info(f"Saved storage state '{name}': {summary['cookies']} cookies, {summary['origins']} origins.")
+        return summary
+
+    async def restart_trace(self):
+        """Ends the previous run's trace and starts a new one (with a new sampling decision) for the next lease."""
+        if not self.tracer or self.session is None:
+            return
+        if self.tracer.recording:
+            await self.tracer.finish(failed=self.tracer.has_steps) # Its run never reported an outcome
+        self._trace_runs += 1
+        await self.tracer.start(self.session.context, f"{self.context_id}-{self._trace_runs}")
+
+    async def close(self):
+        # Finish our trace first; the base close() then finds tracing stopped and skips its own save
+        if self.tracer and self.tracer.recording and self.session is not None:
+            await self.tracer.finish(failed=self.tracer.has_steps) # No outcome from an agent: keep it if steps ran
+        await super().close()
+
+    async def take_screenshot(self, full_page: bool = False) -> str:
+        if full_page or not self.screenshots.active:
+            return await super().take_screenshot(full_page)
+        page = await self.get_current_page()
+        await page.bring_to_front()
+        await page.wait_for_load_state()
+        try:
+            return await self.screenshots.capture(page)
+        except Exception as e:
+            logger.debug(f"Screenshot pipeline failed, taking a plain screenshot: {e}")
+            self.screenshots.last_frame = None
+            return await super().take_screenshot(full_page)
+
+    async def get_state(self, cache_clickable_elements_hashes: bool) -> BrowserState:
+        async with step_phase("state"):
+            return await super().get_state(cache_clickable_elements_hashes)
+
+    async def _get_updated_state(self, focus_element: int = -1) -> BrowserState:
+        if not self.pipelined_state and self.element_ids is None:
+            return await super()._get_updated_state(focus_element)
+        session = await self.get_session()
+        try:
+            page = await self.get_current_page()
+            await page.evaluate("1")
+        except Exception as e:
+            logger.debug(f"Current page is no longer accessible: {e}")
+            if not session.context.pages:
+                raise BrowserError("Browser closed: no valid pages available")
+            self.state.target_id = None
+            page = await self._get_current_page(session)
+        try:
+            self.current_state = await self._capture_state(page, focus_element)
+            return self.current_state
+        except Exception as e:
+            logger.error(f"Failed to update state: {e}")
+            if hasattr(self, "current_state"):
+                return self.current_state
+            raise
+
+    async def _capture_state(self, page: Page, focus_element: int) -> BrowserState:
+        """
+        The base class's state capture, pipelined and/or with stable element indices.
+
+        Pipelined, tab, scroll and title lookups run alongside DOM extraction, and the
+        element tree is built from buildDomTree.js's result in a worker thread while the
+        screenshot is taken: it starts as soon as the script has drawn its highlights
+        (right away when elements are not highlighted). With stable indices the elements
+        are renumbered, and their highlight labels with them, before the screenshot.
+        """
+        concurrent = self.pipelined_state
+        start = time.perf_counter()
+        phases: Dict[str, float] = {}
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def timed(phase: str, coro):
+            async with step_phase(phase):
+                phase_start = time.perf_counter()
+                try:
+                    return await coro
+                finally:
+                    phases[phase] = time.perf_counter() - phase_start
+
+        async def page_info():
+            tabs = await self.get_tabs_info()
+            pixels_above, pixels_below = await self.get_scroll_info(page)
+            return tabs, pixels_above, pixels_below, await page.title()
+
+        def start_screenshot():
+            if "screenshot" not in tasks:
+                tasks["screenshot"] = asyncio.create_task(timed("screenshot", self.take_screenshot()))
+
+        def start_page_info():
+            if "page_info" not in tasks:
+                tasks["page_info"] = asyncio.create_task(timed("page_info", page_info()))
+
+        await self.remove_highlights()
+        highlight = self.config.highlight_elements
+        early_screenshot = concurrent and self.element_ids is None
+        if concurrent:
+            start_page_info()
+            if early_screenshot and not highlight:
+                start_screenshot()
+            dom_service = _ThreadedDomService(page, on_evaluated=start_screenshot if early_screenshot and highlight else None)
+        else:
+            dom_service = DomService(page)
+        try:
+            content = await timed("dom", dom_service.get_clickable_elements(
+                focus_element=focus_element,
+                viewport_expansion=self.config.viewport_expansion,
+                highlight_elements=highlight,
+            ))
+            if self.element_ids is not None:
+                renames = self.element_ids.assign(content.selector_map, page.url)
+                if renames and highlight:
+                    await page.evaluate(RELABEL_HIGHLIGHTS_JS, {str(old): new for old, new in renames.items()})
+            start_screenshot() # Also covers about:blank, which returns before the script runs
+            if not concurrent:
+                await tasks["screenshot"]
+            start_page_info()
+            tabs, pixels_above, pixels_below, title = await tasks["page_info"]
+            screenshot_b64 = await tasks["screenshot"]
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        record_saved(sum(phases.values()) - (time.perf_counter() - start))
+
+        return BrowserState(
+            element_tree=content.element_tree,
+            selector_map=content.selector_map,
+            url=page.url,
+            title=title,
+            tabs=tabs,
+            screenshot=screenshot_b64,
+            pixels_above=pixels_above,
+            pixels_below=pixels_below,
+        )
 
     async def _create_context(self, browser: PlaywrightBrowser):
         """Creates a new browser context with anti-detection measures and loads cookies if available."""
+        async with CONTEXT_CREATE_SECONDS.time_async():
+            return await self._create_context_timed(browser)
+
+    async def _create_context_timed(self, browser: PlaywrightBrowser):
+        storage_state = self.load_storage_state()
         if not self.config.force_new_context and self.browser.config.cdp_url and len(browser.contexts) > 0:
             context = browser.contexts[0]
         elif not self.config.force_new_context and self.browser.config.browser_binary_path and len(
@@ -51,30 +307,28 @@ class CustomBrowserContext(BrowserContext):
                 geolocation=self.config.geolocation,
                 permissions=self.config.permissions,
                 timezone_id=self.config.timezone_id,
+                storage_state=storage_state,
             )
+            storage_state = None # Applied by Playwright, localStorage and IndexedDB included
 
-        if self.config.trace_path:
-            await context.tracing.start(screenshots=True, snapshots=True, sources=True)
+        if self.request_filter.active:
+            await context.route("**/*", self.request_filter.handle) # Hands allowed requests on to the response cache
+        elif self.response_cache:
+            await context.route("**/*", self.response_cache.handle)
 
-        # Load cookies if they exist
-        if self.config.cookies_file and os.path.exists(self.config.cookies_file):
-            with open(self.config.cookies_file, 'r') as f:
-                try:
-                    cookies = json.load(f)
-
-                    valid_same_site_values = ['Strict', 'Lax', 'None']
-                    for cookie in cookies:
-                        if 'sameSite' in cookie:
-                            if cookie['sameSite'] not in valid_same_site_values:
-                                logger.warning(
-                                    f"Fixed invalid sameSite value '{cookie['sameSite']}' to 'None' for cookie {cookie.get('name')}"
-                                )
-                                cookie['sameSite'] = 'None'
-                    logger.info(f'🍪  Loaded {len(cookies)} cookies from {self.config.cookies_file}')
-                    await context.add_cookies(cookies)
-
-                except json.JSONDecodeError as e:
-                    logger.error(f'Failed to parse cookies file: {str(e)}')
+        if self.tracer:
+            await self.tracer.start(context, self.context_id)
+
+        if cookies := snapshot_cookies(storage_state):
+            # Existing contexts can only take the snapshot's cookies
+            await context.add_cookies(cookies)
+
+        # Load cookies if they exist (parsed once per file version)
+        if self.config.cookies_file:
+            cookies = self.storage_state_store.load_cookies_file(self.config.cookies_file)
+            if cookies:
+                logger.info(f'🍪  Loaded {len(cookies)} cookies from {self.config.cookies_file}')
+                await context.add_cookies(cookies)
 
         # Expose anti-detection scripts
         await context.add_init_script(
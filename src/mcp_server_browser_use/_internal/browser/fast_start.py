@@ -0,0 +1,240 @@
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+from browser_use.browser.browser import IN_DOCKER
+from browser_use.browser.chrome import CHROME_DISABLE_SECURITY_ARGS, CHROME_DOCKER_ARGS
+from playwright.async_api import Browser as PlaywrightBrowser
+from playwright.async_api import Playwright
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TEMPLATE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "mcp-server-browser-use", "profile-template")
+TEMPLATE_MARKER = "fast_start.json"
+DEVTOOLS_PORT_FILE = "DevToolsActivePort"
+DEVTOOLS_PORT_TIMEOUT = 30.0
+# Linux FICLONE ioctl: a copy-on-write clone of a whole file (btrfs, xfs, bcachefs, overlayfs on those)
+FICLONE = 0x40049409
+
+# Chrome locks, sockets, logs and crash state that must not leak from the template into clones
+VOLATILE_PROFILE_ENTRIES = (
+    "SingletonLock", "SingletonSocket", "SingletonCookie", DEVTOOLS_PORT_FILE,
+    "Crashpad", "BrowserMetrics", "chrome_debug.log", "Default/Sessions", "Default/Current Session",
+    "Default/Current Tabs", "Default/Last Session", "Default/Last Tabs",
+)
+
+# Trimmed flags for a headless server: no first-run UI, no background services, no
+# component/extension/update machinery. Playwright's launch() adds most of these itself;
+# they are spelled out because fast start spawns Chromium directly.
+FAST_START_ARGS = [
+    "--no-first-run",
+    "--no-default-browser-check",
+    "--no-service-autorun",
+    "--password-store=basic",
+    "--use-mock-keychain",
+    "--disable-background-networking",
+    "--disable-background-timer-throttling",
+    "--disable-backgrounding-occluded-windows",
+    "--disable-renderer-backgrounding",
+    "--disable-breakpad",
+    "--disable-client-side-phishing-detection",
+    "--disable-component-extensions-with-background-pages",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-domain-reliability",
+    "--disable-extensions",
+    "--disable-hang-monitor",
+    "--disable-ipc-flooding-protection",
+    "--disable-popup-blocking",
+    "--disable-prompt-on-repost",
+    "--disable-search-engine-choice-screen",
+    "--disable-sync",
+    "--metrics-recording-only",
+    "--safebrowsing-disable-auto-update",
+    "--allow-pre-commit-input",
+    "--disable-blink-features=AutomationControlled",
+    "--disable-features=Translate,OptimizationHints,MediaRouter,DialMediaRouteProvider,AcceptCHFrame,"
+    "CertificateTransparencyComponentUpdater,AutofillServerCommunication,InterestFeedContentSuggestions,"
+    "CalculateNativeWinOcclusion,HeavyAdPrivacyMitigations,PrivacySandboxSettings4,InfiniteSessionRestore",
+    "--export-tagged-pdf",
+    "--log-level=2",
+]
+FAST_START_HEADLESS_ARGS = ["--headless=new", "--hide-scrollbars", "--mute-audio"]
+
+# Rendered once while building the template so GPU/shader and font state is already on disk
+WARMUP_PAGE = (
+    "data:text/html,<html><head><style>body{font-family:sans-serif}canvas{width:200px}</style></head>"
+    "<body><h1>warm</h1><p><b>bold</b> <i>italic</i> <code>mono</code></p><canvas id=c></canvas>"
+    "<script>const g=document.getElementById('c').getContext('2d');g.fillRect(0,0,10,10);"
+    "g.font='16px serif';g.fillText('warm',0,20);</script></body></html>"
+)
+
+
+def fast_start_args(headless: bool, disable_security: bool, extra_args: List[str]) -> List[str]:
+    args = [*FAST_START_ARGS, *(CHROME_DOCKER_ARGS if IN_DOCKER else [])]
+    if headless:
+        args += FAST_START_HEADLESS_ARGS
+    if disable_security:
+        args += CHROME_DISABLE_SECURITY_ARGS
+    return list(dict.fromkeys([*args, *extra_args])) # Drop duplicates, keep order
+
+
+def clone_file(src: str, dst: str):
+    """Copy-on-write clone when the filesystem supports it, otherwise a plain copy."""
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            return
+        except OSError:
+            pass
+        shutil.copyfileobj(fsrc, fdst, 1024 * 1024)
+
+
+def clone_profile(template_dir: str) -> str:
+    """
+    Clones the template into a fresh temporary user-data-dir. Files are reflinked where
+    possible. Hardlinks are deliberately not used: Chrome rewrites SQLite databases,
+    LevelDB logs and cache entries in place, which would corrupt the shared template.
+    """
+    profile_dir = tempfile.mkdtemp(prefix="mcp-browser-profile-")
+    for root, dirs, files in os.walk(template_dir):
+        rel_root = os.path.relpath(root, template_dir)
+        target_root = profile_dir if rel_root == "." else os.path.join(profile_dir, rel_root)
+        for d in dirs:
+            os.makedirs(os.path.join(target_root, d), exist_ok=True)
+        for f in files:
+            if rel_root == "." and f == TEMPLATE_MARKER:
+                continue
+            clone_file(os.path.join(root, f), os.path.join(target_root, f))
+    return profile_dir
+
+
+async def spawn_chromium(executable: str, user_data_dir: str, args: List[str]) -> Tuple[subprocess.Popen, str]:
+    """
+    Starts Chromium with an OS-assigned debugging port and returns (process, cdp_url).
+    The port is read from the DevToolsActivePort file Chrome writes, so there is no
+    port race with other launches and no blocking HTTP polling.
+    """
+    port_file = os.path.join(user_data_dir, DEVTOOLS_PORT_FILE)
+    if os.path.exists(port_file):
+        os.remove(port_file)
+    process = subprocess.Popen(
+        [executable, f"--user-data-dir={user_data_dir}", "--remote-debugging-port=0", *args, "about:blank"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + DEVTOOLS_PORT_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Chromium exited with code {process.returncode} during fast start")
+        try:
+            with open(port_file, "r") as f:
+                port = f.readline().strip()
+            if port:
+                return process, f"http://127.0.0.1:{port}"
+        except FileNotFoundError:
+            pass
+        await asyncio.sleep(0.02)
+    process.kill()
+    raise TimeoutError(f"Chromium did not open a debugging port within {DEVTOOLS_PORT_TIMEOUT}s")
+
+
+class ProfileTemplate:
+    """
+    A warmed Chromium user-data-dir, built once per executable and cloned for every fast-start launch.
+
+    Building runs the browser through first run, renders a warm-up page and shuts it down
+    cleanly so preferences, Local State and the GPU/shader caches are written to disk. The
+    template is built in a scratch directory and renamed into place, so concurrent builders
+    (including other server processes) never see a half-written template.
+    """
+
+    def __init__(self, template_dir: Optional[str] = None):
+        self.template_dir = template_dir or DEFAULT_TEMPLATE_DIR
+        self._lock = asyncio.Lock()
+        self.build_seconds: Optional[float] = None
+
+    def is_ready(self, executable: str) -> bool:
+        try:
+            with open(os.path.join(self.template_dir, TEMPLATE_MARKER), "r") as f:
+                return json.load(f).get("executable") == executable
+        except (OSError, ValueError):
+            return False
+
+    async def ensure(self, playwright: Playwright, executable: str, args: List[str]):
+        if self.is_ready(executable):
+            return
+        async with self._lock:
+            if self.is_ready(executable):
+                return
+            start = time.monotonic()
+            await self._build(playwright, executable, args)
+            self.build_seconds = time.monotonic() - start
+            logger.info(f"Built fast-start profile template at {self.template_dir} in {self.build_seconds:.2f}s")
+
+    def clone(self) -> str:
+        return clone_profile(self.template_dir)
+
+    async def _build(self, playwright: Playwright, executable: str, args: List[str]):
+        parent = os.path.dirname(os.path.abspath(self.template_dir))
+        os.makedirs(parent, exist_ok=True)
+        scratch = tempfile.mkdtemp(prefix=".profile-template-", dir=parent)
+        process = None
+        try:
+            process, cdp_url = await spawn_chromium(executable, scratch, args)
+            browser: PlaywrightBrowser = await playwright.chromium.connect_over_cdp(cdp_url)
+            context = browser.contexts[0] if browser.contexts else await browser.new_context()
+            page = await context.new_page()
+            await page.goto(WARMUP_PAGE)
+            await page.wait_for_timeout(500) # Let first-run prefs and caches flush
+            await page.close()
+            # Browser.close over CDP shuts Chromium down gracefully, persisting Preferences/Local State
+            cdp = await browser.new_browser_cdp_session()
+            await cdp.send("Browser.close")
+            try:
+                await asyncio.wait_for(asyncio.to_thread(process.wait), timeout=10)
+            except asyncio.TimeoutError:
+                process.kill()
+            for entry in VOLATILE_PROFILE_ENTRIES:
+                path = os.path.join(scratch, entry)
+                if os.path.isdir(path):
+                    await asyncio.to_thread(shutil.rmtree, path, ignore_errors=True)
+                elif os.path.exists(path):
+                    os.remove(path)
+            with open(os.path.join(scratch, TEMPLATE_MARKER), "w") as f:
+                json.dump({"executable": executable, "created_at": time.time()}, f)
+
+            stale = None
+            if os.path.exists(self.template_dir):
+                stale = f"{scratch}.stale"
+                os.rename(self.template_dir, stale)
+            try:
+                os.rename(scratch, self.template_dir)
+            except OSError:
+                # Another process won the race; its template is just as good
+                await asyncio.to_thread(shutil.rmtree, scratch, ignore_errors=True)
+            if stale:
+                await asyncio.to_thread(shutil.rmtree, stale, ignore_errors=True)
+        except BaseException:
+            if process and process.poll() is None:
+                process.kill()
+            await asyncio.to_thread(shutil.rmtree, scratch, ignore_errors=True)
+            raise
+
+
+_templates: Dict[str, ProfileTemplate] = {}
+
+
+def get_profile_template(template_dir: Optional[str] = None) -> ProfileTemplate:
+    """Process-wide template per directory, so concurrent launches share one build."""
+    key = os.path.abspath(template_dir or DEFAULT_TEMPLATE_DIR)
+    if key not in _templates:
+        _templates[key] = ProfileTemplate(key)
+    return _templates[key]
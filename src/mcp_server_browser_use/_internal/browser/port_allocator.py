@@ -0,0 +1,96 @@
+import asyncio
+import logging
+import socket
+from typing import Any, Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT_RANGE = (9222, 9321)
+DEVTOOLS_PROBE_TIMEOUT = 2.0
+
+
+def port_is_free(port: int, host: str = "127.0.0.1") -> bool:
+    """A bind test: returns immediately, unlike connecting to the port and waiting for an answer."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        try:
+            s.bind((host, port))
+            return True
+        except OSError:
+            return False
+
+
+async def devtools_port_ready(port: int, host: str = "127.0.0.1", timeout: float = DEVTOOLS_PROBE_TIMEOUT, ssl: bool = False) -> bool:
+    """Whether a DevTools endpoint answers /json/version on the port."""
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port, ssl=ssl or None), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    try:
+        writer.write(f"GET /json/version HTTP/1.1\r\nHost: {host}:{port}\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+        return b" 200 " in status_line
+    except (OSError, asyncio.TimeoutError):
+        return False
+    finally:
+        writer.close()
+
+
+class PortAllocator:
+    """
+    Hands out distinct remote-debugging ports from a range to concurrent browser launches.
+
+    Ports are leased in-process, so parallel launches never pick the same one, and probed
+    with a bind test, so ports held by other programs are skipped without blocking the
+    event loop. The cursor rotates through the range so a just-released port (possibly
+    still in TIME_WAIT) is not handed out again straight away.
+    """
+
+    def __init__(self, start: int, end: int):
+        if not 0 < start <= end < 65536:
+            raise ValueError(f"Invalid debugging port range {start}-{end}")
+        self.start = start
+        self.end = end
+        self._leased: Set[int] = set()
+        self._cursor = start
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> Optional[int]:
+        """A free port from the range, or None if every port is leased or taken."""
+        async with self._lock:
+            size = self.end - self.start + 1
+            for _ in range(size):
+                port = self._cursor
+                self._cursor = self.start if port >= self.end else port + 1
+                if port not in self._leased and port_is_free(port):
+                    self._leased.add(port)
+                    return port
+        logger.warning(f"No free remote-debugging port in {self.start}-{self.end}; launching without one.")
+        return None
+
+    def release(self, port: Optional[int]):
+        if port is not None:
+            self._leased.discard(port)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"range": f"{self.start}-{self.end}", "leased": sorted(self._leased)}
+
+
+_allocators: Dict[Tuple[int, int], PortAllocator] = {}
+
+
+def get_port_allocator(port_range: Optional[Tuple[int, int]] = None) -> PortAllocator:
+    """Process-wide allocator per range, so every browser launched by this server shares the leases."""
+    start, end = port_range or DEFAULT_PORT_RANGE
+    key = (start, end) # Lists from settings and tuples share one allocator
+    if key not in _allocators:
+        _allocators[key] = PortAllocator(start, end)
+    return _allocators[key]
+
+
+def parse_port_range(value: Optional[str]) -> Tuple[int, int]:
+    """'9222-9321' -> (9222, 9321); a single port is a range of one."""
+    if not value:
+        return DEFAULT_PORT_RANGE
+    start, _, end = value.partition("-")
+    return int(start), int(end or start)
@@ -0,0 +1,269 @@
+import asyncio
+import gc
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import psutil
+
+from ..utils.metrics import BROWSER_RECYCLES, ORPHANS_REAPED
+from ..utils.scheduler import CHROME_PROCESS_NAMES
+
+logger = logging.getLogger(__name__)
+
+# Seconds a process of a closed browser may take to exit on its own before it is killed
+ORPHAN_GRACE_SECONDS = 10.0
+
+
+def is_chrome_process(proc: psutil.Process) -> bool:
+    try:
+        return any(name in proc.name().lower() for name in CHROME_PROCESS_NAMES)
+    except psutil.Error:
+        return False
+
+
+def find_chrome_root(debugging_port: int) -> Optional[psutil.Process]:
+    """The browser process (not a renderer or helper) descended from this process that listens on debugging_port."""
+    flag = f"--remote-debugging-port={debugging_port}"
+    try:
+        descendants = psutil.Process().children(recursive=True)
+    except psutil.Error:
+        return None
+    for proc in descendants:
+        try:
+            parent = proc.parent()
+            if is_chrome_process(proc) and flag in proc.cmdline() and not (parent and is_chrome_process(parent)):
+                return proc
+        except psutil.Error:
+            continue
+    return None
+
+
+@dataclass
+class TrackedBrowser:
+    """One supervised Chromium process tree and its latest resource sample."""
+    label: str
+    root: psutil.Process
+    started_at: float = field(default_factory=time.monotonic)
+    members: Dict[int, psutil.Process] = field(default_factory=dict) # pid -> process, kept for cpu_percent deltas
+    processes: int = 0
+    rss_bytes: int = 0
+    peak_rss_bytes: int = 0
+    cpu_percent: float = 0.0
+
+    @property
+    def age_seconds(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "label": self.label,
+            "pid": self.root.pid,
+            "processes": self.processes,
+            "rss_mb": round(self.rss_bytes / 2**20, 1),
+            "peak_rss_mb": round(self.peak_rss_bytes / 2**20, 1),
+            "cpu_percent": round(self.cpu_percent, 1),
+            "age_seconds": round(self.age_seconds, 1),
+        }
+
+
+class ProcessSupervisor:
+    """
+    Tracks the Chromium process tree of every browser this server launches.
+
+    A background task samples each tree every interval seconds (RSS, CPU, process count)
+    and reaps what closed or crashed browsers leave behind: processes that outlive their
+    browser by ORPHAN_GRACE_SECONDS are killed and zombies are collected. It never closes
+    a browser itself; owners ask recycle_reason() between runs and replace browsers that
+    are over max_rss_mb or max_age, so nothing is torn down under a running agent.
+    """
+
+    def __init__(
+            self,
+            interval: float = 15.0,
+            max_rss_mb: Optional[float] = None,
+            max_age: Optional[float] = None,
+            reap_orphans: bool = True,
+    ):
+        self.interval = interval
+        self.max_rss_mb = max_rss_mb
+        self.max_age = max_age
+        self.reap_orphans = reap_orphans
+        self._lock = threading.Lock()
+        self._tracked: Dict[int, TrackedBrowser] = {} # id(browser) -> tree
+        self._retired: Dict[int, Tuple[psutil.Process, float]] = {} # pid -> (process, retired_at)
+        self._task: Optional[asyncio.Task] = None
+        self._collect_garbage = False
+        self.orphans_reaped = 0
+        self.zombies_reaped = 0
+        self.recycled: Dict[str, int] = {}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def configure(self, interval: float, max_rss_mb: Optional[float], max_age: Optional[float], reap_orphans: bool):
+        self.interval = interval
+        self.max_rss_mb = max_rss_mb
+        self.max_age = max_age
+        self.reap_orphans = reap_orphans
+
+    def track(self, browser: Any, root: psutil.Process, label: str):
+        with self._lock:
+            self._tracked[id(browser)] = TrackedBrowser(label=label, root=root, members={root.pid: root})
+
+    def untrack(self, browser: Any):
+        """Stops sampling a browser that is being closed; its processes are reaped if they outlive the grace period."""
+        with self._lock:
+            tracked = self._tracked.pop(id(browser), None)
+            if tracked:
+                self._retire(tracked.members.values())
+            self._collect_garbage = True
+        if not self.running:
+            gc.collect() # Nobody will do it on a later tick
+
+    def _retire(self, processes):
+        now = time.monotonic()
+        for proc in processes:
+            self._retired.setdefault(proc.pid, (proc, now))
+
+    def recycle_reason(self, browser: Any) -> Optional[str]:
+        """'rss' or 'age' if the browser should be replaced before its next run, else None."""
+        with self._lock:
+            tracked = self._tracked.get(id(browser))
+        if tracked is None:
+            return None
+        if self.max_rss_mb and tracked.rss_bytes > self.max_rss_mb * 2**20:
+            return "rss"
+        if self.max_age and tracked.age_seconds > self.max_age:
+            return "age"
+        return None
+
+    def record_recycle(self, reason: str):
+        with self._lock:
+            self.recycled[reason] = self.recycled.get(reason, 0) + 1
+        BROWSER_RECYCLES.inc(reason=reason)
+
+    def sample(self):
+        """Refreshes every tracked tree's stats. Blocking; runs in a worker thread."""
+        with self._lock:
+            tracked_list = list(self._tracked.items())
+        dead = []
+        for key, tracked in tracked_list:
+            if not tracked.root.is_running():
+                dead.append(key)
+                continue
+            try:
+                current = [tracked.root, *tracked.root.children(recursive=True)]
+            except psutil.Error:
+                dead.append(key)
+                continue
+            members: Dict[int, psutil.Process] = {}
+            rss = 0
+            cpu = 0.0
+            for proc in current:
+                proc = tracked.members.get(proc.pid, proc) # Same object as last time, so cpu_percent measures since then
+                try:
+                    with proc.oneshot():
+                        rss += proc.memory_info().rss
+                        cpu += proc.cpu_percent(None)
+                except psutil.Error:
+                    continue
+                members[proc.pid] = proc
+            with self._lock:
+                # Renderers that left the tree while the browser lives on were re-parented after a crash
+                self._retire(proc for pid, proc in tracked.members.items() if pid not in members)
+                tracked.members = members
+                tracked.processes = len(members)
+                tracked.rss_bytes = rss
+                tracked.peak_rss_bytes = max(tracked.peak_rss_bytes, rss)
+                tracked.cpu_percent = cpu
+        if dead:
+            with self._lock:
+                for key in dead:
+                    tracked = self._tracked.pop(key, None)
+                    if tracked:
+                        logger.warning(f"Browser process {tracked.root.pid} ({tracked.label}) exited without being closed.")
+                        self._retire(tracked.members.values())
+
+    def reap(self) -> int:
+        """Collects zombies and kills processes of closed browsers that are still alive after the grace period."""
+        now = time.monotonic()
+        with self._lock:
+            due = [(pid, proc) for pid, (proc, retired_at) in self._retired.items() if now - retired_at >= ORPHAN_GRACE_SECONDS]
+        reaped = 0
+        for pid, proc in due:
+            try:
+                if proc.is_running(): # Also false if the pid was reused by an unrelated process
+                    if proc.status() == psutil.STATUS_ZOMBIE:
+                        proc.wait(timeout=0) # Only succeeds for our own children; others are collected by their new parent
+                        self.zombies_reaped += 1
+                    elif self.reap_orphans:
+                        proc.kill()
+                        reaped += 1
+            except (psutil.Error, ChildProcessError):
+                pass
+            with self._lock:
+                self._retired.pop(pid, None)
+        if reaped:
+            logger.info(f"Killed {reaped} leftover Chrome process(es) of closed browsers.")
+            self.orphans_reaped += reaped
+            ORPHANS_REAPED.inc(reaped)
+        return reaped
+
+    def tick(self):
+        self.sample()
+        self.reap()
+        if self._collect_garbage:
+            self._collect_garbage = False
+            gc.collect() # Once per tick instead of on every browser close
+
+    async def start(self):
+        if self.running or self.interval <= 0:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.tick)
+                for tracked in self.browsers():
+                    if self.max_rss_mb and tracked.rss_bytes > self.max_rss_mb * 2**20:
+                        logger.info(f"Browser {tracked.label} uses {tracked.rss_bytes / 2**20:.0f}MB RSS; it will be recycled after its current run.")
+            except Exception as e:
+                logger.error(f"Process supervisor tick failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def browsers(self) -> List[TrackedBrowser]:
+        with self._lock:
+            return list(self._tracked.values())
+
+    def stats(self) -> Dict[str, Any]:
+        browsers = [tracked.snapshot() for tracked in self.browsers()]
+        with self._lock:
+            return {
+                "browsers": browsers,
+                "total_rss_mb": round(sum(b["rss_mb"] for b in browsers), 1),
+                "max_rss_mb": self.max_rss_mb,
+                "max_age": self.max_age,
+                "recycled": dict(self.recycled),
+                "pending_reap": len(self._retired),
+                "orphans_reaped": self.orphans_reaped,
+                "zombies_reaped": self.zombies_reaped,
+            }
+
+
+_supervisor = ProcessSupervisor()
+
+
+def get_process_supervisor() -> ProcessSupervisor:
+    """The process-wide supervisor every CustomBrowser registers its Chromium tree with."""
+    return _supervisor
@@ -0,0 +1,197 @@
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+from playwright.async_api import Request, Route
+
+from ..utils.metrics import BLOCKED_BYTES, REQUESTS_BLOCKED
+from .response_cache import FetchFailed, ResponseCache, abort_failed_fetch
+
+logger = logging.getLogger(__name__)
+
+# Ad, analytics and tracking hosts; a host matches if it equals an entry or is a subdomain of one
+AD_AND_ANALYTICS_DOMAINS = (
+    "doubleclick.net", "googlesyndication.com", "googleadservices.com", "adservice.google.com",
+    "google-analytics.com", "googletagmanager.com", "googletagservices.com", "connect.facebook.net",
+    "amazon-adsystem.com", "adnxs.com", "criteo.com", "criteo.net", "taboola.com", "outbrain.com",
+    "scorecardresearch.com", "quantserve.com", "hotjar.com", "clarity.ms", "fullstory.com",
+    "segment.io", "cdn.segment.com", "mixpanel.com", "amplitude.com", "nr-data.net", "bat.bing.com",
+)
+
+# Preset -> (blocked Playwright resource types, block ad/analytics domains, max response bytes)
+REQUEST_POLICY_PRESETS: Dict[str, Dict[str, Any]] = {
+    "full": {"resource_types": (), "block_ads": False, "max_resource_bytes": None},
+    # Screenshots still need images, but not fonts, video/audio or oversized images
+    "vision-lite": {"resource_types": ("media", "font", "texttrack"), "block_ads": True, "max_resource_bytes": 2 * 1024 * 1024},
+    # DOM-only agents: stylesheets and scripts stay because they decide visibility and interactivity
+    "text-only": {"resource_types": ("image", "media", "font", "texttrack", "manifest"), "block_ads": True, "max_resource_bytes": 1024 * 1024},
+}
+REQUEST_POLICIES = (*REQUEST_POLICY_PRESETS, "auto")
+
+# Only these types are fetched up front to enforce the size limit; documents, scripts and
+# XHR pass straight through so the check never delays what the page needs to run
+SIZE_CHECKED_RESOURCE_TYPES = frozenset({"image", "media", "font", "other"})
+
+# Rough median transfer size per resource type, used to estimate what requests that were
+# never sent would have cost
+ESTIMATED_RESOURCE_BYTES = {
+    "document": 30_000, "stylesheet": 15_000, "script": 20_000, "image": 25_000, "media": 500_000,
+    "font": 30_000, "texttrack": 5_000, "xhr": 3_000, "fetch": 3_000, "manifest": 1_000, "other": 5_000,
+}
+
+
+def resolve_request_policy(name: Optional[str], use_vision: bool) -> str:
+    """Maps "auto" to vision-lite or text-only depending on whether the agent sends screenshots."""
+    name = (name or "full").strip().lower()
+    if name == "auto":
+        return "vision-lite" if use_vision else "text-only"
+    if name not in REQUEST_POLICY_PRESETS:
+        raise ValueError(f"Unknown request policy '{name}'. Expected one of: {', '.join(REQUEST_POLICIES)}")
+    return name
+
+
+def parse_domains(value: Optional[str]) -> List[str]:
+    """Comma-separated domain list from a setting."""
+    return [d.strip().lower().lstrip(".") for d in (value or "").split(",") if d.strip()]
+
+
+@dataclass
+class RequestFilterStats:
+    requests: int = 0
+    allowed: int = 0
+    failed: int = 0 # Not handed to the page: network errors (aborted at once) or routes gone mid-request
+    blocked: Dict[str, int] = field(default_factory=dict) # reason -> count
+    blocked_bytes: int = 0 # Measured: responses dropped by the size limit
+    estimated_saved_bytes: int = 0 # Requests aborted before being sent, estimated per resource type
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "allowed": self.allowed,
+            "failed": self.failed,
+            "blocked": dict(self.blocked),
+            "blocked_total": sum(self.blocked.values()),
+            "blocked_bytes": self.blocked_bytes,
+            "estimated_saved_bytes": self.estimated_saved_bytes,
+        }
+
+
+class RequestFilter:
+    """
+    Routing policy for one browser context: aborts requests by resource type, domain and
+    response size, and counts what it blocked.
+
+    Installing a route makes Playwright bypass the browser's HTTP cache for the context, so
+    the "full" policy with no extra domains or size limit installs nothing at all. Requests
+    that pass the filter go on to response_cache when one is attached.
+    """
+
+    def __init__(
+            self,
+            policy: str = "full",
+            blocked_resource_types: Optional[Iterable[str]] = None,
+            blocked_domains: Iterable[str] = (),
+            max_resource_bytes: Optional[int] = None,
+    ):
+        self.policy = resolve_request_policy(policy, use_vision=True)
+        preset = REQUEST_POLICY_PRESETS[self.policy]
+        self.resource_types: FrozenSet[str] = frozenset(
+            blocked_resource_types if blocked_resource_types is not None else preset["resource_types"])
+        domains = [*(AD_AND_ANALYTICS_DOMAINS if preset["block_ads"] else ()), *blocked_domains]
+        self.domains: FrozenSet[str] = frozenset(d.lower().lstrip(".") for d in domains)
+        self.max_resource_bytes: Optional[int] = max_resource_bytes if max_resource_bytes is not None else preset["max_resource_bytes"]
+        self.stats = RequestFilterStats()
+        self.response_cache: Optional[ResponseCache] = None
+
+    @property
+    def active(self) -> bool:
+        return bool(self.resource_types or self.domains or self.max_resource_bytes)
+
+    def reset_stats(self):
+        self.stats = RequestFilterStats()
+
+    def _domain_blocked(self, url: str) -> bool:
+        host = (urlsplit(url).hostname or "").lower()
+        while host:
+            if host in self.domains:
+                return True
+            _, _, host = host.partition(".")
+        return False
+
+    def _record_block(self, reason: str, resource_type: str, measured_bytes: Optional[int] = None):
+        self.stats.blocked[reason] = self.stats.blocked.get(reason, 0) + 1
+        REQUESTS_BLOCKED.inc(policy=self.policy, reason=reason)
+        if measured_bytes is not None:
+            self.stats.blocked_bytes += measured_bytes
+            BLOCKED_BYTES.inc(measured_bytes, policy=self.policy, kind="measured")
+        else:
+            estimate = ESTIMATED_RESOURCE_BYTES.get(resource_type, ESTIMATED_RESOURCE_BYTES["other"])
+            self.stats.estimated_saved_bytes += estimate
+            BLOCKED_BYTES.inc(estimate, policy=self.policy, kind="estimated")
+
+    async def handle(self, route: Route, request: Request):
+        self.stats.requests += 1
+        resource_type = request.resource_type
+        try:
+            if request.is_navigation_request():
+                if not await self._forward(route, request): # Never block the page itself
+                    return
+            elif resource_type in self.resource_types:
+                self._record_block("resource_type", resource_type)
+                await route.abort("blockedbyclient")
+                return
+            elif self.domains and self._domain_blocked(request.url):
+                self._record_block("domain", resource_type)
+                await route.abort("blockedbyclient")
+                return
+            elif self.max_resource_bytes and resource_type in SIZE_CHECKED_RESOURCE_TYPES:
+                if not await self._enforce_size_limit(route, request):
+                    return
+            elif not await self._forward(route, request):
+                return
+        except FetchFailed as e:
+            self.stats.failed += 1
+            await abort_failed_fetch(route, request, e)
+            return
+        except Exception as e:
+            # The route is already gone when its page or context closes mid-request
+            logger.debug(f"Request filter could not handle {request.url}: {e}")
+            return
+        self.stats.allowed += 1
+
+    async def _forward(self, route: Route, request: Request) -> bool:
+        if self.response_cache:
+            if not await self.response_cache.handle(route, request):
+                self.stats.failed += 1
+                return False
+            return True
+        await route.fallback()
+        return True
+
+    async def _enforce_size_limit(self, route: Route, request: Request) -> bool:
+        """Fetches the response and only hands it to the page if it is within the limit."""
+        limit = self.max_resource_bytes
+        if limit is None:
+            return await self._forward(route, request)
+        resource_type = request.resource_type
+        if self.response_cache and self.response_cache.accepts(request):
+            cached = await self.response_cache.fetch(route, request)
+            if len(cached.body) > limit:
+                self._record_block("size", resource_type, measured_bytes=len(cached.body))
+                await route.abort("blockedbyclient")
+                return False
+            await route.fulfill(status=cached.status, headers=cached.headers, body=cached.body)
+            return True
+        try:
+            response = await route.fetch()
+            length = response.headers.get("content-length")
+            size = int(length) if length and length.isdigit() else len(await response.body())
+        except Exception as e:
+            raise FetchFailed(str(e)) from e
+        if size > limit:
+            self._record_block("size", resource_type, measured_bytes=size)
+            await route.abort("blockedbyclient")
+            return False
+        await route.fulfill(response=response)
+        return True
@@ -0,0 +1,298 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Optional, Set
+
+from playwright.async_api import Request, Route
+
+from ..utils.metrics import RESPONSE_CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "mcp-server-browser-use", "http-cache")
+ENTRY_SUFFIX = ".entry"
+STATIC_RESOURCE_TYPES = frozenset({"stylesheet", "script", "font", "image"})
+CACHEABLE_STATUSES = frozenset({200, 203})
+# Hop-by-hop headers, plus the ones that no longer describe the (already decoded) body
+DROPPED_HEADERS = frozenset({"connection", "keep-alive", "transfer-encoding", "content-encoding", "content-length", "age"})
+MAX_AGE_PATTERN = re.compile(r"(?:^|,)\s*(s-maxage|max-age)\s*=\s*\"?(\d+)", re.IGNORECASE)
+
+
+class FetchFailed(Exception):
+    """The network fetch for a route failed; the route is still pending and has to be aborted."""
+
+
+async def abort_failed_fetch(route: Route, request: Request, error: Exception):
+    """Fails the request at once, instead of leaving the page waiting for it until Playwright times out."""
+    logger.debug(f"Fetching {request.url} failed: {error}")
+    try:
+        await route.abort("failed")
+    except Exception:
+        pass # The route is already gone
+
+
+@dataclass
+class CachedResponse:
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+
+
+def cache_control_directives(headers: Dict[str, str]) -> Set[str]:
+    return {d.strip().split("=", 1)[0] for d in headers.get("cache-control", "").lower().split(",") if d.strip()}
+
+
+def cache_control_ttl(headers: Dict[str, str]) -> Optional[float]:
+    """
+    Freshness lifetime in seconds from Cache-Control/Expires, 0 if the response must not be
+    reused without revalidation, or None if the headers say nothing.
+    """
+    if cache_control_directives(headers) & {"no-store", "no-cache", "private"}:
+        return 0
+    cache_control = headers.get("cache-control", "")
+    ages = dict((name.lower(), int(value)) for name, value in MAX_AGE_PATTERN.findall(cache_control))
+    if "s-maxage" in ages:
+        return ages["s-maxage"]
+    if "max-age" in ages:
+        return ages["max-age"]
+    if "expires" in headers:
+        try:
+            return max(0.0, parsedate_to_datetime(headers["expires"]).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return 0 # An invalid Expires means "already expired"
+    return None
+
+
+class ResponseCache:
+    """
+    Disk-backed HTTP response cache shared by browser contexts through Playwright routing.
+
+    Each response is one file (a JSON header line followed by the body) written atomically,
+    so concurrent contexts, and other server processes pointed at the same directory, only
+    ever read complete entries. Freshness follows Cache-Control/Expires; static assets can
+    be given a fixed TTL instead. Responses that set cookies, vary on anything but
+    Accept-Encoding, or answer credentialed or range requests are never stored. The total
+    size is bounded with least-recently-used eviction.
+    """
+
+    def __init__(
+            self,
+            cache_dir: Optional[str] = None,
+            max_bytes: int = 512 * 1024 * 1024,
+            static_ttl: Optional[float] = None,
+            respect_cache_control: bool = True,
+            default_ttl: float = 300.0,
+    ):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max(1, max_bytes // 8)
+        self.static_ttl = static_ttl
+        self.respect_cache_control = respect_cache_control
+        self.default_ttl = default_ttl # Used when Cache-Control is ignored and no static TTL applies
+        self._lock = threading.Lock()
+        self._index: "OrderedDict[str, int]" = OrderedDict() # key -> size, least recently used first
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.stores = 0
+        self.evictions = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(ENTRY_SUFFIX):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, name[:-len(ENTRY_SUFFIX)], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._total_bytes += size
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + ENTRY_SUFFIX)
+
+    @staticmethod
+    def cache_key(request: Request) -> str:
+        return hashlib.sha256(f"{request.method} {request.url}".encode()).hexdigest()
+
+    @staticmethod
+    def accepts(request: Request) -> bool:
+        if request.method != "GET" or not request.url.startswith(("http://", "https://")):
+            return False
+        headers = request.headers
+        return "range" not in headers and "authorization" not in headers
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._index),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+            }
+
+    def _ttl_for(self, resource_type: str, status: int, headers: Dict[str, str]) -> float:
+        """Seconds the response may be served from the cache; 0 means do not store it."""
+        if status not in CACHEABLE_STATUSES or "set-cookie" in headers:
+            return 0
+        vary = {v.strip().lower() for v in headers.get("vary", "").split(",") if v.strip()}
+        if vary - {"accept-encoding"}:
+            return 0
+        if cache_control_directives(headers) & {"no-store", "private"}:
+            return 0 # Never persisted in a shared cache, whatever the overrides say
+        if self.static_ttl is not None and resource_type in STATIC_RESOURCE_TYPES:
+            return self.static_ttl
+        if not self.respect_cache_control:
+            return self.default_ttl
+        return cache_control_ttl(headers) or 0
+
+    def _read(self, key: str) -> Optional[CachedResponse]:
+        try:
+            with open(self._path(key), "rb") as f:
+                meta = json.loads(f.readline())
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        if meta.get("expires_at", 0) <= time.time():
+            self._remove(key)
+            return None
+        try:
+            os.utime(self._path(key)) # Persist recency for the LRU order of the next process
+        except OSError:
+            pass
+        return CachedResponse(status=meta["status"], headers=meta["headers"], body=body)
+
+    def _write(self, key: str, response: CachedResponse, ttl: float, url: str):
+        meta = {"url": url, "status": response.status, "headers": response.headers, "expires_at": time.time() + ttl}
+        header = json.dumps(meta).encode() + b"\n"
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(header)
+                f.write(response.body)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        size = len(header) + len(response.body)
+        with self._lock:
+            self._total_bytes += size - self._index.pop(key, 0)
+            self._index[key] = size
+            self.stores += 1
+            victims = []
+            while self._total_bytes > self.max_bytes and len(self._index) > 1:
+                victim, victim_size = self._index.popitem(last=False)
+                self._total_bytes -= victim_size
+                self.evictions += 1
+                victims.append(victim)
+        for victim in victims:
+            try:
+                os.remove(self._path(victim))
+            except OSError:
+                pass
+
+    def _remove(self, key: str):
+        with self._lock:
+            self._total_bytes -= self._index.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _touch(self, key: str):
+        with self._lock:
+            if key in self._index:
+                self._index.move_to_end(key)
+
+    def _count(self, result: str):
+        with self._lock:
+            if result == "hit":
+                self.hits += 1
+            elif result == "miss":
+                self.misses += 1
+            else:
+                self.bypassed += 1
+        RESPONSE_CACHE_REQUESTS.inc(result=result)
+
+    async def fetch(self, route: Route, request: Request) -> CachedResponse:
+        """The response for an accepted request, from disk if fresh, otherwise from the network (and stored if cacheable)."""
+        key = self.cache_key(request)
+        cached = await asyncio.to_thread(self._read, key)
+        if cached is not None:
+            self._touch(key)
+            self._count("hit")
+            return cached
+        self._count("miss")
+        try:
+            response = await route.fetch()
+            body = await response.body()
+        except Exception as e:
+            raise FetchFailed(str(e)) from e
+        headers = {name.lower(): value for name, value in response.headers.items()}
+        fetched = CachedResponse(response.status, {k: v for k, v in headers.items() if k not in DROPPED_HEADERS}, body)
+        ttl = self._ttl_for(request.resource_type, response.status, headers) if len(body) <= self.max_entry_bytes else 0
+        if ttl > 0:
+            try:
+                await asyncio.to_thread(self._write, key, fetched, ttl, request.url)
+            except OSError as e:
+                logger.warning(f"Could not store {request.url} in the response cache: {e}")
+        return fetched
+
+    async def handle(self, route: Route, request: Request) -> bool:
+        """Route handler: serves accepted requests through the cache and lets everything else through; False if it failed."""
+        try:
+            if not self.accepts(request):
+                self._count("bypass")
+                await route.fallback()
+                return True
+            response = await self.fetch(route, request)
+            await route.fulfill(status=response.status, headers=response.headers, body=response.body)
+            return True
+        except FetchFailed as e:
+            await abort_failed_fetch(route, request, e)
+        except Exception as e:
+            # The route is already gone when its page or context closes mid-request
+            logger.debug(f"Response cache could not handle {request.url}: {e}")
+        return False
+
+
+_caches: Dict[str, ResponseCache] = {}
+
+
+def get_response_cache(
+        cache_dir: Optional[str] = None,
+        max_bytes: int = 512 * 1024 * 1024,
+        static_ttl: Optional[float] = None,
+        respect_cache_control: bool = True,
+) -> ResponseCache:
+    """Process-wide cache per directory, so every context shares one index and one size budget."""
+    key = os.path.abspath(cache_dir or DEFAULT_CACHE_DIR)
+    if key not in _caches:
+        _caches[key] = ResponseCache(key, max_bytes, static_ttl, respect_cache_control)
+    return _caches[key]
+
+
+def response_caches() -> List[ResponseCache]:
+    return list(_caches.values())
@@ -0,0 +1,251 @@
+import base64
+import logging
+import math
+import struct
+import zlib
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from playwright.async_api import Page
+
+from ..utils.metrics import SCREENSHOT_BYTES, SCREENSHOT_FRAMES, VISION_TOKENS_SAVED
+
+logger = logging.getLogger(__name__)
+
+SCREENSHOT_FORMATS = ("png", "jpeg", "webp")
+
+THUMBNAIL_WIDTH = 64 # Device pixels of the PNG the perceptual hash is computed from
+MAX_CONSECUTIVE_DUPLICATES = 3 # Resend the image after this many skipped frames, even if nothing changed
+MAX_IMAGE_EDGE = 1568 # Providers downscale larger images before counting tokens
+
+
+def estimate_image_tokens(width: int, height: int) -> int:
+    """Vision tokens for an image, using Anthropic's width * height / 750 after its long-edge resize; other providers are similar."""
+    if width <= 0 or height <= 0:
+        return 0
+    shrink = min(1.0, MAX_IMAGE_EDGE / max(width, height))
+    return math.ceil(width * shrink * height * shrink / 750)
+
+
+def _png_luminance(data: bytes) -> Tuple[int, int, List[List[float]]]:
+    """Decodes an 8-bit, non-interlaced PNG (what Chromium writes) into rows of luminance values."""
+    if data[:8] != b"\x89PNG\r\n\x1a\n":
+        raise ValueError("Not a PNG")
+    pos, idat = 8, []
+    width = height = depth = color = interlace = 0
+    while pos < len(data):
+        length, kind = struct.unpack(">I4s", data[pos:pos + 8])
+        chunk = data[pos + 8:pos + 8 + length]
+        if kind == b"IHDR":
+            width, height, depth, color, _, _, interlace = struct.unpack(">IIBBBBB", chunk)
+        elif kind == b"IDAT":
+            idat.append(chunk)
+        elif kind == b"IEND":
+            break
+        pos += 12 + length
+    channels = {0: 1, 2: 3, 4: 2, 6: 4}.get(color)
+    if depth != 8 or interlace or channels is None:
+        raise ValueError(f"Unsupported PNG (depth {depth}, color type {color}, interlace {interlace})")
+    raw = zlib.decompress(b"".join(idat))
+    stride = width * channels
+    rows: List[List[float]] = []
+    previous = bytearray(stride)
+    for y in range(height):
+        offset = y * (stride + 1)
+        kind, line = raw[offset], bytearray(raw[offset + 1:offset + 1 + stride])
+        for i in range(stride):
+            left = line[i - channels] if i >= channels else 0
+            up = previous[i]
+            if kind == 1:
+                line[i] = (line[i] + left) & 0xFF
+            elif kind == 2:
+                line[i] = (line[i] + up) & 0xFF
+            elif kind == 3:
+                line[i] = (line[i] + (left + up) // 2) & 0xFF
+            elif kind == 4:
+                upper_left = previous[i - channels] if i >= channels else 0
+                p = left + up - upper_left
+                pa, pb, pc = abs(p - left), abs(p - up), abs(p - upper_left)
+                line[i] = (line[i] + (left if pa <= pb and pa <= pc else up if pb <= pc else upper_left)) & 0xFF
+        previous = line
+        if channels < 3:
+            rows.append([float(line[x * channels]) for x in range(width)])
+        else:
+            rows.append([0.299 * line[x * channels] + 0.587 * line[x * channels + 1] + 0.114 * line[x * channels + 2] for x in range(width)])
+    return width, height, rows
+
+
+def difference_hash(png: bytes) -> int:
+    """64-bit dHash: the image shrunk to 9x8 grey cells, one bit per horizontally adjacent pair."""
+    width, height, rows = _png_luminance(png)
+    cells = []
+    for cy in range(8):
+        y0, y1 = cy * height // 8, max((cy + 1) * height // 8, cy * height // 8 + 1)
+        row = []
+        for cx in range(9):
+            x0, x1 = cx * width // 9, max((cx + 1) * width // 9, cx * width // 9 + 1)
+            values = [rows[y][x] for y in range(y0, min(y1, height)) for x in range(x0, min(x1, width))]
+            row.append(sum(values) / len(values) if values else 0.0)
+        cells.append(row)
+    bits = 0
+    for row in cells:
+        for cx in range(8):
+            bits = (bits << 1) | (row[cx] < row[cx + 1])
+    return bits
+
+
+@dataclass
+class ScreenshotStats:
+    frames: int = 0
+    sent: int = 0
+    duplicates: int = 0 # Frames whose image was not sent because the page looked unchanged
+    bytes_sent: int = 0
+    duplicate_bytes: int = 0 # Encoded size of the frames that were not sent
+    tokens_sent: int = 0
+    tokens_saved: int = 0 # Against sending every frame at full resolution
+    estimated_png_bytes: int = 0 # What full-resolution PNGs would have weighed, from the run's first frame
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "frames": self.frames,
+            "sent": self.sent,
+            "duplicates": self.duplicates,
+            "bytes_sent": self.bytes_sent,
+            "estimated_saved_bytes": max(0, self.estimated_png_bytes - self.bytes_sent),
+            "tokens_sent": self.tokens_sent,
+            "tokens_saved": self.tokens_saved,
+        }
+
+
+@dataclass
+class ScreenshotFrame:
+    """The latest capture, as the agent's state message should present it."""
+    mime_type: str
+    width: int
+    height: int
+    duplicate: bool = False
+
+
+class ScreenshotPipeline:
+    """
+    Captures the screenshots vision agents send to the LLM.
+
+    Frames are taken with CDP Page.captureScreenshot, which encodes JPEG or WebP and
+    downscales (clip scale) in the browser, so the full-resolution PNG is never built.
+    With dedupe, each frame is also captured as a tiny PNG whose difference hash is
+    compared with the last frame that was sent; a near-identical page is marked as a
+    duplicate and the agent sends a note instead of the image. Savings are counted
+    against full-resolution PNGs, whose size is measured once per run.
+    """
+
+    def __init__(
+            self,
+            image_format: str = "png",
+            quality: int = 80,
+            max_width: Optional[int] = None,
+            crop_to_viewport: bool = False,
+            dedupe: bool = False,
+            dedupe_threshold: int = 2,
+    ):
+        if image_format not in SCREENSHOT_FORMATS:
+            raise ValueError(f"Unknown screenshot format '{image_format}'. Expected one of: {', '.join(SCREENSHOT_FORMATS)}")
+        self.image_format = image_format
+        self.quality = max(1, min(100, quality))
+        self.max_width = max_width
+        self.crop_to_viewport = crop_to_viewport
+        self.dedupe = dedupe
+        self.dedupe_threshold = dedupe_threshold
+        self.stats = ScreenshotStats()
+        self.last_frame: Optional[ScreenshotFrame] = None
+        self._last_hash: Optional[int] = None
+        self._consecutive_duplicates = 0
+        self._png_ratio: Optional[float] = None # Full-resolution PNG bytes per encoded byte
+
+    @property
+    def active(self) -> bool:
+        """Whether capture differs from Playwright's default full-resolution PNG."""
+        return self.image_format != "png" or bool(self.max_width) or self.crop_to_viewport or self.dedupe
+
+    def reset_stats(self):
+        self.stats = ScreenshotStats()
+        self.last_frame = None
+        self._last_hash = None
+        self._consecutive_duplicates = 0
+        self._png_ratio = None
+
+    async def capture(self, page: Page) -> str:
+        """A base64 screenshot of the page's viewport; details of the frame end up in last_frame."""
+        metrics = await page.evaluate(
+            "() => ({x: visualViewport.pageLeft, y: visualViewport.pageTop, width: visualViewport.width,"
+            " height: visualViewport.height, windowWidth: innerWidth, windowHeight: innerHeight, dpr: devicePixelRatio})")
+        dpr = metrics["dpr"] or 1
+        if self.crop_to_viewport:
+            clip = {"x": metrics["x"], "y": metrics["y"], "width": metrics["width"], "height": metrics["height"]}
+        else:
+            clip = {"x": metrics["x"], "y": metrics["y"], "width": metrics["windowWidth"], "height": metrics["windowHeight"]}
+        full_width, full_height = round(metrics["windowWidth"] * dpr), round(metrics["windowHeight"] * dpr)
+        scale = 1.0
+        if self.max_width and clip["width"] * dpr > self.max_width:
+            scale = self.max_width / (clip["width"] * dpr)
+        width, height = round(clip["width"] * dpr * scale), round(clip["height"] * dpr * scale)
+
+        cdp = await page.context.new_cdp_session(page)
+        try:
+            params: Dict[str, Any] = {"format": self.image_format, "clip": {**clip, "scale": scale}}
+            if self.image_format != "png":
+                params["quality"] = self.quality
+            data = (await cdp.send("Page.captureScreenshot", params))["data"]
+            encoded_bytes = len(data) * 3 // 4
+
+            if self._png_ratio is None:
+                if self.image_format == "png" and scale == 1.0 and not self.crop_to_viewport:
+                    self._png_ratio = 1.0
+                else:
+                    png = await cdp.send("Page.captureScreenshot", {"format": "png"})
+                    self._png_ratio = len(png["data"]) / max(len(data), 1)
+
+            duplicate = False
+            if self.dedupe:
+                thumbnail = await cdp.send(
+                    "Page.captureScreenshot", {"format": "png", "clip": {**clip, "scale": THUMBNAIL_WIDTH / (clip["width"] * dpr)}})
+                try:
+                    frame_hash = difference_hash(base64.b64decode(thumbnail["data"]))
+                except Exception as e:
+                    logger.debug(f"Could not hash screenshot: {e}")
+                    frame_hash = None
+                if (
+                        frame_hash is not None and self._last_hash is not None
+                        and bin(frame_hash ^ self._last_hash).count("1") <= self.dedupe_threshold
+                        and self._consecutive_duplicates < MAX_CONSECUTIVE_DUPLICATES
+                ):
+                    duplicate = True
+                    self._consecutive_duplicates += 1
+                else:
+                    self._last_hash = frame_hash
+                    self._consecutive_duplicates = 0
+        finally:
+            try:
+                await cdp.detach()
+            except Exception:
+                pass
+
+        full_tokens = estimate_image_tokens(full_width, full_height)
+        self.stats.frames += 1
+        self.stats.estimated_png_bytes += round(encoded_bytes * self._png_ratio)
+        if duplicate:
+            self.stats.duplicates += 1
+            self.stats.duplicate_bytes += encoded_bytes
+            self.stats.tokens_saved += full_tokens
+            SCREENSHOT_FRAMES.inc(outcome="duplicate")
+            VISION_TOKENS_SAVED.inc(full_tokens)
+        else:
+            tokens = estimate_image_tokens(width, height)
+            self.stats.sent += 1
+            self.stats.bytes_sent += encoded_bytes
+            self.stats.tokens_sent += tokens
+            self.stats.tokens_saved += full_tokens - tokens
+            SCREENSHOT_FRAMES.inc(outcome="sent")
+            SCREENSHOT_BYTES.inc(encoded_bytes, format=self.image_format)
+            VISION_TOKENS_SAVED.inc(max(0, full_tokens - tokens))
+        self.last_frame = ScreenshotFrame(f"image/{self.image_format}", width, height, duplicate)
+        return data
@@ -0,0 +1,174 @@
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+from playwright.async_api import Page
+
+from .custom_browser import CustomBrowser, CustomBrowserConfig
+from .custom_context import CustomBrowserContext, CustomBrowserContextConfig
+from .process_supervisor import get_process_supervisor
+
+logger = logging.getLogger(__name__)
+
+
+class TabCrashGuard:
+    """
+    Replaces crashed tabs of one context so its agent keeps running.
+
+    Each page runs in its own renderer process, so a crash only takes down that tab. The
+    guard opens a fresh tab in the same context, makes it the agent's active tab and
+    reloads the URL that crashed. After max_restarts the replacement tab is left blank
+    instead, so a page that crashes on every load cannot loop forever.
+    """
+
+    def __init__(self, context: CustomBrowserContext, max_restarts: int = 2, on_crash=None):
+        self.context = context
+        self.max_restarts = max_restarts
+        self.on_crash = on_crash
+        self.crashes = 0
+        self.restarts = 0
+        self._tasks: set[asyncio.Task] = set()
+
+    async def attach(self):
+        session = await self.context.get_session()
+        for page in session.context.pages:
+            self._watch(page)
+        session.context.on("page", self._watch)
+
+    def _watch(self, page: Page):
+        page.on("crash", self._on_crash)
+
+    def _on_crash(self, page: Page):
+        self.crashes += 1
+        if self.on_crash:
+            self.on_crash()
+        task = asyncio.create_task(self._replace(page))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _replace(self, crashed: Page):
+        url = crashed.url
+        try:
+            session = await self.context.get_session()
+            fresh = await session.context.new_page()
+            if self.context.active_tab is crashed or self.context.active_tab is None:
+                self.context.active_tab = fresh
+                self.context.state.target_id = None
+                session.cached_state = None
+            try:
+                await crashed.close()
+            except Exception:
+                pass # Crashed pages cannot always be closed cleanly
+            if self.restarts < self.max_restarts and url.startswith(("http://", "https://")):
+                self.restarts += 1
+                logger.warning(f"Tab crashed on {url}; reopened it in a fresh tab (restart {self.restarts}/{self.max_restarts}).")
+                await fresh.goto(url, wait_until="domcontentloaded")
+            else:
+                logger.warning(f"Tab crashed on {url}; replaced it with a blank tab.")
+        except Exception as e:
+            logger.error(f"Could not replace crashed tab ({url}): {e}")
+
+    async def close(self):
+        for task in list(self._tasks):
+            task.cancel()
+
+
+class SharedBrowser:
+    """
+    One browser shared by concurrent deep research sub-agents instead of a browser per sub-agent.
+
+    Every sub-agent leases its own context (isolated cookies and storage), so memory grows
+    with open pages rather than with browser process trees. Crashed tabs are replaced by a
+    TabCrashGuard without touching sibling contexts. If the browser itself dies, running
+    sub-agents fail but the next lease relaunches it. A browser the process supervisor
+    reports over its memory or age limit is closed once its last context is, and the
+    next lease relaunches it too.
+    """
+
+    def __init__(self, config: CustomBrowserConfig, max_tab_restarts: int = 2):
+        self.config = config
+        self.max_tab_restarts = max_tab_restarts
+        self._browser: Optional[CustomBrowser] = None
+        self._lock = asyncio.Lock()
+        self._guards: Dict[int, TabCrashGuard] = {}
+        self._opening = 0 # new_context calls that may still be using the current browser
+        self.launches = 0
+        self.contexts_created = 0
+        self.tab_crashes = 0
+        self._closed_restarts = 0 # Restarts of guards already closed
+
+    async def get_browser(self) -> CustomBrowser:
+        async with self._lock:
+            if self._browser is not None and not self._browser.is_connected():
+                logger.warning("Shared research browser disconnected; relaunching it.")
+                stale, self._browser = self._browser, None
+                try:
+                    await stale.close()
+                except Exception as e:
+                    logger.debug(f"Error closing disconnected shared browser: {e}")
+            if self._browser is None:
+                browser = CustomBrowser(config=self.config)
+                await browser.get_playwright_browser() # Launch under the lock so concurrent leases share it
+                self._browser = browser
+                self.launches += 1
+            return self._browser
+
+    async def new_context(self, config: CustomBrowserContextConfig) -> CustomBrowserContext:
+        """A new context on the shared browser, with its tabs guarded against renderer crashes."""
+        self._opening += 1
+        try:
+            browser = await self.get_browser()
+            context = await browser.new_context(config=config)
+            guard = TabCrashGuard(context, self.max_tab_restarts, on_crash=self._count_crash)
+            try:
+                await guard.attach()
+            except Exception:
+                await context.close()
+                raise
+            self._guards[id(context)] = guard
+        finally:
+            self._opening -= 1
+        self.contexts_created += 1
+        return context
+
+    def _count_crash(self):
+        self.tab_crashes += 1
+
+    async def close_context(self, context: CustomBrowserContext):
+        guard = self._guards.pop(id(context), None)
+        if guard:
+            self._closed_restarts += guard.restarts
+            await guard.close()
+        await context.close()
+        await self._recycle_if_over_limit()
+
+    async def _recycle_if_over_limit(self):
+        """Closes the browser once its last context is gone if the supervisor reports it over a limit; the next lease relaunches."""
+        supervisor = get_process_supervisor()
+        stale = None
+        async with self._lock:
+            if self._browser is not None and not self._guards and not self._opening:
+                if reason := supervisor.recycle_reason(self._browser):
+                    logger.info(f"Recycling shared research browser over its {reason} limit.")
+                    supervisor.record_recycle(reason)
+                    stale, self._browser = self._browser, None
+        if stale:
+            await stale.close()
+
+    async def close(self):
+        async with self._lock:
+            browser, self._browser = self._browser, None
+        for guard in self._guards.values():
+            await guard.close()
+        self._guards.clear()
+        if browser:
+            await browser.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "launches": self.launches,
+            "contexts_created": self.contexts_created,
+            "active_contexts": len(self._guards),
+            "tab_crashes": self.tab_crashes,
+            "tab_restarts": self._closed_restarts + sum(guard.restarts for guard in self._guards.values()),
+        }
@@ -0,0 +1,70 @@
+import hashlib
+from typing import Dict, Optional
+
+from browser_use.dom.views import DOMElementNode, SelectorMap
+
+# Rewrites the labels buildDomTree.js drew, so screenshots show the renumbered indices
+RELABEL_HIGHLIGHTS_JS = """(renames) => {
+    const container = document.getElementById('playwright-highlight-container');
+    if (!container) return;
+    for (const label of container.querySelectorAll('.playwright-highlight-label')) {
+        if (label.textContent in renames) label.textContent = renames[label.textContent];
+    }
+}"""
+
+
+def element_key(node: DOMElementNode) -> str:
+    """An element's identity across captures: its tag path and XPath, but not its attributes or text, which may change."""
+    path = []
+    current: Optional[DOMElementNode] = node
+    while current is not None and current.parent is not None:
+        path.append(current.tag_name)
+        current = current.parent
+    return hashlib.sha1(f"{'/'.join(reversed(path))}|{node.xpath}".encode()).hexdigest()
+
+
+class StableElementIds:
+    """
+    Keeps interactive elements on the same highlight index from one state capture to the next.
+
+    browser-use numbers elements in document order, so an element inserted near the top
+    (an opened dropdown, a banner) shifts every index after it. Within one URL, elements
+    are matched by element_key and keep the index they were first given; new elements get
+    indices after the highest one used so far. Indices restart on navigation.
+    """
+
+    def __init__(self):
+        self.url: Optional[str] = None
+        self._ids: Dict[str, int] = {}
+        self._next = 0
+
+    def assign(self, selector_map: SelectorMap, url: str) -> Dict[int, int]:
+        """Renumbers the capture's elements in place; returns {browser-use index: stable index} for those that moved."""
+        if url != self.url:
+            self.url = url
+            self._ids = {}
+            self._next = 0
+        keys: Dict[str, int] = {}
+        renames: Dict[int, int] = {}
+        assigned: Dict[int, DOMElementNode] = {}
+        first_capture = not self._ids
+        for index in sorted(selector_map):
+            node = selector_map[index]
+            key = element_key(node)
+            keys[key] = keys.get(key, 0) + 1
+            if keys[key] > 1:
+                key = f"{key}#{keys[key]}" # Same path and XPath, e.g. in two iframes
+            if first_capture:
+                self._ids[key] = index
+            elif key not in self._ids:
+                self._ids[key] = self._next
+                self._next += 1
+            stable = self._ids[key]
+            self._next = max(self._next, stable + 1)
+            if stable != index:
+                renames[index] = stable
+                node.highlight_index = stable
+            assigned[stable] = node
+        selector_map.clear()
+        selector_map.update(assigned)
+        return renames
@@ -0,0 +1,149 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple, cast
+
+from playwright.async_api import BrowserContext as PlaywrightBrowserContext
+from playwright.async_api import StorageState
+
+if TYPE_CHECKING:
+    from playwright._impl._api_structures import SetCookieParam
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORAGE_STATE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "mcp-server-browser-use", "storage-states")
+SNAPSHOT_NAME_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]{0,127}$")
+VALID_SAME_SITE_VALUES = ("Strict", "Lax", "None")
+
+
+def normalize_cookies(cookies: List[Dict[str, Any]], source: str) -> List[Dict[str, Any]]:
+    """Replaces sameSite values Playwright rejects with 'None', in place."""
+    fixed = 0
+    for cookie in cookies:
+        if "sameSite" in cookie and cookie["sameSite"] not in VALID_SAME_SITE_VALUES:
+            cookie["sameSite"] = "None"
+            fixed += 1
+    if fixed:
+        logger.warning(f"Fixed {fixed} invalid sameSite values to 'None' in {source}")
+    return cookies
+
+
+def snapshot_cookies(state: Optional[StorageState]) -> List["SetCookieParam"]:
+    """A snapshot's cookies as add_cookies takes them; Playwright types the two cookie dicts differently."""
+    return cast(List["SetCookieParam"], state.get("cookies", [])) if state else []
+
+
+def _parse_storage_state(data: Any, path: str) -> StorageState:
+    if not isinstance(data, dict):
+        raise ValueError(f"{path} is not a storage state object")
+    normalize_cookies(data.setdefault("cookies", []), path)
+    data.setdefault("origins", [])
+    return cast(StorageState, data)
+
+
+def _parse_cookies_file(data: Any, path: str) -> List["SetCookieParam"]:
+    if not isinstance(data, list):
+        raise ValueError(f"{path} is not a list of cookies")
+    return cast(List["SetCookieParam"], normalize_cookies(data, path))
+
+
+class StorageStateStore:
+    """
+    Named storage-state snapshots (cookies plus per-origin localStorage and IndexedDB) in
+    Playwright's storage_state format, one JSON file per name.
+
+    Files are parsed once and kept in memory until their mtime or size changes, so creating
+    a context from a snapshot costs a dict lookup. The result is shared between contexts
+    and must be treated as read-only. Legacy cookies_file lists go through the same cache.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or DEFAULT_STORAGE_STATE_DIR
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Tuple[Tuple[int, int], Any]] = {} # path -> ((mtime_ns, size), parsed)
+        self.hits = 0
+        self.misses = 0
+
+    def path_for(self, name: str) -> str:
+        if not SNAPSHOT_NAME_PATTERN.match(name):
+            raise ValueError(f"Invalid storage state name '{name}'. Use letters, digits, '.', '_' and '-'.")
+        return os.path.join(self.directory, f"{name}.json")
+
+    def _load(self, path: str, parse: Callable[[Any, str], Any]) -> Optional[Any]:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._cache.get(path)
+            if cached and cached[0] == version:
+                self.hits += 1
+                return cached[1]
+        with open(path, "r", encoding="utf-8") as f:
+            parsed = parse(json.load(f), path)
+        with self._lock:
+            self._cache[path] = (version, parsed)
+            self.misses += 1
+        return parsed
+
+    def load(self, name: str) -> Optional[StorageState]:
+        """The snapshot called name, or None if it has not been saved yet."""
+        try:
+            return self._load(self.path_for(name), _parse_storage_state)
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to load storage state '{name}': {e}")
+            return None
+
+    def load_cookies_file(self, path: str) -> List["SetCookieParam"]:
+        try:
+            return self._load(path, _parse_cookies_file) or []
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to parse cookies file: {e}")
+            return []
+
+    async def save(self, context: PlaywrightBrowserContext, name: str) -> Dict[str, Any]:
+        """Writes the context's current cookies, localStorage and IndexedDB to the snapshot called name."""
+        path = self.path_for(name)
+        state = await context.storage_state(indexed_db=True)
+        await asyncio.to_thread(self._write, path, state)
+        return {
+            "name": name,
+            "path": path,
+            "cookies": len(state.get("cookies", [])),
+            "origins": len(state.get("origins", [])),
+        }
+
+    def _write(self, path: str, state: StorageState):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp") # Mode 0600: session cookies are credentials
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        stat = os.stat(path)
+        with self._lock:
+            self._cache[path] = ((stat.st_mtime_ns, stat.st_size), _parse_storage_state(state, path))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"cached": len(self._cache), "hits": self.hits, "misses": self.misses}
+
+
+_stores: Dict[str, StorageStateStore] = {}
+
+
+def get_storage_state_store(directory: Optional[str] = None) -> StorageStateStore:
+    """Process-wide store per directory, so every context shares the parsed snapshots."""
+    key = os.path.abspath(directory or DEFAULT_STORAGE_STATE_DIR)
+    if key not in _stores:
+        _stores[key] = StorageStateStore(key)
+    return _stores[key]
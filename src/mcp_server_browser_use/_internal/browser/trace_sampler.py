@@ -0,0 +1,142 @@
+import itertools
+import logging
+import os
+import shutil
+import tempfile
+from collections import deque
+from typing import Deque, List, Optional
+
+from playwright.async_api import BrowserContext as PlaywrightBrowserContext
+
+from ..utils.metrics import TRACES
+
+logger = logging.getLogger(__name__)
+
+# always: every run is traced; sampled: 1 in sample_rate runs; on-failure: a ring of recent step chunks, kept only if the run fails
+TRACE_MODES = ("always", "sampled", "on-failure")
+
+_run_counter = itertools.count() # Process-wide, so 1-in-N holds across contexts and pools
+
+
+def sample_run(sample_rate: int) -> bool:
+    return sample_rate <= 1 or next(_run_counter) % sample_rate == 0
+
+
+class ContextTracer:
+    """
+    Playwright tracing for one browser context under a sampling mode.
+
+    "always" and "sampled" record a full trace (screenshots, DOM snapshots, sources) and
+    save it when the run finishes. "on-failure" records without sources and cuts the
+    trace into one chunk per agent step; only the last ring_size chunks are kept on disk
+    and they are saved only if the run fails, so healthy runs leave nothing behind.
+    """
+
+    def __init__(self, trace_dir: str, mode: str = "always", sample_rate: int = 10, ring_size: int = 5):
+        if mode not in TRACE_MODES:
+            raise ValueError(f"Unknown trace mode '{mode}'. Expected one of: {', '.join(TRACE_MODES)}")
+        self.trace_dir = trace_dir
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.ring_size = max(1, ring_size)
+        self.trace_id: Optional[str] = None
+        self.recording: Optional[str] = None # "full", "ring" or None
+        self._context: Optional[PlaywrightBrowserContext] = None
+        self._ring: Deque[str] = deque()
+        self._ring_dir: Optional[str] = None
+        self._chunks = 0
+
+    @property
+    def has_steps(self) -> bool:
+        """Whether an on-failure trace recorded any agent step; idle contexts have nothing worth saving."""
+        return self._chunks > 0
+
+    async def start(self, context: PlaywrightBrowserContext, trace_id: str):
+        """Starts tracing a run on context, unless sampling skips it."""
+        self.trace_id = trace_id
+        self._context = context
+        if self.mode == "sampled" and not sample_run(self.sample_rate):
+            TRACES.inc(mode=self.mode, outcome="skipped")
+            return
+        try:
+            if self.mode == "on-failure":
+                os.makedirs(self.trace_dir, exist_ok=True)
+                self._ring_dir = tempfile.mkdtemp(prefix=".ring-", dir=self.trace_dir) # Same filesystem, so saving is a rename
+                await context.tracing.start(screenshots=True, snapshots=True)
+                await context.tracing.start_chunk()
+                self.recording = "ring"
+            else:
+                await context.tracing.start(screenshots=True, snapshots=True, sources=True)
+                self.recording = "full"
+        except Exception as e:
+            logger.warning(f"Could not start tracing: {e}")
+            self._drop_ring()
+
+    async def checkpoint(self):
+        """Closes the current chunk and starts the next one; called after every agent step."""
+        context, ring_dir = self._context, self._ring_dir
+        if self.recording != "ring" or context is None or ring_dir is None:
+            return
+        path = os.path.join(ring_dir, f"{self._chunks:05d}.zip")
+        self._chunks += 1
+        try:
+            await context.tracing.stop_chunk(path=path)
+            await context.tracing.start_chunk()
+        except Exception as e:
+            logger.debug(f"Could not rotate trace chunk: {e}")
+            return
+        self._ring.append(path)
+        while len(self._ring) > self.ring_size:
+            try:
+                os.remove(self._ring.popleft())
+            except OSError:
+                pass
+
+    async def finish(self, failed: bool) -> List[str]:
+        """Stops tracing and returns the saved trace files; on-failure traces of successful runs are discarded."""
+        recording, self.recording = self.recording, None
+        context = self._context
+        if recording is None or context is None:
+            return []
+        saved: List[str] = []
+        try:
+            if recording == "full":
+                path = os.path.join(self.trace_dir, f"{self.trace_id}.zip")
+                await context.tracing.stop(path=path)
+                saved.append(path)
+            elif failed:
+                await self._close_last_chunk(context)
+                for index, chunk in enumerate(self._ring):
+                    path = os.path.join(self.trace_dir, f"{self.trace_id}-{index:02d}.zip")
+                    os.replace(chunk, path)
+                    saved.append(path)
+                self._ring.clear()
+                await context.tracing.stop()
+            else:
+                await context.tracing.stop_chunk() # Discards the open chunk without writing it
+                await context.tracing.stop()
+        except Exception as e:
+            logger.debug(f"Could not stop tracing: {e}")
+        finally:
+            self._drop_ring()
+        TRACES.inc(mode=self.mode, outcome="saved" if saved else "discarded")
+        if saved:
+            logger.info(f"Saved {len(saved)} trace file(s) for {self.trace_id} ({self.mode}{', run failed' if failed else ''}).")
+        return saved
+
+    async def _close_last_chunk(self, context: PlaywrightBrowserContext):
+        """Writes the open chunk, which holds whatever happened after the last step, into the ring."""
+        assert self._ring_dir is not None # Set whenever a ring is recording
+        path = os.path.join(self._ring_dir, f"{self._chunks:05d}.zip")
+        self._chunks += 1
+        await context.tracing.stop_chunk(path=path)
+        self._ring.append(path)
+        if len(self._ring) > self.ring_size:
+            os.remove(self._ring.popleft())
+
+    def _drop_ring(self):
+        self._ring.clear()
+        self._chunks = 0
+        if self._ring_dir:
+            shutil.rmtree(self._ring_dir, ignore_errors=True)
+            self._ring_dir = None
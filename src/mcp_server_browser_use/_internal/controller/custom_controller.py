@@ -27,7 +27,8 @@ import os
 from langchain_core.language_models.chat_models import BaseChatModel
 from browser_use.agent.views import ActionModel, ActionResult
 
-from ..utils.mcp_client import create_tool_param_model, setup_mcp_client_and_tools
+from ..browser.custom_context import CustomBrowserContext
+from ..utils.mcp_client import create_tool_param_model, get_mcp_session_manager
 
 from browser_use.utils import time_execution_sync
 
@@ -106,6 +107,23 @@ class CustomController(Controller):
                 logger.info(msg)
                 return ActionResult(error=msg)
 
+        @self.registry.action(
+            'Save the current login session (cookies, localStorage, IndexedDB) after signing in, so later tasks '
+            'start signed in. Leave name empty to update the configured session.',
+        )
+        async def save_storage_state(browser: BrowserContext, name: Optional[str] = None):
+            if not isinstance(browser, CustomBrowserContext):
+                return ActionResult(error='Saving the session is not supported by this browser context')
+            try:
+                summary = await browser.save_storage_state(name or None)
+            except Exception as e:
+                msg = f'Failed to save session: {str(e)}'
+                logger.info(msg)
+                return ActionResult(error=msg)
+            msg = f"Saved session '{summary['name']}' ({summary['cookies']} cookies, {summary['origins']} origins)"
+            logger.info(msg)
+            return ActionResult(extracted_content=msg, include_in_memory=True)
+
     @time_execution_sync('--act')
     async def act(
             self,
@@ -154,7 +172,8 @@ class CustomController(Controller):
     async def setup_mcp_client(self, mcp_server_config: Optional[Dict[str, Any]] = None):
         self.mcp_server_config = mcp_server_config
         if self.mcp_server_config:
-            self.mcp_client = await setup_mcp_client_and_tools(self.mcp_server_config)
+            # Shared across controllers: servers are started once per process, not once per call
+            self.mcp_client = await get_mcp_session_manager(self.mcp_server_config)
             self.register_mcp_tools()
 
     def register_mcp_tools(self):
@@ -174,5 +193,5 @@ class CustomController(Controller):
                     logger.info(f"Add mcp tool: {tool_name}")
 
     async def close_mcp_client(self):
-        if self.mcp_client:
-            await self.mcp_client.__aexit__(None, None, None)
+        # The session manager outlives this controller; it is shut down with the server
+        self.mcp_client = None
@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Agent control states reported by list_agents
+AGENT_RUNNING = "running"
+AGENT_PAUSED = "paused"
+AGENT_STOPPING = "stopping"
+
+
+@dataclass
+class RunningAgent:
+    """A BrowserUseAgent run that can be paused, resumed or stopped by task id."""
+    task_id: str
+    kind: str
+    task: str
+    agent: Any # BrowserUseAgent; not imported to keep utils free of agent dependencies
+    started_at: float = field(default_factory=time.time)
+    run_task: Optional[asyncio.Task] = None # The task executing the run, cancelled if a stop does not finish in time
+    finished: asyncio.Event = field(default_factory=asyncio.Event)
+
+    @property
+    def status(self) -> str:
+        if self.agent.state.stopped:
+            return AGENT_STOPPING
+        return AGENT_PAUSED if self.agent.state.paused else AGENT_RUNNING
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "task_id": self.task_id,
+            "kind": self.kind,
+            "task": self.task[:200],
+            "status": self.status,
+            "steps": self.agent.state.n_steps,
+            "started_at": self.started_at,
+            "elapsed_seconds": round(time.time() - self.started_at, 3),
+        }
+
+
+class AgentRegistry:
+    """
+    In-process registry of running browser agents, addressed by task id.
+
+    Pausing takes effect before the agent's next LLM call or action. Stopping cancels
+    the agent's in-flight step (its LLM request and pending Playwright call) and waits
+    up to stop_timeout seconds for the run to unwind and release its browser; a run that
+    is still going after that has its task cancelled outright.
+    """
+
+    def __init__(self, stop_timeout: float = 10.0):
+        self.stop_timeout = stop_timeout
+        self._agents: Dict[str, RunningAgent] = {}
+        self.stops = 0
+        self.forced_stops = 0
+
+    def configure(self, stop_timeout: float):
+        self.stop_timeout = stop_timeout
+
+    def register(self, task_id: str, kind: str, task: str, agent: Any) -> RunningAgent:
+        """Registers an agent about to run in the current task."""
+        entry = RunningAgent(task_id=task_id, kind=kind, task=task, agent=agent, run_task=asyncio.current_task())
+        self._agents[task_id] = entry
+        return entry
+
+    def unregister(self, task_id: str):
+        entry = self._agents.pop(task_id, None)
+        if entry:
+            entry.finished.set()
+
+    def get(self, task_id: str) -> Optional[RunningAgent]:
+        return self._agents.get(task_id)
+
+    def list(self, kind: Optional[str] = None) -> List[RunningAgent]:
+        return [entry for entry in self._agents.values() if kind is None or entry.kind == kind]
+
+    def pause(self, task_id: str) -> Optional[RunningAgent]:
+        entry = self.get(task_id)
+        if entry and not entry.agent.state.stopped:
+            entry.agent.pause()
+        return entry
+
+    def resume(self, task_id: str) -> Optional[RunningAgent]:
+        entry = self.get(task_id)
+        if entry and not entry.agent.state.stopped:
+            entry.agent.resume()
+        return entry
+
+    async def stop(self, task_id: str, timeout: Optional[float] = None) -> Optional[RunningAgent]:
+        """Stops an agent and returns once its run has finished or been cancelled."""
+        entry = self.get(task_id)
+        if entry is None:
+            return None
+        timeout = self.stop_timeout if timeout is None else timeout
+        self.stops += 1
+        entry.agent.stop()
+        try:
+            await asyncio.wait_for(entry.finished.wait(), timeout)
+            return entry
+        except asyncio.TimeoutError:
+            pass
+        logger.warning(f"Agent {task_id} did not stop within {timeout}s; cancelling its run.")
+        self.forced_stops += 1
+        if entry.run_task and not entry.run_task.done():
+            entry.run_task.cancel()
+            await asyncio.wait({entry.run_task}, timeout=timeout)
+        return entry
+
+    async def stop_all(self, timeout: Optional[float] = None):
+        await asyncio.gather(*(self.stop(task_id, timeout) for task_id in list(self._agents)))
+
+    def stats(self) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for entry in self._agents.values():
+            counts[entry.status] = counts.get(entry.status, 0) + 1
+        return {"agents": counts, "stops": self.stops, "forced_stops": self.forced_stops}
+
+
+_registry = AgentRegistry()
+
+
+def get_agent_registry() -> AgentRegistry:
+    """The process-wide registry every MCP-started agent (and deep research sub-agent) is listed in."""
+    return _registry
@@ -7,7 +7,8 @@ PROVIDER_DISPLAY_NAMES = {
     "alibaba": "Alibaba",
     "moonshot": "MoonShot",
     "unbound": "Unbound AI",
-    "ibm": "IBM"
+    "ibm": "IBM",
+    "scripted": "Scripted (offline benchmarks)"
 }
 
 # Predefined model names for common providers
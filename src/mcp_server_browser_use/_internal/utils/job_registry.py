@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Job lifecycle: queued -> running -> completed | failed | cancelled
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+FINISHED_STATES = (JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED)
+
+
+@dataclass
+class Job:
+    """A background unit of work tracked by the JobRegistry."""
+    job_id: str
+    kind: str
+    description: str
+    status: str = JOB_QUEUED
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Any = None
+    error: Optional[str] = None
+    progress: Optional[Dict[str, Any]] = None # Latest progress event reported by the job
+    cancel_requested: bool = False
+    # Cooperative stop hook for a running job (e.g. DeepResearchAgent.stop); queued jobs are simply cancelled
+    stop_callback: Optional[Callable[[], Awaitable[None]]] = None
+    task: Optional[asyncio.Task] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def to_dict(self) -> Dict[str, Any]:
+        end = self.finished_at or time.time()
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "description": self.description,
+            "status": self.status,
+            "cancel_requested": self.cancel_requested,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "elapsed_seconds": round(end - self.started_at, 3) if self.started_at else None,
+            "error": self.error,
+            "progress": self.progress,
+        }
+
+
+class JobRegistry:
+    """
+    In-process registry of background jobs.
+
+    At most max_concurrent jobs run at once; the rest wait in the queued state.
+    Finished jobs (and their results) are kept for result_ttl seconds so clients
+    can fetch them after the fact, then pruned.
+    """
+
+    def __init__(self, max_concurrent: int = 2, result_ttl: float = 3600.0):
+        self.max_concurrent = max(1, max_concurrent)
+        self.result_ttl = result_ttl
+        self._jobs: Dict[str, Job] = {}
+        self._slots: Optional[asyncio.Semaphore] = None # Created on first use, inside the running loop
+
+    def submit(
+            self,
+            kind: str,
+            description: str,
+            work: Callable[[Job], Awaitable[Any]],
+            job_id: Optional[str] = None,
+    ) -> Job:
+        """Registers a job and schedules work(job) to run once a slot is free. Returns immediately."""
+        self.prune()
+        job = Job(job_id=job_id or str(uuid.uuid4()), kind=kind, description=description)
+        self._jobs[job.job_id] = job
+        job.task = asyncio.create_task(self._run(job, work))
+        job.task.add_done_callback(lambda _: self._settle(job))
+        logger.info(f"Submitted {kind} job {job.job_id}: {description[:100]}")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self.prune()
+        return self._jobs.get(job_id)
+
+    def list(self, kind: Optional[str] = None) -> List[Job]:
+        self.prune()
+        return [job for job in self._jobs.values() if kind is None or job.kind == kind]
+
+    async def cancel(self, job_id: str) -> Optional[Job]:
+        """Requests cancellation. Queued jobs are cancelled at once; running jobs are asked to stop cooperatively."""
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return job
+        job.cancel_requested = True
+        if job.status == JOB_QUEUED or job.stop_callback is None:
+            if job.task:
+                job.task.cancel()
+        else:
+            try:
+                await job.stop_callback()
+            except Exception as e:
+                logger.error(f"Error stopping job {job_id}, cancelling its task instead: {e}")
+                if job.task:
+                    job.task.cancel()
+        return job
+
+    async def close(self):
+        """Cancels every unfinished job and waits for them to unwind."""
+        tasks = [job.task for job in self._jobs.values() if job.task and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def prune(self):
+        """Drops finished jobs older than result_ttl."""
+        cutoff = time.time() - self.result_ttl
+        expired = [job_id for job_id, job in self._jobs.items() if job.finished and job.finished_at is not None and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+        if expired:
+            logger.debug(f"Pruned {len(expired)} expired job(s).")
+
+    def stats(self) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {"max_concurrent": self.max_concurrent, "result_ttl": self.result_ttl, "jobs": counts}
+
+    @staticmethod
+    def _settle(job: Job):
+        """Finishes a job whose task was cancelled before _run started, so its finally block never ran."""
+        if not job.finished:
+            job.status = JOB_CANCELLED
+            job.finished_at = time.time()
+
+    async def _run(self, job: Job, work: Callable[[Job], Awaitable[Any]]):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+        try:
+            async with self._slots:
+                job.status = JOB_RUNNING
+                job.started_at = time.time()
+                job.result = await work(job)
+                job.status = JOB_CANCELLED if job.cancel_requested else JOB_COMPLETED
+        except asyncio.CancelledError:
+            job.status = JOB_CANCELLED
+        except Exception as e:
+            logger.error(f"{job.kind} job {job.job_id} failed: {e}", exc_info=True)
+            job.status = JOB_FAILED
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            job.stop_callback = None
+            logger.info(f"{job.kind} job {job.job_id} finished with status '{job.status}'.")
@@ -1,6 +1,12 @@
 from openai import OpenAI
+import hashlib
+import logging
 import pdb
+import threading
+import time
+from collections import OrderedDict
 from langchain_openai import ChatOpenAI
+from langchain_core.callbacks import BaseCallbackHandler, BaseCallbackManager
 from langchain_core.globals import get_llm_cache
 from langchain_core.language_models.base import (
     BaseLanguageModel,
@@ -50,6 +56,10 @@ from langchain_aws import ChatBedrock
 from pydantic import SecretStr
 
 from ..utils import config
+from .metrics import LLMMetricsCallback
+from .scripted_llm import ScriptedChatModel
+
+logger = logging.getLogger(__name__)
 
 
 class DeepSeekR1ChatOpenAI(ChatOpenAI):
@@ -149,14 +159,114 @@ class DeepSeekR1ChatOllama(ChatOllama):
         return AIMessage(content=content, reasoning_content=reasoning_content)
 
 
-def get_llm_model(provider: str, **kwargs):
+# kwargs that change the constructed client; anything else (use_vision, tool_calling_method, ...) is agent-side
+_CLIENT_KWARGS = ("model_name", "temperature", "api_version", "num_ctx", "ollama_num_ctx", "ollama_num_predict")
+
+
+class LLMClientCache:
+    """
+    Process-wide cache of LLM clients keyed on their normalized provider config.
+
+    Reusing a client keeps its HTTP connection pool (and TLS sessions) alive across tool
+    calls. Entries expire after ttl seconds and the least recently used entry is dropped
+    once max_size is exceeded. Evicted clients are not closed explicitly, since callers
+    may still hold them; their connections go away with the client.
+    """
+
+    def __init__(self, max_size: int = 8, ttl: float = 1800.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[tuple, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(provider: str, **kwargs) -> tuple:
+        """Normalizes a get_llm_model() call into a hashable key. The API key is only stored as a fingerprint."""
+        api_key = kwargs.get("api_key") or os.getenv(f"{provider.upper()}_API_KEY", "")
+        if isinstance(api_key, SecretStr):
+            api_key = api_key.get_secret_value()
+        key_fingerprint = hashlib.sha256(api_key.encode()).hexdigest()[:16] if api_key else ""
+        endpoint = kwargs.get("base_url") or os.getenv(f"{provider.upper()}_ENDPOINT", "")
+        options = tuple((name, kwargs.get(name)) for name in _CLIENT_KWARGS if kwargs.get(name) is not None)
+        return provider, endpoint.rstrip("/"), key_fingerprint, options
+
+    def get_or_create(self, key: tuple, factory: Callable[[], Any]) -> Any:
+        """Returns the cached client for key, building it with factory on a miss."""
+        with self._lock: # Construction is synchronous, so holding the lock keeps concurrent misses from building twice
+            now = time.monotonic()
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+            self.misses += 1
+            client = factory()
+            if self.max_size > 0:
+                self._entries[key] = (now, client)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+            return client
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._entries), "max_size": self.max_size, "ttl": self.ttl, "hits": self.hits, "misses": self.misses}
+
+
+llm_client_cache = LLMClientCache()
+
+
+def configure_llm_cache(max_size: int, ttl: float):
+    """Resizes the process-wide LLM client cache. A max_size of 0 disables caching."""
+    with llm_client_cache._lock:
+        llm_client_cache.max_size = max_size
+        llm_client_cache.ttl = ttl
+        while len(llm_client_cache._entries) > max(max_size, 0):
+            llm_client_cache._entries.popitem(last=False)
+
+
+def get_llm_model(provider: str, use_cache: bool = True, **kwargs):
+    """
+    Get LLM model, reusing a cached client for the same provider config
+    :param provider: LLM provider
+    :param use_cache: whether to look up / store the client in the process-wide cache
+    :param kwargs:
+    :return:
+    """
+    if not use_cache:
+        return _create_instrumented_llm_model(provider, **kwargs)
+    key = LLMClientCache.make_key(provider, **kwargs)
+    return llm_client_cache.get_or_create(key, lambda: _create_instrumented_llm_model(provider, **kwargs))
+
+
+def _create_instrumented_llm_model(provider: str, **kwargs):
+    """Builds a client that reports its latency, tokens and errors to the metrics registry."""
+    llm = _create_llm_model(provider, **kwargs)
+    model = getattr(llm, "model_name", None) or getattr(llm, "model", None) or kwargs.get("model_name", "unknown")
+    callback = LLMMetricsCallback(provider, str(model))
+    if isinstance(llm.callbacks, BaseCallbackManager):
+        llm.callbacks.add_handler(callback)
+    else:
+        handlers: List[BaseCallbackHandler] = [*(llm.callbacks or []), callback]
+        llm.callbacks = handlers
+    return llm
+
+
+def _create_llm_model(provider: str, **kwargs):
     """
-    Get LLM model
+    Build a new LLM client
     :param provider: LLM provider
     :param kwargs:
     :return:
     """
-    if provider not in ["ollama", "bedrock"]:
+    if provider not in ["ollama", "bedrock", "scripted"]:
         env_var = f"{provider.upper()}_API_KEY"
         api_key = kwargs.get("api_key", "") or os.getenv(env_var, "")
         if not api_key:
@@ -323,5 +433,8 @@ def get_llm_model(provider: str, **kwargs):
             model_name=kwargs.get("model_name", "Qwen/QwQ-32B"),
             temperature=kwargs.get("temperature", 0.0),
         )
+    elif provider == "scripted":
+        # Offline benchmarks: model_name is the path of the response script
+        return ScriptedChatModel(model_name=kwargs.get("model_name", "scripted"))
     else:
         raise ValueError(f"Unsupported provider: {provider}")
@@ -2,8 +2,10 @@ import os
 import asyncio
 import base64
 import pdb
+from functools import partial
 from typing import List, Tuple, Optional
-from langchain_core.tools import BaseTool
+import anyio
+from langchain_core.tools import BaseTool, StructuredTool
 from langchain_mcp_adapters.client import MultiServerMCPClient
 import base64
 import json
@@ -56,6 +58,213 @@ async def setup_mcp_client_and_tools(mcp_server_config: Dict[str, Any]) -> Optio
         return None
 
 
+# Errors that mean the transport to an MCP server is gone, as opposed to a tool reporting a failure
+MCP_CONNECTION_ERRORS = (ConnectionError, EOFError, BrokenPipeError, anyio.ClosedResourceError, anyio.BrokenResourceError,
+                         anyio.EndOfStream)
+
+
+class _McpServerConnection:
+    """One configured MCP server, owned by a dedicated task so its anyio scopes are entered and exited in the same task."""
+
+    def __init__(self, name: str, config: Dict[str, Any]):
+        self.name = name
+        self.config = config
+        self.client: Optional[MultiServerMCPClient] = None
+        self.tools: Dict[str, BaseTool] = {}
+        self.generation = 0
+        self.connects = 0
+        self.last_error: Optional[str] = None
+        self.lock = asyncio.Lock()
+        self._owner: Optional[asyncio.Task] = None
+        self._shutdown: Optional[asyncio.Event] = None
+
+    @property
+    def connected(self) -> bool:
+        return self.client is not None and self._owner is not None and not self._owner.done()
+
+    async def connect(self):
+        """Starts the server (or reconnects to it) and loads its tools. Caller holds self.lock."""
+        await self.disconnect()
+        ready: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._shutdown = asyncio.Event()
+        self._owner = asyncio.create_task(self._own(ready, self._shutdown), name=f"mcp-server-{self.name}")
+        try:
+            await ready
+        except Exception as e:
+            self.last_error = str(e)
+            raise
+        self.generation += 1
+        self.connects += 1
+        self.last_error = None
+        logger.info(f"MCP server '{self.name}' connected with {len(self.tools)} tool(s).")
+
+    async def disconnect(self):
+        owner, shutdown = self._owner, self._shutdown
+        self._owner = self._shutdown = None
+        self.client = None
+        if owner and shutdown and not owner.done(): # Both are set together in connect()
+            shutdown.set()
+            try:
+                await owner
+            except Exception as e:
+                logger.debug(f"Error shutting down MCP server '{self.name}': {e}")
+
+    async def _own(self, ready: asyncio.Future, shutdown: asyncio.Event):
+        connections: Dict[str, Any] = {self.name: self.config}
+        client = MultiServerMCPClient(connections)
+        try:
+            await client.__aenter__()
+        except BaseException as e:
+            if not ready.done():
+                ready.set_exception(e if isinstance(e, Exception) else RuntimeError(str(e)))
+            return
+        try:
+            self.client = client
+            self.tools = {tool.name: tool for tool in client.server_name_to_tools.get(self.name, [])}
+            ready.set_result(None)
+            await shutdown.wait()
+        finally:
+            try:
+                await client.__aexit__(None, None, None)
+            except Exception as e:
+                logger.debug(f"Error closing MCP client for '{self.name}': {e}")
+
+
+class McpSessionManager:
+    """
+    Process-wide MCP sessions shared by every controller and research agent.
+
+    Each configured server is started once and kept running. The tools handed out are
+    stable proxies: a call goes to the server's current session and, if the transport
+    turns out to be dead, the server is reconnected once and the call retried. Exposes
+    get_tools() and server_name_to_tools like MultiServerMCPClient, so it can be used
+    wherever a client was.
+    """
+
+    def __init__(self, mcp_server_config: Dict[str, Any]):
+        if "mcpServers" in mcp_server_config:
+            mcp_server_config = mcp_server_config["mcpServers"]
+        self._servers = {name: _McpServerConnection(name, cfg) for name, cfg in mcp_server_config.items()}
+        self._proxies: Dict[str, Dict[str, BaseTool]] = {}
+        self._started = False
+        self._start_lock = asyncio.Lock()
+        self.reconnects = 0
+
+    async def start(self):
+        """Connects to every configured server once. Servers that fail are retried on first use."""
+        async with self._start_lock:
+            if self._started:
+                return
+            await asyncio.gather(*(self._ensure_connected(conn) for conn in self._servers.values()), return_exceptions=True)
+            self._started = True
+
+    @property
+    def server_name_to_tools(self) -> Dict[str, List[BaseTool]]:
+        return {name: list(self._proxies.get(name, {}).values()) for name in self._servers if self._proxies.get(name)}
+
+    def get_tools(self) -> List[BaseTool]:
+        return [tool for tools in self.server_name_to_tools.values() for tool in tools]
+
+    async def call_tool(self, server_name: str, tool_name: str, arguments: Dict[str, Any]):
+        conn = self._servers[server_name]
+        for attempt in range(2):
+            await self._ensure_connected(conn)
+            generation = conn.generation
+            tool = conn.tools.get(tool_name)
+            if not isinstance(tool, StructuredTool) or tool.coroutine is None:
+                raise ValueError(f"MCP server '{server_name}' no longer provides tool '{tool_name}'")
+            try:
+                return await tool.coroutine(**arguments)
+            except MCP_CONNECTION_ERRORS as e:
+                if attempt:
+                    raise
+                logger.warning(f"MCP server '{server_name}' connection failed during '{tool_name}': {e!r}. Reconnecting.")
+                await self._reconnect(conn, generation)
+
+    async def close(self):
+        for conn in self._servers.values():
+            await conn.disconnect()
+        self._proxies.clear()
+        self._started = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            name: {
+                "connected": conn.connected,
+                "tools": len(conn.tools),
+                "connects": conn.connects,
+                "last_error": conn.last_error,
+            }
+            for name, conn in self._servers.items()
+        }
+
+    async def _ensure_connected(self, conn: _McpServerConnection):
+        if conn.connected:
+            return
+        async with conn.lock:
+            if conn.connected:
+                return
+            if conn.connects:
+                logger.warning(f"MCP server '{conn.name}' is not running. Reconnecting.")
+                self.reconnects += 1
+            try:
+                await conn.connect()
+            except Exception as e:
+                logger.error(f"Failed to connect to MCP server '{conn.name}': {e}", exc_info=True)
+                raise
+            self._build_proxies(conn)
+
+    async def _reconnect(self, conn: _McpServerConnection, seen_generation: int):
+        async with conn.lock:
+            if conn.generation != seen_generation and conn.connected:
+                return # Another caller already reconnected
+            self.reconnects += 1
+            await conn.connect()
+            self._build_proxies(conn)
+
+    def _build_proxies(self, conn: _McpServerConnection):
+        existing = self._proxies.setdefault(conn.name, {})
+        for tool_name, tool in conn.tools.items():
+            if tool_name not in existing:
+                existing[tool_name] = StructuredTool(
+                    name=tool.name,
+                    description=tool.description,
+                    args_schema=tool.args_schema or {},
+                    coroutine=partial(self._proxy_call, conn.name, tool_name),
+                    response_format="content_and_artifact",
+                )
+        for tool_name in list(existing):
+            if tool_name not in conn.tools:
+                del existing[tool_name]
+
+    async def _proxy_call(self, server_name: str, tool_name: str, **arguments):
+        return await self.call_tool(server_name, tool_name, arguments)
+
+
+_session_managers: Dict[str, McpSessionManager] = {}
+
+
+async def get_mcp_session_manager(mcp_server_config: Dict[str, Any]) -> Optional[McpSessionManager]:
+    """Returns the shared, started session manager for this MCP config, creating it on first use."""
+    if not mcp_server_config:
+        return None
+    key = json.dumps(mcp_server_config, sort_keys=True, default=str)
+    manager = _session_managers.get(key)
+    if manager is None:
+        logger.info("Starting shared MCP session manager...")
+        manager = _session_managers[key] = McpSessionManager(mcp_server_config)
+    await manager.start()
+    return manager
+
+
+async def close_mcp_session_managers():
+    """Stops every shared MCP server. Called on server shutdown."""
+    managers = list(_session_managers.values())
+    _session_managers.clear()
+    for manager in managers:
+        await manager.close()
+
+
 def create_tool_param_model(tool: BaseTool) -> Type[BaseModel]:
     """Creates a Pydantic model from a LangChain tool's schema"""
 
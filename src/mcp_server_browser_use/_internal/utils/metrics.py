@@ -0,0 +1,376 @@
+import asyncio
+import bisect
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from sub-10ms CDP calls up to multi-minute research nodes
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+# Recent observations kept per series for the percentiles reported by get_metrics
+QUANTILE_WINDOW = 1024
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = []
+    for k, v in pairs:
+        v = v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        escaped.append(f'{k}="{v}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+class Counter:
+    """Monotonically increasing value per label set."""
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[Tuple[str, LabelKey, float]]:
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return [{"labels": dict(key), "value": value} for _, key, value in self.samples()]
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Gauge:
+    """Point-in-time value per label set, either set directly or read from a callback at collection time."""
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, callback: Optional[Callable[[], Dict[LabelKey, float]]] = None):
+        self.name = name
+        self.help = help_text
+        self._values: Dict[LabelKey, float] = {}
+        self._callback = callback
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def samples(self) -> List[Tuple[str, LabelKey, float]]:
+        with self._lock:
+            values = dict(self._values)
+        if self._callback:
+            try:
+                values.update(self._callback())
+            except Exception as e:
+                logger.debug(f"Gauge callback for {self.name} failed: {e}")
+        return [(self.name, key, value) for key, value in values.items()]
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return [{"labels": dict(key), "value": value} for _, key, value in self.samples()]
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    """Cumulative bucket counts for Prometheus plus a window of recent samples for p50/p90/p99."""
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelKey, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {
+                    "counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0,
+                    "recent": deque(maxlen=QUANTILE_WINDOW),
+                }
+            series["counts"][bisect.bisect_left(self.buckets, value)] += 1
+            series["sum"] += value
+            series["count"] += 1
+            series["recent"].append(value)
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    @asynccontextmanager
+    async def time_async(self, **labels) -> AsyncIterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> List[Tuple[str, LabelKey, float]]:
+        out = []
+        with self._lock:
+            for key, series in self._series.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets, series["counts"]):
+                    cumulative += count
+                    out.append((f"{self.name}_bucket", key + (("le", _format_bound(bound)),), cumulative))
+                out.append((f"{self.name}_bucket", key + (("le", "+Inf"),), series["count"]))
+                out.append((f"{self.name}_sum", key, series["sum"]))
+                out.append((f"{self.name}_count", key, series["count"]))
+        return out
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            series_copy = [(key, series["count"], series["sum"], sorted(series["recent"])) for key, series in self._series.items()]
+        return [
+            {
+                "labels": dict(key),
+                "count": count,
+                "sum": round(total, 6),
+                "avg": round(total / count, 6) if count else 0.0,
+                "p50": _quantile(recent, 0.50),
+                "p90": _quantile(recent, 0.90),
+                "p99": _quantile(recent, 0.99),
+                "max": recent[-1] if recent else 0.0,
+            }
+            for key, count, total, recent in series_copy
+        ]
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+def _format_bound(bound: float) -> str:
+    return repr(float(bound))
+
+
+def _quantile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return round(sorted_values[index], 6)
+
+
+class MetricsRegistry:
+    """Named metrics shared by the whole process. Asking for an existing name returns the same metric."""
+
+    def __init__(self, namespace: str = "mcp_browser"):
+        self.namespace = namespace
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._get_or_create(name, lambda full: Counter(full, help_text))
+
+    def gauge(self, name: str, help_text: str, callback: Optional[Callable[[], Dict[LabelKey, float]]] = None) -> Gauge:
+        return self._get_or_create(name, lambda full: Gauge(full, help_text, callback))
+
+    def histogram(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(name, lambda full: Histogram(full, help_text, buckets))
+
+    def _get_or_create(self, name: str, factory):
+        full_name = f"{self.namespace}_{name}"
+        with self._lock:
+            metric = self._metrics.get(full_name)
+            if metric is None:
+                metric = self._metrics[full_name] = factory(full_name)
+            return metric
+
+    def reset(self):
+        """Drops every recorded value (callback gauges keep reporting live state). Used between benchmark runs."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-friendly view used by the get_metrics tool."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {m.name: {"type": m.kind, "help": m.help, "series": m.snapshot()} for m in metrics}
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for sample_name, key, value in metric.samples():
+                lines.append(f"{sample_name}{_format_labels(key)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def labels(**kwargs) -> LabelKey:
+    """Builds a label key for gauge callbacks."""
+    return _label_key(kwargs)
+
+
+metrics = MetricsRegistry()
+
+# Metrics recorded from the browser, agent and research code
+BROWSER_LAUNCH_SECONDS = metrics.histogram("browser_launch_seconds", "Time to launch or connect a browser.")
+CONTEXT_CREATE_SECONDS = metrics.histogram("context_create_seconds", "Time to create a Playwright browser context.")
+AGENT_STEP_PHASE_SECONDS = metrics.histogram(
+    "agent_step_phase_seconds",
+    "Agent step latency by phase: state (with dom, screenshot, page_info inside it), llm, actions, bookkeeping.")
+STEP_SECONDS_SAVED = metrics.counter(
+    "step_seconds_saved_total", "Agent step time saved by pipelined steps: overlapped state capture and bookkeeping run off the critical path.")
+LLM_REQUEST_SECONDS = metrics.histogram("llm_request_seconds", "LLM request latency by provider and model.")
+LLM_TOKENS = metrics.counter("llm_tokens_total", "LLM tokens by provider, model and direction (input/output).")
+LLM_ERRORS = metrics.counter("llm_errors_total", "Failed LLM requests by provider and model.")
+RESEARCH_NODE_SECONDS = metrics.histogram("research_node_seconds", "Deep research graph node latency.")
+TOOL_CALLS = metrics.counter("tool_calls_total", "MCP tool calls by tool and outcome.")
+TOOL_SECONDS = metrics.histogram("tool_seconds", "End-to-end MCP tool call latency.")
+QUEUE_WAIT_SECONDS = metrics.histogram("queue_wait_seconds", "Time waiting for admission or a browser/context/controller slot.")
+REQUESTS_BLOCKED = metrics.counter("requests_blocked_total", "Browser requests aborted by the request policy, by policy and reason.")
+RESPONSE_CACHE_REQUESTS = metrics.counter("response_cache_requests_total", "Shared HTTP response cache lookups by result: hit, miss, bypass.")
+BLOCKED_BYTES = metrics.counter(
+    "blocked_bytes_total", "Bytes not loaded because of the request policy: measured (size limit) or estimated (never sent).")
+BROWSER_RECYCLES = metrics.counter("browser_recycles_total", "Browsers replaced between runs by the process supervisor, by reason: rss, age.")
+ORPHANS_REAPED = metrics.counter("orphans_reaped_total", "Chrome processes killed because they outlived their browser.")
+SCREENSHOT_FRAMES = metrics.counter("screenshot_frames_total", "Vision screenshots by outcome: sent, duplicate (image skipped).")
+SCREENSHOT_BYTES = metrics.counter("screenshot_bytes_total", "Encoded bytes of screenshots sent to the LLM, by format.")
+VISION_TOKENS_SAVED = metrics.counter(
+    "vision_tokens_saved_total", "Estimated image tokens saved by downscaling and skipping duplicate screenshots.")
+DOM_STATES = metrics.counter("dom_states_total", "Agent state messages in DOM diff mode by element listing: full, diff.")
+DOM_DIFF_TOKENS_SAVED = metrics.counter(
+    "dom_diff_tokens_saved_total", "Estimated element-listing tokens not sent fresh because DOM diff mode sent a diff instead.")
+HISTORY_COMPACTIONS = metrics.counter(
+    "history_compactions_total", "Agent history compactions by result: summarized, fallback (summary model failed), discarded (history changed).")
+HISTORY_TOKENS_COMPACTED = metrics.counter(
+    "history_tokens_compacted_total", "Estimated agent history tokens removed by compaction, net of the memory blocks that replaced them.")
+TRAJECTORY_LOOKUPS = metrics.counter("trajectory_lookups_total", "Trajectory cache lookups by result: hit, miss.")
+LLM_CALLS_SAVED = metrics.counter("llm_calls_saved_total", "Agent steps replayed from a cached trajectory instead of asking the LLM.")
+TRACES = metrics.counter("traces_total", "Playwright traces by mode and outcome: saved, discarded (healthy on-failure run), skipped (not sampled).")
+
+
+class LLMMetricsCallback(BaseCallbackHandler):
+    """Records latency, token usage and errors of every request made through an LLM client."""
+
+    run_inline = True # Cheap and thread-safe, so no need to hop to an executor
+
+    def __init__(self, provider: str, model: str):
+        self.provider = provider
+        self.model = model
+        self._started: Dict[UUID, float] = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs):
+        with self._lock:
+            self._started[run_id] = time.perf_counter()
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs):
+        with self._lock:
+            self._started[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs):
+        self._finish(run_id)
+        input_tokens = output_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+        if not input_tokens and not output_tokens and response.llm_output:
+            usage = response.llm_output.get("token_usage") or response.llm_output.get("usage") or {}
+            input_tokens = usage.get("prompt_tokens", usage.get("input_tokens", 0)) or 0
+            output_tokens = usage.get("completion_tokens", usage.get("output_tokens", 0)) or 0
+        if input_tokens:
+            LLM_TOKENS.inc(input_tokens, provider=self.provider, model=self.model, direction="input")
+        if output_tokens:
+            LLM_TOKENS.inc(output_tokens, provider=self.provider, model=self.model, direction="output")
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs):
+        self._finish(run_id)
+        LLM_ERRORS.inc(provider=self.provider, model=self.model)
+
+    def _finish(self, run_id: UUID):
+        with self._lock:
+            start = self._started.pop(run_id, None)
+        if start is not None:
+            LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, provider=self.provider, model=self.model)
+
+
+async def export_prometheus(file_path: Optional[str] = None, port: Optional[int] = None, interval: float = 15.0):
+    """
+    Publishes metrics.render_prometheus() until cancelled: rewritten atomically to file_path
+    every interval seconds (e.g. for node_exporter's textfile collector), and/or served
+    over plain HTTP on 127.0.0.1:port for Prometheus to scrape.
+    """
+    server = None
+    if port:
+        server = await asyncio.start_server(_serve_metrics, "127.0.0.1", port)
+        logger.info(f"Serving Prometheus metrics on http://127.0.0.1:{port}/metrics")
+    try:
+        while True:
+            if file_path:
+                try:
+                    tmp_path = f"{file_path}.tmp"
+                    os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+                    with open(tmp_path, "w", encoding="utf-8") as f:
+                        f.write(metrics.render_prometheus())
+                    os.replace(tmp_path, file_path)
+                except OSError as e:
+                    logger.error(f"Failed to write metrics file {file_path}: {e}")
+            await asyncio.sleep(interval)
+    finally:
+        if server:
+            server.close()
+            await server.wait_closed()
+
+
+async def _serve_metrics(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        await reader.readuntil(b"\r\n\r\n")
+        body = metrics.render_prometheus().encode()
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n"
+            + f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+            + body
+        )
+        await writer.drain()
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+        pass
+    finally:
+        writer.close()
@@ -0,0 +1,75 @@
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from browser_use.agent.service import Agent, AgentHookFunc
+from mcp.server.fastmcp import Context
+
+logger = logging.getLogger(__name__)
+
+# Extracted content is truncated so notifications stay small; the full text is in the final result
+PROGRESS_CONTENT_CHARS = 1000
+
+
+def browser_step_payload(agent: Agent, event: str, max_steps: int) -> Dict[str, Any]:
+    """Summarizes the agent's latest history item: step number, URL, actions taken and extracted content."""
+    payload: Dict[str, Any] = {"event": event, "step": agent.state.n_steps, "max_steps": max_steps}
+    if not agent.state.history.history:
+        return payload
+
+    last = agent.state.history.history[-1]
+    payload["url"] = last.state.url if last.state else None
+    if event == "step_start":
+        return payload # The last item is the previous step; only its URL is still current
+
+    if last.metadata:
+        payload["step"] = last.metadata.step_number
+    actions: List[Dict[str, Any]] = []
+    if last.model_output:
+        payload["next_goal"] = last.model_output.current_state.next_goal
+        actions = [action.model_dump(exclude_unset=True) for action in last.model_output.action]
+    payload["actions"] = actions
+    payload["extracted_content"] = [
+        r.extracted_content[:PROGRESS_CONTENT_CHARS] for r in last.result if r.extracted_content
+    ]
+    payload["errors"] = [r.error[:PROGRESS_CONTENT_CHARS] for r in last.result if r.error]
+    payload["is_done"] = agent.state.history.is_done()
+    return payload
+
+
+class ProgressNotifier:
+    """
+    Streams progress for one tool call to the MCP client.
+
+    Each event becomes a progress notification (when the client sent a progress token)
+    plus an info log notification carrying the JSON payload. Delivery failures are
+    logged and swallowed so a disconnected client never aborts the run.
+    """
+
+    def __init__(self, ctx: Optional[Context], logger_name: str):
+        self.ctx = ctx
+        self.logger_name = logger_name
+
+    async def notify(self, progress: float, total: Optional[float], payload: Dict[str, Any]):
+        if self.ctx is None:
+            return
+        try:
+            await self.ctx.report_progress(progress, total)
+            await self.ctx.log("info", json.dumps(payload, default=str), logger_name=self.logger_name)
+        except Exception as e:
+            logger.debug(f"Failed to send progress notification: {e}")
+
+    def browser_agent_hooks(self, max_steps: int) -> Tuple[AgentHookFunc, AgentHookFunc]:
+        """Returns (on_step_start, on_step_end) hooks for BrowserUseAgent.run."""
+
+        async def on_step_start(agent: Agent):
+            await self.notify(agent.state.n_steps - 1, max_steps, browser_step_payload(agent, "step_start", max_steps))
+
+        async def on_step_end(agent: Agent):
+            await self.notify(agent.state.n_steps - 1, max_steps, browser_step_payload(agent, "step_end", max_steps))
+
+        return on_step_start, on_step_end
+
+    async def research_event(self, payload: Dict[str, Any]):
+        """progress_callback for DeepResearchAgent.run: progress is plan steps completed out of the plan length."""
+        await self.notify(payload.get("completed_steps", 0), payload.get("total_steps") or None, payload)
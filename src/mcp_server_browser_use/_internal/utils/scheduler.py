@@ -0,0 +1,216 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import psutil
+
+from .metrics import QUEUE_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+CHROME_PROCESS_NAMES = ("chrome", "chromium", "headless_shell")
+
+
+class SchedulerFullError(RuntimeError):
+    """Raised when a run is rejected because the admission queue is full."""
+
+
+def chrome_rss_bytes() -> int:
+    """Sums the resident memory of Chrome/Chromium processes descended from this server process."""
+    total = 0
+    try:
+        children = psutil.Process().children(recursive=True)
+    except psutil.Error:
+        return 0
+    for proc in children:
+        try:
+            if any(name in proc.name().lower() for name in CHROME_PROCESS_NAMES):
+                total += proc.memory_info().rss
+        except psutil.Error:
+            continue # Process exited while we were looking at it
+    return total
+
+
+@dataclass(order=True)
+class _Waiter:
+    sort_key: tuple
+    tool: str = field(compare=False)
+    priority: int = field(compare=False)
+    slots: int = field(compare=False)
+    enqueued_at: float = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+@dataclass
+class _Admission:
+    admission_id: int
+    tool: str
+    priority: int
+    slots: int
+    admitted_at: float
+    waited_seconds: float
+
+
+class AdmissionScheduler:
+    """
+    Admission control in front of the agent tools.
+
+    Every run asks for a number of slots (roughly, the browsers it will open) and
+    waits in a priority queue until enough slots are free. Higher priority runs are
+    admitted first; equal priorities are FIFO. When the queue is already max_queue_depth
+    deep new runs are rejected immediately with SchedulerFullError. While the live RSS
+    of Chrome processes is above rss_limit_mb no new run is admitted unless nothing is
+    running, so bursts queue instead of pushing the host into OOM.
+    """
+
+    def __init__(
+            self,
+            max_slots: int = 4,
+            max_queue_depth: int = 16,
+            rss_limit_mb: Optional[float] = None,
+            rss_poll_interval: float = 2.0,
+    ):
+        self.max_slots = max(1, max_slots)
+        self.max_queue_depth = max_queue_depth
+        self.rss_limit_mb = rss_limit_mb
+        self.rss_poll_interval = rss_poll_interval
+
+        self._queue: List[_Waiter] = []
+        self._active: Dict[int, _Admission] = {}
+        self._used_slots = 0
+        self._seq = itertools.count()
+        self._recheck: Optional[asyncio.TimerHandle] = None
+        self._rss_bytes = 0
+        self._rss_sampled_at = 0.0
+        self.admitted = 0
+        self.rejected = 0
+
+    @asynccontextmanager
+    async def admit(self, tool: str, priority: int = 0, slots: int = 1) -> AsyncIterator[None]:
+        """Waits for admission, holds the slots for the body of the with-block, then frees them."""
+        admission = await self.acquire(tool, priority, slots)
+        try:
+            yield
+        finally:
+            self.release(admission)
+
+    def check_capacity(self):
+        """Raises SchedulerFullError if a new run would be rejected right now."""
+        if len(self._queue) >= self.max_queue_depth:
+            self.rejected += 1
+            raise SchedulerFullError(
+                f"Server is at capacity: {len(self._queue)} run(s) already queued (limit {self.max_queue_depth}). Try again later."
+            )
+
+    async def acquire(self, tool: str, priority: int = 0, slots: int = 1) -> _Admission:
+        slots = max(1, min(slots, self.max_slots)) # A run larger than the whole budget still gets to run alone
+        self.check_capacity()
+
+        loop = asyncio.get_running_loop()
+        seq = next(self._seq)
+        waiter = _Waiter((-priority, seq), tool, priority, slots, time.monotonic(), loop.create_future())
+        heapq.heappush(self._queue, waiter)
+        self._dispatch()
+        if not waiter.future.done():
+            logger.info(f"Queued {tool} run (priority {priority}, {slots} slot(s)); {len(self._queue)} run(s) waiting.")
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self.release(waiter.future.result()) # Admitted just as we were cancelled
+            elif waiter in self._queue:
+                self._queue.remove(waiter)
+                heapq.heapify(self._queue)
+                self._dispatch()
+            raise
+        return waiter.future.result()
+
+    def release(self, admission: _Admission):
+        if self._active.pop(admission.admission_id, None) is None:
+            return
+        self._used_slots -= admission.slots
+        self._dispatch()
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "max_slots": self.max_slots,
+            "used_slots": self._used_slots,
+            "max_queue_depth": self.max_queue_depth,
+            "chrome_rss_mb": round(self._sample_rss() / 2**20, 1),
+            "rss_limit_mb": self.rss_limit_mb,
+            "memory_backpressure": self._over_memory_limit(),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "active": [
+                {
+                    "tool": a.tool,
+                    "priority": a.priority,
+                    "slots": a.slots,
+                    "running_seconds": round(now - a.admitted_at, 1),
+                    "waited_seconds": round(a.waited_seconds, 3),
+                }
+                for a in self._active.values()
+            ],
+            "queued": [
+                {
+                    "position": position,
+                    "tool": w.tool,
+                    "priority": w.priority,
+                    "slots": w.slots,
+                    "waiting_seconds": round(now - w.enqueued_at, 1),
+                }
+                for position, w in enumerate(sorted(self._queue), start=1)
+            ],
+        }
+
+    def _dispatch(self):
+        """Admits queued runs in priority order while slots and memory allow."""
+        while self._queue:
+            head = self._queue[0]
+            if head.future.done(): # Cancelled while queued
+                heapq.heappop(self._queue)
+                continue
+            if self._used_slots + head.slots > self.max_slots:
+                return # Strict priority order: smaller runs behind the head do not jump it
+            if self._active and self._over_memory_limit():
+                self._schedule_recheck()
+                return
+
+            heapq.heappop(self._queue)
+            now = time.monotonic()
+            admission = _Admission(next(self._seq), head.tool, head.priority, head.slots, now, now - head.enqueued_at)
+            self._active[admission.admission_id] = admission
+            self._used_slots += head.slots
+            self.admitted += 1
+            QUEUE_WAIT_SECONDS.observe(admission.waited_seconds, stage="admission")
+            head.future.set_result(admission)
+
+    def _over_memory_limit(self) -> bool:
+        if not self.rss_limit_mb:
+            return False
+        return self._sample_rss() > self.rss_limit_mb * 2**20
+
+    def _sample_rss(self) -> int:
+        now = time.monotonic()
+        if now - self._rss_sampled_at >= self.rss_poll_interval:
+            self._rss_bytes = chrome_rss_bytes()
+            self._rss_sampled_at = now
+        return self._rss_bytes
+
+    def _schedule_recheck(self):
+        """Memory can drop without any run finishing (pages closing), so poll while runs are held back."""
+        if self._recheck is not None and not self._recheck.cancelled():
+            return
+
+        def recheck():
+            self._recheck = None
+            self._dispatch()
+
+        logger.info(f"Chrome RSS {self._rss_bytes / 2**20:.0f}MB is above {self.rss_limit_mb}MB; holding back queued runs.")
+        self._recheck = asyncio.get_running_loop().call_later(self.rss_poll_interval, recheck)
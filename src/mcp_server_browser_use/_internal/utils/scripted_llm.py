@@ -0,0 +1,145 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import Field
+
+logger = logging.getLogger(__name__)
+
+STEP_PATTERN = re.compile(r"Current step: (\d+)/")
+RESEARCH_STEP_PATTERN = re.compile(r"Research Task \(Step (\d+)\): (.*)", re.DOTALL)
+PLAN_PROMPT_MARKER = "Generate a research plan for the topic:"
+SEARCH_TOOL_NAME = "parallel_browser_search"
+AGENT_OUTPUT_TOOL_NAME = "AgentOutput"
+
+
+def _message_text(message: BaseMessage) -> str:
+    if isinstance(message.content, str):
+        return message.content
+    return "\n".join(part.get("text", "") for part in message.content if isinstance(part, dict))
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Deterministic offline chat model for benchmarks, selected with provider "scripted".
+
+    model_name is the path of a JSON script; responses are picked from it by recognising
+    the prompt shape instead of calling an API:
+
+    - browser agent steps (a "Current step: N/M" message): step N of the first entry in
+      "agents" whose "match" substring occurs in the task, as an AgentOutput tool call.
+      Running past the scripted steps yields a done action.
+    - deep research planning: the "plan" list as a numbered list.
+    - deep research execution: a parallel_browser_search call with "queries"[step - 1].
+    - anything else (e.g. report synthesis): the "report" text.
+
+    "latency_seconds" adds a fixed delay per call to stand in for model latency.
+    Token usage is estimated at 4 characters per token so metrics stay meaningful.
+    """
+
+    model_name: str = "scripted"
+    script: Dict[str, Any] = Field(default_factory=dict)
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        if not self.script and self.model_name and os.path.isfile(self.model_name):
+            with open(self.model_name, "r", encoding="utf-8") as f:
+                self.script = json.load(f)
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model_name": self.model_name}
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def _generate(
+            self,
+            messages: List[BaseMessage],
+            stop: Optional[List[str]] = None,
+            run_manager: Optional[CallbackManagerForLLMRun] = None,
+            **kwargs: Any,
+    ) -> ChatResult:
+        if self.script.get("latency_seconds"):
+            time.sleep(self.script["latency_seconds"])
+        return self._respond(messages, kwargs.get("tools") or [])
+
+    async def _agenerate(
+            self,
+            messages: List[BaseMessage],
+            stop: Optional[List[str]] = None,
+            run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+            **kwargs: Any,
+    ) -> ChatResult:
+        if self.script.get("latency_seconds"):
+            await asyncio.sleep(self.script["latency_seconds"])
+        return self._respond(messages, kwargs.get("tools") or [])
+
+    def _respond(self, messages: List[BaseMessage], tools: List[Dict[str, Any]]) -> ChatResult:
+        tool_names = {tool["function"]["name"] for tool in tools}
+        human_texts = [_message_text(m) for m in messages if isinstance(m, HumanMessage)]
+        last_human = human_texts[-1] if human_texts else ""
+
+        if step_match := STEP_PATTERN.search(last_human):
+            message = self._agent_step(int(step_match.group(1)), "\n".join(human_texts), AGENT_OUTPUT_TOOL_NAME in tool_names)
+        elif PLAN_PROMPT_MARKER in last_human:
+            plan = self.script.get("plan") or [last_human.split(PLAN_PROMPT_MARKER, 1)[1].strip()]
+            message = AIMessage(content="\n".join(f"{i}. {task}" for i, task in enumerate(plan, start=1)))
+        elif SEARCH_TOOL_NAME in tool_names and (research_match := RESEARCH_STEP_PATTERN.search(last_human)):
+            step, task = int(research_match.group(1)), research_match.group(2).strip()
+            queries = self.script.get("queries") or []
+            step_queries = queries[step - 1] if step - 1 < len(queries) else [task]
+            message = self._tool_call_message(SEARCH_TOOL_NAME, {"queries": step_queries})
+        elif "capital of France" in last_human:
+            message = AIMessage(content="Paris") # browser-use's connection check
+        else:
+            message = AIMessage(content=self.script.get("report", "# Report\n\nNo report scripted."))
+
+        input_tokens = sum(len(_message_text(m)) for m in messages) // 4
+        output_tokens = max(1, len(message.content or json.dumps([c["args"] for c in message.tool_calls])) // 4)
+        message.usage_metadata = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _agent_step(self, step: int, conversation: str, as_tool_call: bool) -> AIMessage:
+        steps: List[List[Dict[str, Any]]] = []
+        for agent_script in self.script.get("agents", []):
+            if agent_script.get("match", "") in conversation:
+                steps = agent_script.get("steps", [])
+                break
+        if step - 1 < len(steps):
+            actions = steps[step - 1]
+        else:
+            actions = [{"done": {"text": "Scripted run finished.", "success": bool(steps)}}]
+        output = {
+            "current_state": {
+                "evaluation_previous_goal": "Success",
+                "memory": f"Scripted step {step}",
+                "next_goal": f"Run scripted step {step}",
+            },
+            "action": actions,
+        }
+        if as_tool_call:
+            return self._tool_call_message(AGENT_OUTPUT_TOOL_NAME, output)
+        return AIMessage(content=json.dumps(output))
+
+    @staticmethod
+    def _tool_call_message(name: str, args: Dict[str, Any]) -> AIMessage:
+        return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": f"call_{uuid.uuid4().hex[:12]}", "type": "tool_call"}])
@@ -0,0 +1,90 @@
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from .metrics import AGENT_STEP_PHASE_SECONDS, STEP_SECONDS_SAVED
+
+
+@dataclass
+class StepTiming:
+    """Where one agent step's time went."""
+    step: int
+    phases: Dict[str, float] = field(default_factory=dict) # Seconds per phase; dom, screenshot and page_info run inside state
+    wall: float = 0.0 # Time the run loop spent on the step
+    saved: float = 0.0 # Phase time that overlapped other phases or ran off the critical path
+
+    def add(self, phase: str, seconds: float):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "step": self.step,
+            "wall_seconds": round(self.wall, 3),
+            "saved_seconds": round(self.saved, 3),
+            "phases": {phase: round(seconds, 3) for phase, seconds in self.phases.items()},
+        }
+
+
+class StepTimings:
+    """Per-step phase timings of one agent run, and what pipelining saved per step."""
+
+    def __init__(self):
+        self.steps: List[StepTiming] = []
+
+    def begin(self, step: int) -> StepTiming:
+        timing = StepTiming(step)
+        self.steps.append(timing)
+        return timing
+
+    def summary(self) -> Dict[str, Any]:
+        count = len(self.steps)
+        wall = sum(timing.wall for timing in self.steps)
+        saved = sum(timing.saved for timing in self.steps)
+        phases: Dict[str, float] = {}
+        for timing in self.steps:
+            for phase, seconds in timing.phases.items():
+                phases[phase] = phases.get(phase, 0.0) + seconds
+        return {
+            "steps": count,
+            "wall_seconds": round(wall, 3),
+            "serial_estimate_seconds": round(wall + saved, 3), # The same steps with every phase run one after another
+            "saved_seconds": round(saved, 3),
+            "mean_step_seconds": round(wall / count, 3) if count else None,
+            "mean_saved_per_step": round(saved / count, 3) if count else None,
+            "mean_phase_seconds": {phase: round(seconds / count, 3) for phase, seconds in phases.items()},
+        }
+
+
+_current_step: ContextVar[Optional[StepTiming]] = ContextVar("current_step_timing", default=None)
+
+
+def bind_step(timing: Optional[StepTiming]) -> Token:
+    """Makes timing the step that phases in this task (and tasks it starts) are recorded into."""
+    return _current_step.set(timing)
+
+
+def current_step() -> Optional[StepTiming]:
+    return _current_step.get()
+
+
+def record_saved(seconds: float):
+    timing = _current_step.get()
+    if timing is not None and seconds > 0:
+        timing.saved += seconds
+        STEP_SECONDS_SAVED.inc(seconds)
+
+
+@asynccontextmanager
+async def step_phase(phase: str) -> AsyncIterator[None]:
+    """Times a phase into the phase histogram and, inside an agent step, into that step's timing."""
+    timing = _current_step.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        AGENT_STEP_PHASE_SECONDS.observe(elapsed, phase=phase)
+        if timing is not None:
+            timing.add(phase, elapsed)
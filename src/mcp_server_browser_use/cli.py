@@ -6,7 +6,7 @@ import sys
 import traceback
 import uuid
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, cast
 
 import typer
 from dotenv import load_dotenv
@@ -14,14 +14,19 @@ from dotenv import load_dotenv
 from .config import AppSettings, settings as global_settings # Import AppSettings and the global instance
 # Import from _internal
 from ._internal.agent.browser_use.browser_use_agent import BrowserUseAgent, AgentHistoryList
+from ._internal.agent.browser_use.trajectory_cache import get_trajectory_cache
 from ._internal.agent.deep_research.deep_research_agent import DeepResearchAgent
-from ._internal.browser.custom_browser import CustomBrowser
+from ._internal.browser.custom_browser import CustomBrowser, CustomBrowserConfig
 from ._internal.browser.custom_context import (
     CustomBrowserContext,
     CustomBrowserContextConfig,
 )
+from ._internal.browser.cdp_fleet import CdpFleet, parse_cdp_urls
+from ._internal.browser.port_allocator import parse_port_range
+from ._internal.browser.request_filter import parse_domains, resolve_request_policy
 from ._internal.controller.custom_controller import CustomController
 from ._internal.utils import llm_provider as internal_llm_provider
+from ._internal.utils.mcp_client import close_mcp_session_managers
 from browser_use.browser.browser import BrowserConfig
 from browser_use.agent.views import AgentOutput
 from browser_use.browser.views import BrowserState
@@ -124,6 +129,7 @@ async def _run_browser_agent_logic_cli(task_str: str, current_settings: AppSetti
     browser_instance: Optional[CustomBrowser] = None
     context_instance: Optional[CustomBrowserContext] = None
     controller_instance: Optional[CustomController] = None
+    fleet: Optional[CdpFleet] = None
 
     try:
         # LLM Setup
@@ -133,6 +139,8 @@ async def _run_browser_agent_logic_cli(task_str: str, current_settings: AppSetti
         if current_settings.llm.planner_provider and current_settings.llm.planner_model_name:
             planner_llm_config = current_settings.get_llm_config(is_planner=True)
             planner_llm = internal_llm_provider.get_llm_model(**planner_llm_config)
+        compaction_llm_config = current_settings.get_compaction_llm_config()
+        compaction_llm = internal_llm_provider.get_llm_model(**compaction_llm_config) if compaction_llm_config else None
 
         # Controller Setup
         controller_instance = CustomController(ask_assistant_callback=cli_ask_human_callback)
@@ -148,26 +156,44 @@ async def _run_browser_agent_logic_cli(task_str: str, current_settings: AppSetti
         agent_disable_security_override = current_settings.agent_tool.disable_security
         browser_disable_security = agent_disable_security_override if agent_disable_security_override is not None else current_settings.browser.disable_security
 
-        if current_settings.browser.use_own_browser and current_settings.browser.cdp_url:
+        cdp_urls = parse_cdp_urls(current_settings.browser.cdp_urls)
+        if cdp_urls:
+            fleet = CdpFleet(cdp_urls, probe_interval=0) # One-shot run: probe once, no background re-probing
+            await fleet.start()
+            browser_cfg = None
+        elif current_settings.browser.use_own_browser and current_settings.browser.cdp_url:
             browser_cfg = BrowserConfig(cdp_url=current_settings.browser.cdp_url, wss_url=current_settings.browser.wss_url, user_data_dir=current_settings.browser.user_data_dir)
         else:
-            browser_cfg = BrowserConfig(
+            browser_cfg = CustomBrowserConfig(
                 headless=browser_headless,
                 disable_security=browser_disable_security,
                 browser_binary_path=current_settings.browser.binary_path,
                 user_data_dir=current_settings.browser.user_data_dir,
                 window_width=current_settings.browser.window_width,
                 window_height=current_settings.browser.window_height,
+                fast_start=current_settings.browser.fast_start,
+                profile_template_dir=current_settings.browser.profile_template_dir,
+                debugging_port_range=parse_port_range(current_settings.browser.debugging_port_range),
             )
-        browser_instance = CustomBrowser(config=browser_cfg)
-
         context_cfg = CustomBrowserContextConfig(
             trace_path=current_settings.browser.trace_path,
+            **current_settings.get_trace_config(),
             save_downloads_path=current_settings.paths.downloads,
             save_recording_path=current_settings.agent_tool.save_recording_path if current_settings.agent_tool.enable_recording else None,
-            force_new_context=True # CLI always gets a new context
+            force_new_context=True, # CLI always gets a new context
+            request_policy=resolve_request_policy(current_settings.browser.request_policy, current_settings.agent_tool.use_vision),
+            blocked_domains=parse_domains(current_settings.browser.blocked_domains),
+            max_resource_bytes=current_settings.browser.max_resource_bytes,
+            **current_settings.get_response_cache_config(),
+            **current_settings.get_storage_state_config(),
+            **current_settings.get_screenshot_config(),
         )
-        context_instance = await browser_instance.new_context(config=context_cfg)
+        if fleet:
+            context_instance = await fleet.new_context(context_cfg)
+            browser_instance = cast(CustomBrowser, context_instance.browser)
+        else:
+            browser_instance = CustomBrowser(config=browser_cfg)
+            context_instance = await browser_instance.new_context(config=context_cfg)
 
         agent_history_json_file = None
         task_history_base_path = current_settings.agent_tool.history_path
@@ -185,22 +211,54 @@ async def _run_browser_agent_logic_cli(task_str: str, current_settings: AppSetti
             planner_llm=planner_llm,
             max_actions_per_step=current_settings.agent_tool.max_actions_per_step,
             use_vision=current_settings.agent_tool.use_vision,
+            pipelined=current_settings.agent_tool.pipelined_steps,
+            dom_diff=current_settings.agent_tool.dom_diff,
+            dom_diff_max_change=current_settings.agent_tool.dom_diff_max_change,
+            history_token_budget=current_settings.agent_tool.history_token_budget,
+            history_keep_steps=current_settings.agent_tool.history_keep_steps,
+            compaction_llm=compaction_llm,
             register_new_step_callback=cli_on_step_callback,
         )
+        trajectory_cache = None
+        if current_settings.agent_tool.trajectory_cache_enabled:
+            trajectory_cache = get_trajectory_cache(
+                current_settings.agent_tool.trajectory_cache_dir, current_settings.agent_tool.trajectory_cache_max_entries)
+            agent_instance.trajectory = trajectory_cache.lookup(task_str, agent_instance.AgentOutput)
 
         # Run Agent
         history: AgentHistoryList = await agent_instance.run(max_steps=current_settings.agent_tool.max_steps)
-        agent_instance.save_history(agent_history_json_file)
+        if agent_history_json_file:
+            agent_instance.save_history(agent_history_json_file)
+        if trajectory_cache:
+            if agent_instance.trajectory:
+                trajectory_cache.record_replay(agent_instance.trajectory)
+            trajectory_cache.record(task_str, history)
+            logger.info(f"Trajectory cache: {trajectory_cache.stats.snapshot()}")
+        if current_settings.browser.storage_state and current_settings.browser.storage_state_autosave and history.is_successful():
+            await context_instance.save_storage_state()
         final_result = history.final_result() or "Agent finished without a final result."
         logger.info(f"CLI Agent task {agent_task_id} completed.")
+        if current_settings.agent_tool.use_vision and context_instance.screenshots.active:
+            logger.info(f"Screenshots ({context_instance.screenshots.image_format}): {context_instance.screenshots.stats.snapshot()}")
+        logger.info(f"Step timings ({'pipelined' if agent_instance.pipelined else 'serial'}): {agent_instance.step_timings.summary()}")
+        if agent_instance.diff_manager:
+            logger.info(f"DOM diff: {agent_instance.diff_manager.stats.snapshot()}")
+        if agent_instance.compactor:
+            logger.info(f"History compaction: {agent_instance.compactor.stats.snapshot()}")
 
     except Exception as e:
         logger.error(f"CLI Error in run_browser_agent: {e}\n{traceback.format_exc()}")
         final_result = f"Error: {e}"
     finally:
-        if context_instance: await context_instance.close()
-        if browser_instance and not current_settings.browser.use_own_browser : await browser_instance.close() # Only close if we launched it
+        if fleet:
+            if context_instance:
+                await fleet.close_context(context_instance)
+            await fleet.close() # Only disconnects; the fleet's browsers keep running
+        else:
+            if context_instance: await context_instance.close()
+            if browser_instance and not current_settings.browser.use_own_browser : await browser_instance.close() # Only close if we launched it
         if controller_instance: await controller_instance.close_mcp_client()
+        await close_mcp_session_managers() # One-shot process: stop the MCP servers it started
 
     return final_result
 
@@ -222,9 +280,31 @@ async def _run_deep_research_logic_cli(research_task_str: str, max_parallel_brow
             "window_width": current_settings.browser.window_width,
             "window_height": current_settings.browser.window_height,
             "trace_path": current_settings.browser.trace_path,
+            **current_settings.get_trace_config(),
             "save_downloads_path": current_settings.paths.downloads,
+            "fast_start": current_settings.browser.fast_start,
+            "profile_template_dir": current_settings.browser.profile_template_dir,
+            "debugging_port_range": parse_port_range(current_settings.browser.debugging_port_range),
+            "request_policy": current_settings.browser.request_policy,
+            "blocked_domains": parse_domains(current_settings.browser.blocked_domains),
+            "max_resource_bytes": current_settings.browser.max_resource_bytes,
+            **current_settings.get_response_cache_config(),
+            **current_settings.get_storage_state_config(),
+            **current_settings.get_screenshot_config(),
+            "shared_browser": current_settings.research_tool.shared_browser,
+            "max_tab_restarts": current_settings.research_tool.max_tab_restarts,
+            "pipelined_steps": current_settings.agent_tool.pipelined_steps,
+            "dom_diff": current_settings.agent_tool.dom_diff,
+            "dom_diff_max_change": current_settings.agent_tool.dom_diff_max_change,
+            "history_token_budget": current_settings.agent_tool.history_token_budget,
+            "history_keep_steps": current_settings.agent_tool.history_keep_steps,
+            "compaction_llm_config": current_settings.get_compaction_llm_config(),
         }
-        if current_settings.browser.use_own_browser and current_settings.browser.cdp_url:
+        if current_settings.browser.cdp_urls:
+            dr_browser_cfg["cdp_urls"] = parse_cdp_urls(current_settings.browser.cdp_urls)
+            dr_browser_cfg["fleet_max_contexts"] = current_settings.browser.fleet_max_contexts
+            dr_browser_cfg["fleet_probe_interval"] = current_settings.browser.fleet_probe_interval
+        elif current_settings.browser.use_own_browser and current_settings.browser.cdp_url:
             dr_browser_cfg["cdp_url"] = current_settings.browser.cdp_url
             dr_browser_cfg["wss_url"] = current_settings.browser.wss_url
 
@@ -265,6 +345,8 @@ async def _run_deep_research_logic_cli(research_task_str: str, max_parallel_brow
     except Exception as e:
         logger.error(f"CLI Error in run_deep_research: {e}\n{traceback.format_exc()}")
         report_content = f"Error: {e}"
+    finally:
+        await close_mcp_session_managers()
 
     return report_content
 
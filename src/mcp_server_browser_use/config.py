@@ -41,6 +41,10 @@ class LLMSettings(BaseSettings):
     ollama_num_ctx: Optional[int] = Field(default=32000, env="OLLAMA_NUM_CTX")
     ollama_num_predict: Optional[int] = Field(default=1024, env="OLLAMA_NUM_PREDICT")
 
+    # Reuse of LLM clients (and their HTTP connection pools) across tool calls
+    client_cache_size: int = Field(default=8, env="CLIENT_CACHE_SIZE") # Distinct provider configs kept; 0 disables the cache
+    client_cache_ttl: float = Field(default=1800.0, env="CLIENT_CACHE_TTL") # Seconds before a cached client is rebuilt
+
     # Planner LLM settings (optional, defaults to main LLM if not set)
     planner_provider: Optional[str] = Field(default=None, env="PLANNER_PROVIDER")
     planner_model_name: Optional[str] = Field(default=None, env="PLANNER_MODEL_NAME")
@@ -48,6 +52,10 @@ class LLMSettings(BaseSettings):
     planner_base_url: Optional[str] = Field(default=None, env="PLANNER_BASE_URL")
     planner_api_key: Optional[SecretStr] = Field(default=None, env="PLANNER_API_KEY")
 
+    # History compaction LLM (optional, defaults to the agent's LLM); keys and endpoints come from the provider-specific settings
+    compaction_provider: Optional[str] = Field(default=None, env="COMPACTION_PROVIDER")
+    compaction_model_name: Optional[str] = Field(default=None, env="COMPACTION_MODEL_NAME")
+
 
 class BrowserSettings(BaseSettings):
     model_config = SettingsConfigDict(env_prefix="MCP_BROWSER_")
@@ -61,8 +69,63 @@ class BrowserSettings(BaseSettings):
     use_own_browser: bool = Field(default=False, env="USE_OWN_BROWSER")
     cdp_url: Optional[str] = Field(default=None, env="CDP_URL")
     wss_url: Optional[str] = Field(default=None, env="WSS_URL") # For CDP connection if needed
+    cdp_urls: Optional[str] = Field(default=None, env="CDP_URLS") # Comma-separated fleet of CDP endpoints; overrides every other browser mode
+    fleet_max_contexts: Optional[int] = Field(default=None, env="FLEET_MAX_CONTEXTS") # Per endpoint; further calls wait for a release
+    # Seconds between fleet health checks; evicted endpoints back off up to 8x
+    fleet_probe_interval: float = Field(default=30.0, env="FLEET_PROBE_INTERVAL")
     keep_open: bool = Field(default=False, env="KEEP_OPEN") # Server-managed browser persistence
     trace_path: Optional[str] = Field(default=None, env="TRACE_PATH")
+    trace_mode: str = Field(default="always", env="TRACE_MODE") # always, sampled or on-failure
+    trace_sample_rate: int = Field(default=10, env="TRACE_SAMPLE_RATE") # sampled: trace 1 in N runs
+    trace_ring_size: int = Field(default=5, env="TRACE_RING_SIZE") # on-failure: last N step chunks saved when a run fails
+
+    # Warm browser pool for run_browser_agent (server-managed browsers only)
+    pool_enabled: bool = Field(default=False, env="POOL_ENABLED")
+    pool_min_size: int = Field(default=1, env="POOL_MIN_SIZE") # Browsers kept launched even when idle
+    pool_max_size: int = Field(default=3, env="POOL_MAX_SIZE") # Upper bound on concurrently leased browsers
+    pool_idle_timeout: float = Field(default=300.0, env="POOL_IDLE_TIMEOUT") # Seconds before an idle browser above min size is closed
+    pool_max_uses: int = Field(default=20, env="POOL_MAX_USES") # Leases before a browser is recycled
+    context_pool_min_size: int = Field(default=2, env="CONTEXT_POOL_MIN_SIZE") # keep_open: contexts pre-created on the shared browser
+    context_pool_max_size: int = Field(default=5, env="CONTEXT_POOL_MAX_SIZE") # keep_open: upper bound on concurrently leased contexts
+    context_pool_max_uses: int = Field(default=50, env="CONTEXT_POOL_MAX_USES") # keep_open: leases before a context is replaced
+
+    # Fast start: launch builtin Chromium from a clone of a pre-warmed profile template
+    fast_start: bool = Field(default=False, env="FAST_START")
+    profile_template_dir: Optional[str] = Field(default=None, env="PROFILE_TEMPLATE_DIR") # Default: ~/.cache/mcp-server-browser-use/profile-template
+    debugging_port_range: str = Field(default="9222-9321", env="DEBUGGING_PORT_RANGE") # Remote-debugging ports leased to launched browsers
+
+    # Chrome process supervisor: per-browser RSS/CPU/age sampling, recycling between runs, orphan reaping
+    supervisor_interval: float = Field(default=15.0, env="SUPERVISOR_INTERVAL") # Seconds between samples; 0 disables the supervisor task
+    # Recycle a browser between runs once its process tree is above this
+    max_browser_rss_mb: Optional[float] = Field(default=None, env="MAX_BROWSER_RSS_MB")
+    max_browser_age: Optional[float] = Field(default=None, env="MAX_BROWSER_AGE") # Seconds; recycle a browser between runs once it is older
+    reap_orphans: bool = Field(default=True, env="REAP_ORPHANS") # Kill Chrome processes that outlive their browser
+
+    # Request interception: full | vision-lite | text-only | auto (text-only without vision, vision-lite with)
+    request_policy: str = Field(default="full", env="REQUEST_POLICY")
+    blocked_domains: Optional[str] = Field(default=None, env="BLOCKED_DOMAINS") # Comma-separated, added to the preset's blocklist
+    max_resource_bytes: Optional[int] = Field(default=None, env="MAX_RESOURCE_BYTES") # Overrides the preset's size limit
+
+    # Screenshots sent to vision LLMs
+    screenshot_format: str = Field(default="png", env="SCREENSHOT_FORMAT") # png, jpeg or webp
+    screenshot_quality: int = Field(default=80, env="SCREENSHOT_QUALITY") # jpeg/webp quality, 1-100
+    screenshot_max_width: Optional[int] = Field(default=None, env="SCREENSHOT_MAX_WIDTH") # Downscale wider screenshots (pixels)
+    screenshot_crop_to_viewport: bool = Field(default=False, env="SCREENSHOT_CROP_TO_VIEWPORT") # Clip to the visual viewport
+    screenshot_dedupe: bool = Field(default=False, env="SCREENSHOT_DEDUPE") # Skip images of pages that look unchanged
+    screenshot_dedupe_threshold: int = Field(default=2, env="SCREENSHOT_DEDUPE_THRESHOLD") # Max differing bits of the 64-bit hash
+
+    # Shared on-disk HTTP response cache for all browser contexts
+    response_cache_enabled: bool = Field(default=False, env="RESPONSE_CACHE_ENABLED")
+    response_cache_dir: Optional[str] = Field(default=None, env="RESPONSE_CACHE_DIR") # Default: ~/.cache/mcp-server-browser-use/http-cache
+    response_cache_max_mb: int = Field(default=512, env="RESPONSE_CACHE_MAX_MB") # LRU eviction above this size
+    # Seconds; overrides Cache-Control for static assets
+    response_cache_static_ttl: Optional[float] = Field(default=None, env="RESPONSE_CACHE_STATIC_TTL")
+    response_cache_respect_cache_control: bool = Field(default=True, env="RESPONSE_CACHE_RESPECT_CACHE_CONTROL")
+
+    # Named storage-state snapshots (cookies, localStorage, IndexedDB) for signed-in contexts
+    storage_state: Optional[str] = Field(default=None, env="STORAGE_STATE") # Snapshot name applied to new contexts
+    storage_state_dir: Optional[str] = Field(default=None, env="STORAGE_STATE_DIR") # Default: ~/.cache/mcp-server-browser-use/storage-states
+    storage_state_autosave: bool = Field(default=False, env="STORAGE_STATE_AUTOSAVE") # Save the session back after each successful run_browser_agent
 
 
 class AgentToolSettings(BaseSettings):
@@ -73,6 +136,16 @@ class AgentToolSettings(BaseSettings):
     tool_calling_method: Optional[str] = Field(default="auto", env="TOOL_CALLING_METHOD")
     max_input_tokens: Optional[int] = Field(default=128000, env="MAX_INPUT_TOKENS")
     use_vision: bool = Field(default=True, env="USE_VISION")
+    stop_timeout: float = Field(default=10.0, env="STOP_TIMEOUT") # stop_agent: seconds to unwind before the run is cancelled outright
+    # Overlap DOM extraction, screenshot and page info; run progress hooks and trace checkpoints off the critical path
+    pipelined_steps: bool = Field(default=False, env="PIPELINED_STEPS")
+    # Send element changes against a page snapshot kept in the conversation instead of the full element list every step
+    dom_diff: bool = Field(default=False, env="DOM_DIFF")
+    # Fraction of the snapshot that may change before a full state is resent
+    dom_diff_max_change: float = Field(default=0.3, env="DOM_DIFF_MAX_CHANGE")
+    # Summarize older steps into a memory block once the message history nears this many tokens; unset disables compaction
+    history_token_budget: Optional[int] = Field(default=None, env="HISTORY_TOKEN_BUDGET")
+    history_keep_steps: int = Field(default=4, env="HISTORY_KEEP_STEPS") # Most recent steps never summarized
 
     # Browser settings specific to this tool, can override general MCP_BROWSER_ settings
     headless: Optional[bool] = Field(default=None, env="HEADLESS")
@@ -82,12 +155,21 @@ class AgentToolSettings(BaseSettings):
     save_recording_path: Optional[str] = Field(default=None, env="SAVE_RECORDING_PATH") # e.g. ./tmp/recordings
     history_path: Optional[str] = Field(default=None, env="HISTORY_PATH") # e.g. ./tmp/agent_history
 
+    # Replay successful trajectories of tasks with the same template and start domain instead of asking the LLM
+    trajectory_cache_enabled: bool = Field(default=False, env="TRAJECTORY_CACHE_ENABLED")
+    trajectory_cache_dir: Optional[str] = Field(default=None, env="TRAJECTORY_CACHE_DIR") # Default: ~/.cache/mcp-server-browser-use/trajectories
+    trajectory_cache_max_entries: int = Field(default=500, env="TRAJECTORY_CACHE_MAX_ENTRIES")
+
 
 class DeepResearchToolSettings(BaseSettings):
     model_config = SettingsConfigDict(env_prefix="MCP_RESEARCH_TOOL_")
 
     max_parallel_browsers: int = Field(default=3, env="MAX_PARALLEL_BROWSERS")
+    shared_browser: bool = Field(default=False, env="SHARED_BROWSER") # Sub-agents share one browser, each in its own context
+    max_tab_restarts: int = Field(default=2, env="MAX_TAB_RESTARTS") # Crashed tabs reopened per sub-agent before giving up on the URL
     save_dir: Optional[str] = Field(default=None, env="SAVE_DIR") # Base dir, task_id will be appended. Optional now.
+    max_concurrent_jobs: int = Field(default=2, env="MAX_CONCURRENT_JOBS") # start_deep_research jobs running at once; others queue
+    job_result_ttl: float = Field(default=3600.0, env="JOB_RESULT_TTL") # Seconds a finished job's result stays retrievable
 
 
 class PathSettings(BaseSettings):
@@ -102,6 +184,19 @@ class ServerSettings(BaseSettings):
     anonymized_telemetry: bool = Field(default=True, env="ANONYMIZED_TELEMETRY")
     mcp_config: Optional[Dict[str, Any]] = Field(default=None, env="MCP_CONFIG") # For controller's MCP client
 
+    # Admission control for run_browser_agent / deep research
+    # Browser slots across all running tools; deep research takes max_parallel_browsers
+    max_concurrent_browsers: int = Field(default=4, env="MAX_CONCURRENT_BROWSERS")
+    max_queue_depth: int = Field(default=16, env="MAX_QUEUE_DEPTH") # Runs allowed to wait; beyond this calls are rejected at once
+    chrome_rss_limit_mb: Optional[float] = Field(default=None, env="CHROME_RSS_LIMIT_MB") # Hold back new runs while Chrome RSS is above this
+    priority_browser_agent: int = Field(default=10, env="PRIORITY_BROWSER_AGENT") # Higher runs first
+    priority_deep_research: int = Field(default=0, env="PRIORITY_DEEP_RESEARCH")
+
+    # Prometheus export of the metrics registry (also available via the get_metrics tool)
+    metrics_file: Optional[str] = Field(default=None, env="METRICS_FILE") # Rewrite Prometheus text format to this file
+    metrics_port: Optional[int] = Field(default=None, env="METRICS_PORT") # Serve Prometheus text format on 127.0.0.1:<port>
+    metrics_interval: float = Field(default=15.0, env="METRICS_INTERVAL") # Seconds between metrics file rewrites
+
 
 class AppSettings(BaseSettings):
     model_config = SettingsConfigDict(env_prefix="MCP_", extra='ignore') # Root prefix
@@ -172,6 +267,42 @@ class AppSettings(BaseSettings):
             return getattr(llm_settings_to_use, provider_specific_endpoint_name)
         return None
 
+    def get_response_cache_config(self) -> Dict[str, Any]:
+        """CustomBrowserContextConfig fields for the shared HTTP response cache."""
+        return {
+            "response_cache_enabled": self.browser.response_cache_enabled,
+            "response_cache_dir": self.browser.response_cache_dir,
+            "response_cache_max_bytes": self.browser.response_cache_max_mb * 1024 * 1024,
+            "response_cache_static_ttl": self.browser.response_cache_static_ttl,
+            "response_cache_respect_cache_control": self.browser.response_cache_respect_cache_control,
+        }
+
+    def get_storage_state_config(self) -> Dict[str, Any]:
+        """CustomBrowserContextConfig fields for the configured storage-state snapshot."""
+        return {
+            "storage_state": self.browser.storage_state,
+            "storage_state_dir": self.browser.storage_state_dir,
+        }
+
+    def get_screenshot_config(self) -> Dict[str, Any]:
+        """CustomBrowserContextConfig fields for the vision screenshot pipeline."""
+        return {
+            "screenshot_format": self.browser.screenshot_format,
+            "screenshot_quality": self.browser.screenshot_quality,
+            "screenshot_max_width": self.browser.screenshot_max_width,
+            "screenshot_crop_to_viewport": self.browser.screenshot_crop_to_viewport,
+            "screenshot_dedupe": self.browser.screenshot_dedupe,
+            "screenshot_dedupe_threshold": self.browser.screenshot_dedupe_threshold,
+        }
+
+    def get_trace_config(self) -> Dict[str, Any]:
+        """CustomBrowserContextConfig fields for trace sampling; they only apply when trace_path is set."""
+        return {
+            "trace_mode": self.browser.trace_mode,
+            "trace_sample_rate": self.browser.trace_sample_rate,
+            "trace_ring_size": self.browser.trace_ring_size,
+        }
+
     def get_llm_config(self, is_planner: bool = False) -> Dict[str, Any]:
         """Returns a dictionary of LLM settings suitable for llm_provider.get_llm_model."""
         provider = self.llm.planner_provider if is_planner and self.llm.planner_provider else self.llm.provider
@@ -192,6 +323,32 @@ class AppSettings(BaseSettings):
             "max_input_tokens": self.agent_tool.max_input_tokens if not is_planner else None,
         }
 
+        return self._with_provider_options(config)
+
+    def get_compaction_llm_config(self) -> Optional[Dict[str, Any]]:
+        """llm_provider.get_llm_model settings for history compaction, or None to compact with the agent's own LLM."""
+        if not (self.llm.compaction_provider or self.llm.compaction_model_name):
+            return None
+        provider = self.llm.compaction_provider or self.llm.provider
+        config = {
+            "provider": provider,
+            "model_name": self.llm.compaction_model_name or self.llm.model_name,
+            "temperature": 0.0,
+            "use_vision": False,
+            "tool_calling_method": "auto",
+            "max_input_tokens": None,
+        }
+        if provider == self.llm.provider:
+            config["api_key"] = self.get_api_key_for_provider(provider)
+            config["base_url"] = self.get_endpoint_for_provider(provider)
+        else: # The generic key and base URL belong to the main provider
+            key = getattr(self.llm, f"{provider.lower()}_api_key", None)
+            config["api_key"] = key.get_secret_value() if key else None
+            config["base_url"] = getattr(self.llm, f"{provider.lower()}_endpoint", None)
+        return self._with_provider_options(config)
+
+    def _with_provider_options(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        provider = config["provider"]
         if provider == "azure_openai":
             config["azure_openai_api_version"] = self.llm.azure_openai_api_version
         elif provider == "ollama":
@@ -2,12 +2,27 @@ import asyncio
 import json
 import logging
 import os
+import time
 import traceback
 import uuid
-from typing import Any, Dict, Optional
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, cast
 from pathlib import Path
 
 
+from ._internal.agent.browser_use.trajectory_cache import get_trajectory_cache
+from ._internal.browser.browser_pool import BrowserPool, ContextPool, WaitStats
+from ._internal.browser.cdp_fleet import CdpFleet, parse_cdp_urls
+from ._internal.browser.port_allocator import get_port_allocator, parse_port_range
+from ._internal.browser.process_supervisor import get_process_supervisor
+from ._internal.browser.request_filter import parse_domains, resolve_request_policy
+from ._internal.browser.response_cache import response_caches
+from ._internal.utils.agent_registry import get_agent_registry
+from ._internal.utils.job_registry import JOB_FAILED, Job, JobRegistry
+from ._internal.utils.mcp_client import close_mcp_session_managers
+from ._internal.utils.metrics import TOOL_CALLS, TOOL_SECONDS, export_prometheus, labels, metrics
+from ._internal.utils.progress import ProgressNotifier
+from ._internal.utils.scheduler import AdmissionScheduler, SchedulerFullError
 from .config import settings # Import global AppSettings instance
 
 # Configure logging using settings
@@ -37,7 +52,7 @@ from mcp.server.fastmcp import Context, FastMCP
 # Import from _internal
 from ._internal.agent.browser_use.browser_use_agent import BrowserUseAgent
 from ._internal.agent.deep_research.deep_research_agent import DeepResearchAgent
-from ._internal.browser.custom_browser import CustomBrowser
+from ._internal.browser.custom_browser import CustomBrowser, CustomBrowserConfig
 from ._internal.browser.custom_context import (
     CustomBrowserContext,
     CustomBrowserContextConfig,
@@ -49,20 +64,170 @@ from browser_use.agent.views import (
     AgentHistoryList,
 )
 
+internal_llm_provider.configure_llm_cache(settings.llm.client_cache_size, settings.llm.client_cache_ttl)
+process_supervisor = get_process_supervisor()
+process_supervisor.configure(
+    interval=settings.browser.supervisor_interval,
+    max_rss_mb=settings.browser.max_browser_rss_mb,
+    max_age=settings.browser.max_browser_age,
+    reap_orphans=settings.browser.reap_orphans,
+)
+# Running agents, for list_agents/pause_agent/resume_agent/stop_agent
+agent_registry = get_agent_registry()
+agent_registry.configure(stop_timeout=settings.agent_tool.stop_timeout)
+
 # Shared resources for MCP_BROWSER_KEEP_OPEN
 shared_browser_instance: Optional[CustomBrowser] = None
-shared_context_instance: Optional[CustomBrowserContext] = None
+shared_context_pool: Optional[ContextPool] = None # Per-call contexts on the shared browser
 shared_controller_instance: Optional[CustomController] = None # Controller might also be shared
+# Launch/startup of the shared instances runs in these tasks so waiters do not hold resource_lock
+shared_browser_ready: Optional[asyncio.Task] = None
+shared_controller_ready: Optional[asyncio.Task] = None
+# Guards only the bookkeeping of the module-level shared resources, never a launch or handshake
 resource_lock = asyncio.Lock()
 
+# Warm browser pool for MCP_BROWSER_POOL_ENABLED
+browser_pool: Optional[BrowserPool] = None
+
+# External browsers for MCP_BROWSER_CDP_URLS; every agent and research sub-agent gets a context on the least-loaded one
+cdp_fleet: Optional[CdpFleet] = None
+
+# Admission control in front of run_browser_agent and deep research
+admission_scheduler = AdmissionScheduler(
+    max_slots=settings.server.max_concurrent_browsers,
+    max_queue_depth=settings.server.max_queue_depth,
+    rss_limit_mb=settings.server.chrome_rss_limit_mb,
+)
+
+# Background deep research jobs started with start_deep_research
+research_jobs = JobRegistry(
+    max_concurrent=settings.research_tool.max_concurrent_jobs,
+    result_ttl=settings.research_tool.job_result_ttl,
+)
+
+# Time each tool call spent acquiring its browser/context/controller slots
+slot_wait_stats = WaitStats(stage="slots")
+
+# Prometheus exporter started by the lifespan when MCP_SERVER_METRICS_FILE/PORT is set
+metrics_exporter: Optional[asyncio.Task] = None
+
+
+def collect_pool_occupancy() -> Dict[Any, float]:
+    values = {}
+    for pool_name, pool in (("browser", browser_pool), ("context", shared_context_pool)):
+        if pool is None:
+            continue
+        pool_stats = pool.stats()
+        values[labels(pool=pool_name, state="idle")] = pool_stats["idle"]
+        values[labels(pool=pool_name, state="leased")] = pool_stats["leased"]
+        values[labels(pool=pool_name, state="starting")] = pool_stats.get("launching", pool_stats.get("creating", 0))
+    return values
+
+
+def collect_scheduler_state() -> Dict[Any, float]:
+    scheduler_stats = admission_scheduler.stats()
+    return {
+        labels(state="used_slots"): scheduler_stats["used_slots"],
+        labels(state="max_slots"): scheduler_stats["max_slots"],
+        labels(state="queued"): len(scheduler_stats["queued"]),
+        labels(state="active"): len(scheduler_stats["active"]),
+        labels(state="admitted"): scheduler_stats["admitted"],
+        labels(state="rejected"): scheduler_stats["rejected"],
+        labels(state="chrome_rss_mb"): scheduler_stats["chrome_rss_mb"],
+    }
+
+
+def collect_research_jobs() -> Dict[Any, float]:
+    return {labels(status=status): count for status, count in research_jobs.stats()["jobs"].items()}
+
+
+def collect_running_agents() -> Dict[Any, float]:
+    return {labels(status=status): count for status, count in agent_registry.stats()["agents"].items()}
+
+
+def collect_llm_client_cache() -> Dict[Any, float]:
+    cache_stats = internal_llm_provider.llm_client_cache.stats()
+    return {labels(state=state): cache_stats[state] for state in ("size", "hits", "misses")}
+
+
+def collect_response_cache() -> Dict[Any, float]:
+    values = {}
+    for cache in response_caches():
+        cache_stats = cache.stats()
+        for state in ("entries", "bytes", "hits", "misses", "evictions"):
+            values[labels(dir=cache.cache_dir, state=state)] = cache_stats[state]
+    return values
+
+
+def collect_browser_processes() -> Dict[Any, float]:
+    values = {}
+    for tracked in process_supervisor.browsers():
+        values[labels(browser=tracked.label, state="rss_bytes")] = tracked.rss_bytes
+        values[labels(browser=tracked.label, state="cpu_percent")] = tracked.cpu_percent
+        values[labels(browser=tracked.label, state="processes")] = tracked.processes
+        values[labels(browser=tracked.label, state="age_seconds")] = tracked.age_seconds
+    return values
+
+
+def collect_cdp_fleet() -> Dict[Any, float]:
+    values = {}
+    if cdp_fleet is None:
+        return values
+    for endpoint in cdp_fleet.endpoints:
+        values[labels(endpoint=endpoint.url, state="healthy")] = int(endpoint.healthy)
+        values[labels(endpoint=endpoint.url, state="open_contexts")] = endpoint.open_contexts
+        values[labels(endpoint=endpoint.url, state="placed")] = endpoint.placed
+        values[labels(endpoint=endpoint.url, state="evictions")] = endpoint.evictions
+    return values
+
+
+def collect_debugging_ports() -> Dict[Any, float]:
+    allocator = get_port_allocator(parse_port_range(settings.browser.debugging_port_range))
+    return {labels(range=allocator.stats()["range"]): len(allocator.stats()["leased"])}
+
+
+metrics.gauge("pool_occupancy", "Browser and context pool entries by state.", collect_pool_occupancy)
+metrics.gauge("scheduler", "Admission scheduler slots, queue depth, counters and Chrome RSS.", collect_scheduler_state)
+metrics.gauge("research_jobs", "Background deep research jobs by status.", collect_research_jobs)
+metrics.gauge("running_agents", "Running browser agents and research sub-agents by status: running, paused, stopping.", collect_running_agents)
+metrics.gauge("llm_client_cache", "Process-wide LLM client cache size, hits and misses.", collect_llm_client_cache)
+metrics.gauge("response_cache", "Shared HTTP response cache entries, bytes, hits, misses and evictions.", collect_response_cache)
+metrics.gauge("browser_processes", "Per-browser Chrome process tree RSS, CPU, process count and age.", collect_browser_processes)
+metrics.gauge("cdp_fleet", "CDP fleet endpoints: health, open contexts, placements and evictions.", collect_cdp_fleet)
+metrics.gauge("debugging_ports", "Remote-debugging ports leased to running browsers.", collect_debugging_ports)
+
+
+def record_tool_call(tool: str, started_at: float, result: str):
+    """Counts a finished tool call as ok/error (tools report errors as an 'Error: ...' string) and records its latency."""
+    status = "error" if result.startswith("Error") else "ok"
+    TOOL_CALLS.inc(tool=tool, status=status)
+    TOOL_SECONDS.observe(time.monotonic() - started_at, tool=tool)
+
 
 async def get_controller(ask_human_callback: Optional[Any] = None) -> CustomController:
     """Gets or creates a shared controller instance if keep_open is true, or a new one."""
-    global shared_controller_instance
-    if settings.browser.keep_open and shared_controller_instance:
-        # Potentially update callback if it can change per call, though usually fixed for server
-        return shared_controller_instance
+    global shared_controller_instance, shared_controller_ready
+    if not settings.browser.keep_open:
+        return await create_controller(ask_human_callback)
+
+    async with resource_lock:
+        if shared_controller_ready is None:
+            # Potentially update callback if it can change per call, though usually fixed for server
+            shared_controller_ready = asyncio.create_task(create_controller(ask_human_callback))
+        ready = shared_controller_ready
+    try:
+        controller = await asyncio.shield(ready)
+    except Exception:
+        async with resource_lock:
+            if shared_controller_ready is ready:
+                shared_controller_ready = None # Let the next call retry
+        raise
+    shared_controller_instance = controller
+    return controller
 
+
+async def create_controller(ask_human_callback: Optional[Any] = None) -> CustomController:
+    """Builds a controller and starts its MCP client, if one is configured."""
     controller = CustomController(ask_assistant_callback=ask_human_callback)
     if settings.server.mcp_config:
         try:
@@ -72,29 +237,182 @@ async def get_controller(ask_human_callback: Optional[Any] = None) -> CustomCont
             await controller.setup_mcp_client(mcp_dict_config)
         except Exception as e:
             logger.error(f"Failed to setup MCP client for controller: {e}")
-
-    if settings.browser.keep_open:
-        shared_controller_instance = controller
     return controller
 
 
+def build_browser_config() -> BrowserConfig:
+    """BrowserConfig for a server-launched browser, honouring the agent tool's headless/security overrides."""
+    agent_headless_override = settings.agent_tool.headless
+    browser_headless = agent_headless_override if agent_headless_override is not None else settings.browser.headless
+
+    agent_disable_security_override = settings.agent_tool.disable_security
+    browser_disable_security = agent_disable_security_override if agent_disable_security_override is not None else settings.browser.disable_security
+
+    return CustomBrowserConfig(
+        headless=browser_headless,
+        disable_security=browser_disable_security,
+        browser_binary_path=settings.browser.binary_path,
+        user_data_dir=settings.browser.user_data_dir,
+        window_width=settings.browser.window_width,
+        window_height=settings.browser.window_height,
+        fast_start=settings.browser.fast_start,
+        profile_template_dir=settings.browser.profile_template_dir,
+        debugging_port_range=parse_port_range(settings.browser.debugging_port_range),
+    )
+
+
+def build_network_config(use_vision: bool) -> Dict[str, Any]:
+    """CustomBrowserContextConfig fields for request interception, the shared response cache and storage state."""
+    return {
+        "request_policy": resolve_request_policy(settings.browser.request_policy, use_vision),
+        "blocked_domains": parse_domains(settings.browser.blocked_domains),
+        "max_resource_bytes": settings.browser.max_resource_bytes,
+        **settings.get_response_cache_config(),
+        **settings.get_storage_state_config(),
+    }
+
+
+def build_cdp_context_config() -> CustomBrowserContextConfig:
+    """Context config for externally managed browsers; trace/recording might not apply or be harder to manage."""
+    return CustomBrowserContextConfig(
+        trace_path=settings.browser.trace_path,
+        **settings.get_trace_config(),
+        **settings.get_screenshot_config(),
+        save_downloads_path=settings.paths.downloads,
+        save_recording_path=settings.agent_tool.save_recording_path if settings.agent_tool.enable_recording else None,
+        **build_network_config(settings.agent_tool.use_vision),
+    )
+
+
+def build_context_config(force_new_context: bool) -> CustomBrowserContextConfig:
+    return CustomBrowserContextConfig(
+        trace_path=settings.browser.trace_path,
+        **settings.get_trace_config(),
+        **settings.get_screenshot_config(),
+        save_downloads_path=settings.paths.downloads,
+        save_recording_path=settings.agent_tool.save_recording_path if settings.agent_tool.enable_recording else None,
+        force_new_context=force_new_context,
+        **build_network_config(settings.agent_tool.use_vision),
+    )
+
+
+def uses_cdp_fleet() -> bool:
+    """A CDP fleet replaces every other browser mode: nothing is launched locally."""
+    return bool(parse_cdp_urls(settings.browser.cdp_urls))
+
+
+def uses_browser_pool() -> bool:
+    """The pool only applies to server-launched browsers that are not kept open as a single shared instance."""
+    return settings.browser.pool_enabled and not settings.browser.use_own_browser and not settings.browser.keep_open \
+        and not uses_cdp_fleet()
+
+
+async def get_cdp_fleet() -> CdpFleet:
+    """Returns the process-wide CDP fleet, probing its endpoints on first use."""
+    global cdp_fleet
+    async with resource_lock:
+        if cdp_fleet is None:
+            cdp_fleet = CdpFleet(
+                parse_cdp_urls(settings.browser.cdp_urls),
+                max_contexts_per_endpoint=settings.browser.fleet_max_contexts,
+                probe_interval=settings.browser.fleet_probe_interval,
+            )
+        fleet = cdp_fleet
+    await fleet.start() # Idempotent
+    return fleet
+
+
+async def get_browser_pool() -> BrowserPool:
+    """Returns the process-wide browser pool, creating and warming it on first use."""
+    global browser_pool
+    async with resource_lock:
+        if browser_pool is None:
+            browser_pool = BrowserPool(
+                browser_config=build_browser_config(),
+                min_size=settings.browser.pool_min_size,
+                max_size=settings.browser.pool_max_size,
+                idle_timeout=settings.browser.pool_idle_timeout,
+                max_uses=settings.browser.pool_max_uses,
+            )
+        pool = browser_pool
+    await pool.start() # Idempotent; concurrent callers do not launch more than min_size between them
+    return pool
+
+
+async def get_shared_browser_and_context() -> tuple[CustomBrowser, CustomBrowserContext]:
+    """Leases a context from the keep_open context pool, (re)creating the shared browser if needed. Only one caller launches."""
+    global shared_browser_instance, shared_context_pool, shared_browser_ready
+
+    stale: Optional[tuple[CustomBrowser, Optional[ContextPool]]] = None
+    async with resource_lock:
+        if shared_browser_instance and shared_browser_ready and shared_browser_ready.done() \
+                and not shared_browser_instance.is_connected():
+            logger.warning("Shared browser was disconnected. Recreating.")
+            stale = (shared_browser_instance, shared_context_pool)
+            shared_browser_instance = None
+            shared_context_pool = None
+            shared_browser_ready = None
+        elif shared_browser_instance and shared_browser_ready and shared_browser_ready.done() \
+                and shared_context_pool and shared_context_pool.stats()["leased"] == 0:
+            # Between runs is the only safe moment to replace a browser that grew too big or too old
+            if reason := process_supervisor.recycle_reason(shared_browser_instance):
+                logger.info(f"Recycling shared browser over its {reason} limit.")
+                process_supervisor.record_recycle(reason)
+                stale = (shared_browser_instance, shared_context_pool)
+                shared_browser_instance = None
+                shared_context_pool = None
+                shared_browser_ready = None
+
+        if shared_browser_instance is None:
+            logger.info("Creating new shared browser and context pool.")
+            shared_browser_instance = CustomBrowser(config=build_browser_config())
+            shared_context_pool = ContextPool(
+                shared_browser_instance,
+                build_context_config(force_new_context=True),
+                min_size=settings.browser.context_pool_min_size,
+                max_size=settings.browser.context_pool_max_size,
+                max_uses=settings.browser.context_pool_max_uses,
+            )
+            shared_browser_ready = asyncio.create_task(shared_context_pool.start())
+        browser, pool, ready = shared_browser_instance, shared_context_pool, shared_browser_ready
+
+    if stale:
+        stale_browser, stale_pool = stale
+        if stale_pool: await stale_pool.close() # Close old contexts too
+        await stale_browser.close() # Close browser after contexts
+    if pool is None or ready is None: # Both are set together under the lock
+        raise RuntimeError("Shared browser context pool was not created")
+
+    try:
+        await asyncio.shield(ready)
+    except Exception:
+        async with resource_lock:
+            if shared_browser_ready is ready:
+                # Launch failed; forget the instances so the next call retries
+                shared_browser_instance = None
+                shared_context_pool = None
+                shared_browser_ready = None
+        raise
+
+    context = await pool.acquire()
+    logger.info(f"Leased context from shared browser ({pool.stats()}).")
+    return browser, context
+
+
 async def get_browser_and_context() -> tuple[CustomBrowser, CustomBrowserContext]:
     """
     Manages creation/reuse of CustomBrowser and CustomBrowserContext
-    based on settings.browser.keep_open and settings.browser.use_own_browser.
+    based on settings.browser.keep_open, settings.browser.pool_enabled and settings.browser.use_own_browser.
     """
-    global shared_browser_instance, shared_context_instance
-
     current_browser: Optional[CustomBrowser] = None
     current_context: Optional[CustomBrowserContext] = None
 
-    agent_headless_override = settings.agent_tool.headless
-    browser_headless = agent_headless_override if agent_headless_override is not None else settings.browser.headless
-
-    agent_disable_security_override = settings.agent_tool.disable_security
-    browser_disable_security = agent_disable_security_override if agent_disable_security_override is not None else settings.browser.disable_security
+    if uses_cdp_fleet():
+        fleet = await get_cdp_fleet()
+        current_context = await fleet.new_context(build_cdp_context_config())
+        current_browser = cast(CustomBrowser, current_context.browser) # Every fleet endpoint is a CustomBrowser
 
-    if settings.browser.use_own_browser and settings.browser.cdp_url:
+    elif settings.browser.use_own_browser and settings.browser.cdp_url:
         logger.info(f"Connecting to own browser via CDP: {settings.browser.cdp_url}")
         browser_cfg = BrowserConfig(
             cdp_url=settings.browser.cdp_url,
@@ -103,69 +421,23 @@ async def get_browser_and_context() -> tuple[CustomBrowser, CustomBrowserContext
             # Headless, binary_path etc. are controlled by the user-launched browser
         )
         current_browser = CustomBrowser(config=browser_cfg)
-        # For CDP, context config is minimal, trace/recording might not apply or be harder to manage
-        context_cfg = CustomBrowserContextConfig(
-            trace_path=settings.browser.trace_path,
-            save_downloads_path=settings.paths.downloads,
-            save_recording_path=settings.agent_tool.save_recording_path if settings.agent_tool.enable_recording else None,
-        )
-        current_context = await current_browser.new_context(config=context_cfg)
+        current_context = await current_browser.new_context(config=build_cdp_context_config())
 
     elif settings.browser.keep_open:
-        if shared_browser_instance and shared_context_instance:
-            logger.info("Reusing shared browser and context.")
-            # Ensure browser is still connected
-            if not shared_browser_instance.is_connected():
-                logger.warning("Shared browser was disconnected. Recreating.")
-                if shared_context_instance: await shared_context_instance.close() # Close old context too
-                await shared_browser_instance.close() # Close browser after context
-                shared_browser_instance = None
-                shared_context_instance = None
-            else:
-                current_browser = shared_browser_instance
-                # For shared browser, we might want a new context or reuse.
-                # For simplicity, let's reuse the context if keep_open is true.
-                # If new context per call is needed, this logic would change.
-                current_context = shared_context_instance
-
-        if not current_browser or not current_context : # If shared instances were not valid or not yet created
-            logger.info("Creating new shared browser and context.")
-            browser_cfg = BrowserConfig(
-                headless=browser_headless,
-                disable_security=browser_disable_security,
-                browser_binary_path=settings.browser.binary_path,
-                user_data_dir=settings.browser.user_data_dir,
-                window_width=settings.browser.window_width,
-                window_height=settings.browser.window_height,
-            )
-            shared_browser_instance = CustomBrowser(config=browser_cfg)
-            context_cfg = CustomBrowserContextConfig(
-                trace_path=settings.browser.trace_path,
-                save_downloads_path=settings.paths.downloads,
-                save_recording_path=settings.agent_tool.save_recording_path if settings.agent_tool.enable_recording else None,
-                force_new_context=False # Important for shared context
-            )
-            shared_context_instance = await shared_browser_instance.new_context(config=context_cfg)
-            current_browser = shared_browser_instance
-            current_context = shared_context_instance
+        current_browser, current_context = await get_shared_browser_and_context()
+    elif uses_browser_pool():
+        pool = await get_browser_pool()
+        current_browser = await pool.acquire()
+        logger.info(f"Leased browser from pool ({pool.stats()}); creating a fresh context for this call.")
+        try:
+            current_context = await current_browser.new_context(config=build_context_config(force_new_context=True))
+        except Exception:
+            await pool.release(current_browser, discard=True)
+            raise
     else: # Create new resources per call (not using own browser, not keeping open)
         logger.info("Creating new browser and context for this call.")
-        browser_cfg = BrowserConfig(
-            headless=browser_headless,
-            disable_security=browser_disable_security,
-            browser_binary_path=settings.browser.binary_path,
-            user_data_dir=settings.browser.user_data_dir,
-            window_width=settings.browser.window_width,
-            window_height=settings.browser.window_height,
-        )
-        current_browser = CustomBrowser(config=browser_cfg)
-        context_cfg = CustomBrowserContextConfig(
-            trace_path=settings.browser.trace_path,
-            save_downloads_path=settings.paths.downloads,
-            save_recording_path=settings.agent_tool.save_recording_path if settings.agent_tool.enable_recording else None,
-            force_new_context=True
-        )
-        current_context = await current_browser.new_context(config=context_cfg)
+        current_browser = CustomBrowser(config=build_browser_config())
+        current_context = await current_browser.new_context(config=build_context_config(force_new_context=True))
 
     if not current_browser or not current_context:
         raise RuntimeError("Failed to initialize browser or context")
@@ -173,24 +445,192 @@ async def get_browser_and_context() -> tuple[CustomBrowser, CustomBrowserContext
     return current_browser, current_context
 
 
+async def release_browser_and_context(browser: Optional[CustomBrowser], context: Optional[CustomBrowserContext]):
+    """Undoes get_browser_and_context(): closes per-call resources and returns pooled browsers to the pool."""
+    if uses_cdp_fleet():
+        if context and cdp_fleet is not None:
+            await cdp_fleet.close_context(context) # The fleet keeps its CDP connections
+        return
+    if settings.browser.use_own_browser:
+        return # User-owned browsers outlive the call
+    if settings.browser.keep_open:
+        # The shared browser outlives the call; its context goes back to the pool to be reset
+        if context:
+            pool = shared_context_pool
+            if pool is not None and pool.owns(context):
+                await pool.release(context)
+            else:
+                await context.close() # Pool was recreated while this call ran
+        return
+
+    if context:
+        try:
+            await context.close()
+        except Exception as e:
+            logger.error(f"Error closing browser context: {e}")
+
+    if not browser:
+        return
+    if uses_browser_pool() and browser_pool is not None:
+        await browser_pool.release(browser)
+    else:
+        await browser.close()
+
+
+def build_deep_research_agent(browser_fleet: Optional[CdpFleet] = None) -> DeepResearchAgent:
+    """Creates a DeepResearchAgent from the main LLM, browser and MCP settings; sub-agents use browser_fleet if given."""
+    main_llm_config = settings.get_llm_config() # Deep research uses main LLM config
+    research_llm = internal_llm_provider.get_llm_model(**main_llm_config)
+
+    # Prepare browser_config dict for DeepResearchAgent's sub-agents
+    dr_browser_cfg = {
+        "headless": settings.browser.headless, # Use general browser headless for sub-tasks
+        "disable_security": settings.browser.disable_security,
+        "browser_binary_path": settings.browser.binary_path,
+        "user_data_dir": settings.browser.user_data_dir,
+        "window_width": settings.browser.window_width,
+        "window_height": settings.browser.window_height,
+        "trace_path": settings.browser.trace_path, # For sub-agent traces
+        **settings.get_trace_config(),
+        "save_downloads_path": settings.paths.downloads, # For sub-agent downloads
+        "fast_start": settings.browser.fast_start, # Sub-agents launch a browser per query, so they gain the most
+        "profile_template_dir": settings.browser.profile_template_dir,
+        "debugging_port_range": parse_port_range(settings.browser.debugging_port_range),
+        "request_policy": settings.browser.request_policy, # "auto" resolves against the sub-agent's use_vision
+        "blocked_domains": parse_domains(settings.browser.blocked_domains),
+        "max_resource_bytes": settings.browser.max_resource_bytes,
+        **settings.get_response_cache_config(), # Sub-agents often revisit the same sites
+        **settings.get_storage_state_config(), # Loaded only; sub-agents never save sessions
+        **settings.get_screenshot_config(),
+        "shared_browser": settings.research_tool.shared_browser,
+        "max_tab_restarts": settings.research_tool.max_tab_restarts,
+        "pipelined_steps": settings.agent_tool.pipelined_steps,
+        "dom_diff": settings.agent_tool.dom_diff,
+        "dom_diff_max_change": settings.agent_tool.dom_diff_max_change,
+        "history_token_budget": settings.agent_tool.history_token_budget,
+        "history_keep_steps": settings.agent_tool.history_keep_steps,
+        "compaction_llm_config": settings.get_compaction_llm_config(),
+    }
+    if settings.browser.use_own_browser and settings.browser.cdp_url:
+        # If main browser is CDP, sub-agents should also use it
+        dr_browser_cfg["cdp_url"] = settings.browser.cdp_url
+        dr_browser_cfg["wss_url"] = settings.browser.wss_url
+
+    mcp_server_config_for_agent = None
+    if settings.server.mcp_config:
+        mcp_server_config_for_agent = settings.server.mcp_config
+        if isinstance(settings.server.mcp_config, str):
+             mcp_server_config_for_agent = json.loads(settings.server.mcp_config)
+
+    return DeepResearchAgent(
+        llm=research_llm,
+        browser_config=dr_browser_cfg,
+        mcp_server_config=mcp_server_config_for_agent,
+        browser_fleet=browser_fleet,
+    )
+
+
+def get_research_save_dir(task_id: str) -> Optional[str]:
+    """Returns the save directory for a research task, or None in memory-only mode."""
+    if settings.research_tool.save_dir:
+        # If save_dir is provided, construct the full save directory path for this specific task
+        save_dir_for_this_task = str(Path(settings.research_tool.save_dir) / task_id)
+        logger.info(f"Deep research save directory for this task: {save_dir_for_this_task}")
+        return save_dir_for_this_task
+    logger.info("No save_dir configured. Deep research will operate in memory-only mode.")
+    return None
+
+
+def format_research_report(task_id: str, result_dict: Dict[str, Any], save_dir_for_this_task: Optional[str]) -> str:
+    """Turns DeepResearchAgent.run()'s result into the report text returned to the client."""
+    final_report = result_dict.get("final_report") or (result_dict.get("final_state") or {}).get("final_report")
+    # Handle the result based on if files were saved or not
+    if save_dir_for_this_task and result_dict.get("report_file_path") and Path(result_dict["report_file_path"]).exists():
+        with open(result_dict["report_file_path"], "r", encoding="utf-8") as f:
+            markdown_content = f.read()
+        logger.info(f"Deep research task {task_id} completed. Report at {result_dict['report_file_path']}")
+        return f"Deep research report generated successfully at {result_dict['report_file_path']}\n\n{markdown_content}"
+    if result_dict.get("status") == "completed" and final_report:
+        report_content = f"Deep research completed. Report content:\n\n{final_report}"
+        if result_dict.get("report_file_path"):
+             report_content += f"\n(Expected report file at: {result_dict['report_file_path']})"
+        logger.info(f"Deep research task {task_id} completed. Report content retrieved directly.")
+        return report_content
+    report_content = f"Deep research task {task_id} result: {result_dict}. Report file not found or content not available."
+    logger.warning(report_content)
+    return report_content
+
+
+@asynccontextmanager
+async def server_lifespan(server: FastMCP) -> AsyncIterator[None]:
+    """Warms the browser pool at startup so the first call does not pay the cold start, and closes it on shutdown."""
+    global metrics_exporter
+    if settings.server.metrics_file or settings.server.metrics_port:
+        metrics_exporter = asyncio.create_task(export_prometheus(
+            settings.server.metrics_file, settings.server.metrics_port, settings.server.metrics_interval,
+        ))
+    await process_supervisor.start()
+    if uses_browser_pool():
+        try:
+            await get_browser_pool()
+        except Exception as e:
+            logger.error(f"Failed to warm browser pool: {e}")
+    if uses_cdp_fleet():
+        await get_cdp_fleet() # Probe the endpoints before the first call
+    try:
+        yield
+    finally:
+        await agent_registry.stop_all() # Bounded by MCP_AGENT_TOOL_STOP_TIMEOUT, so browsers are released before pools close
+        if browser_pool is not None:
+            await browser_pool.close()
+        if shared_context_pool is not None:
+            await shared_context_pool.close()
+        await research_jobs.close()
+        if cdp_fleet is not None:
+            await cdp_fleet.close()
+        await close_mcp_session_managers()
+        await process_supervisor.close()
+        if metrics_exporter is not None:
+            metrics_exporter.cancel()
+            await asyncio.gather(metrics_exporter, return_exceptions=True)
+
+
 def serve() -> FastMCP:
-    server = FastMCP("mcp_server_browser_use")
+    server = FastMCP("mcp_server_browser_use", lifespan=server_lifespan)
 
     @server.tool()
     async def run_browser_agent(ctx: Context, task: str) -> str:
         logger.info(f"Received run_browser_agent task: {task[:100]}...")
         agent_task_id = str(uuid.uuid4())
         final_result = "Error: Agent execution failed."
+        started_at = time.monotonic()
 
         browser_instance: Optional[CustomBrowser] = None
         context_instance: Optional[CustomBrowserContext] = None
         controller_instance: Optional[CustomController] = None
+        admission = None
 
         try:
-            async with resource_lock: # Protect shared resource access/creation
-                browser_instance, context_instance = await get_browser_and_context()
-                # For server, ask_human_callback is likely not interactive, can be None or a placeholder
-                controller_instance = await get_controller(ask_human_callback=None)
+            admission = await admission_scheduler.acquire("run_browser_agent", settings.server.priority_browser_agent)
+            # Browser/context and controller are independent slots, so acquire them concurrently.
+            # For server, ask_human_callback is likely not interactive, can be None or a placeholder
+            slot_wait_start = time.monotonic()
+            browser_result, controller_result = await asyncio.gather(
+                get_browser_and_context(),
+                get_controller(ask_human_callback=None),
+                return_exceptions=True,
+            )
+            # Keep whatever was acquired so the finally block can release it even if the other slot failed
+            if not isinstance(browser_result, BaseException):
+                browser_instance, context_instance = browser_result
+            if not isinstance(controller_result, BaseException):
+                controller_instance = controller_result
+            for slot_result in (browser_result, controller_result):
+                if isinstance(slot_result, BaseException):
+                    raise slot_result
+            slot_wait = time.monotonic() - slot_wait_start
+            slot_wait_stats.record(slot_wait)
+            logger.info(f"Acquired browser and controller slots in {slot_wait:.2f}s")
 
             if not browser_instance or not context_instance or not controller_instance:
                  raise RuntimeError("Failed to acquire browser resources or controller.")
@@ -202,6 +642,8 @@ def serve() -> FastMCP:
             if settings.llm.planner_provider and settings.llm.planner_model_name:
                 planner_llm_config = settings.get_llm_config(is_planner=True)
                 planner_llm = internal_llm_provider.get_llm_model(**planner_llm_config)
+            compaction_llm_config = settings.get_compaction_llm_config()
+            compaction_llm = internal_llm_provider.get_llm_model(**compaction_llm_config) if compaction_llm_config else None
 
             agent_history_json_file = None
             task_history_base_path = settings.agent_tool.history_path
@@ -221,31 +663,82 @@ def serve() -> FastMCP:
                 planner_llm=planner_llm,
                 max_actions_per_step=settings.agent_tool.max_actions_per_step,
                 use_vision=settings.agent_tool.use_vision,
+                pipelined=settings.agent_tool.pipelined_steps,
+                dom_diff=settings.agent_tool.dom_diff,
+                dom_diff_max_change=settings.agent_tool.dom_diff_max_change,
+                history_token_budget=settings.agent_tool.history_token_budget,
+                history_keep_steps=settings.agent_tool.history_keep_steps,
+                compaction_llm=compaction_llm,
+            )
+            trajectory_cache = None
+            if settings.agent_tool.trajectory_cache_enabled:
+                trajectory_cache = get_trajectory_cache(settings.agent_tool.trajectory_cache_dir, settings.agent_tool.trajectory_cache_max_entries)
+                agent_instance.trajectory = trajectory_cache.lookup(task, agent_instance.AgentOutput)
+            agent_registry.register(agent_task_id, "browser_agent", task, agent_instance)
+            logger.info(f"Browser agent {agent_task_id} started (see list_agents).")
+
+            on_step_start, on_step_end = ProgressNotifier(ctx, "run_browser_agent").browser_agent_hooks(settings.agent_tool.max_steps)
+            history: AgentHistoryList = await agent_instance.run(
+                max_steps=settings.agent_tool.max_steps,
+                on_step_start=on_step_start,
+                on_step_end=on_step_end,
             )
-
-            history: AgentHistoryList = await agent_instance.run(max_steps=settings.agent_tool.max_steps)
 
             if agent_history_json_file:
                 agent_instance.save_history(agent_history_json_file)
 
-            final_result = history.final_result() or "Agent finished without a final result."
+            if trajectory_cache:
+                if agent_instance.trajectory:
+                    trajectory_cache.record_replay(agent_instance.trajectory)
+                    logger.info(f"Replayed {agent_instance.trajectory.replayed}/{len(agent_instance.trajectory.steps)} cached steps"
+                                f"{f' before diverging ({agent_instance.trajectory.divergence})' if agent_instance.trajectory.divergence else ''}.")
+                if not agent_instance.state.stopped:
+                    trajectory_cache.record(task, history)
+                logger.info(f"Trajectory cache: {trajectory_cache.stats.snapshot()}")
+
+            if settings.browser.storage_state and settings.browser.storage_state_autosave and history.is_successful():
+                try:
+                    await context_instance.save_storage_state()
+                except Exception as e:
+                    logger.warning(f"Could not save storage state '{settings.browser.storage_state}': {e}")
+
+            if agent_instance.state.stopped:
+                final_result = history.final_result() or "Agent was stopped before it finished."
+            else:
+                final_result = history.final_result() or "Agent finished without a final result."
             logger.info(f"Agent task completed. Result: {final_result[:100]}...")
+            if context_instance.request_filter.active:
+                logger.info(f"Request policy '{context_instance.request_filter.policy}': {context_instance.request_filter.stats.snapshot()}")
+            if settings.agent_tool.use_vision and context_instance.screenshots.active:
+                logger.info(f"Screenshots ({context_instance.screenshots.image_format}): {context_instance.screenshots.stats.snapshot()}")
+            logger.info(f"Step timings ({'pipelined' if agent_instance.pipelined else 'serial'}): {agent_instance.step_timings.summary()}")
+            if agent_instance.diff_manager:
+                logger.info(f"DOM diff: {agent_instance.diff_manager.stats.snapshot()}")
+            if agent_instance.compactor:
+                logger.info(f"History compaction: {agent_instance.compactor.stats.snapshot()}")
 
         except Exception as e:
             logger.error(f"Error in run_browser_agent: {e}\n{traceback.format_exc()}")
             final_result = f"Error: {e}"
         finally:
-            if not settings.browser.keep_open and not settings.browser.use_own_browser:
-                logger.info("Closing browser resources for this call.")
-                if context_instance:
-                    await context_instance.close()
-                if browser_instance:
-                    await browser_instance.close()
+            if uses_cdp_fleet():
+                await release_browser_and_context(browser_instance, context_instance)
+                if controller_instance and controller_instance is not shared_controller_instance:
+                    await controller_instance.close_mcp_client()
+            elif not settings.browser.keep_open and not settings.browser.use_own_browser:
+                logger.info("Releasing browser resources for this call.")
+                await release_browser_and_context(browser_instance, context_instance)
                 if controller_instance: # Close controller only if not shared
                     await controller_instance.close_mcp_client()
+            elif settings.browser.keep_open and not settings.browser.use_own_browser:
+                await release_browser_and_context(browser_instance, context_instance)
             elif settings.browser.use_own_browser: # Own browser, only close controller if not shared
                  if controller_instance and not (settings.browser.keep_open and controller_instance == shared_controller_instance):
                     await controller_instance.close_mcp_client()
+            agent_registry.unregister(agent_task_id) # After the release, so stop_agent returns with the browser reclaimed
+            if admission:
+                admission_scheduler.release(admission)
+            record_tool_call("run_browser_agent", started_at, final_result)
         return final_result
 
     @server.tool()
@@ -257,80 +750,153 @@ def serve() -> FastMCP:
         logger.info(f"Received run_deep_research task: {research_task[:100]}...")
         task_id = str(uuid.uuid4()) # This task_id is used for the sub-directory name
         report_content = "Error: Deep research failed."
+        started_at = time.monotonic()
 
         try:
-            main_llm_config = settings.get_llm_config() # Deep research uses main LLM config
-            research_llm = internal_llm_provider.get_llm_model(**main_llm_config)
-
-            # Prepare browser_config dict for DeepResearchAgent's sub-agents
-            dr_browser_cfg = {
-                "headless": settings.browser.headless, # Use general browser headless for sub-tasks
-                "disable_security": settings.browser.disable_security,
-                "browser_binary_path": settings.browser.binary_path,
-                "user_data_dir": settings.browser.user_data_dir,
-                "window_width": settings.browser.window_width,
-                "window_height": settings.browser.window_height,
-                "trace_path": settings.browser.trace_path, # For sub-agent traces
-                "save_downloads_path": settings.paths.downloads, # For sub-agent downloads
-            }
-            if settings.browser.use_own_browser and settings.browser.cdp_url:
-                # If main browser is CDP, sub-agents should also use it
-                dr_browser_cfg["cdp_url"] = settings.browser.cdp_url
-                dr_browser_cfg["wss_url"] = settings.browser.wss_url
-
-            mcp_server_config_for_agent = None
-            if settings.server.mcp_config:
-                mcp_server_config_for_agent = settings.server.mcp_config
-                if isinstance(settings.server.mcp_config, str):
-                     mcp_server_config_for_agent = json.loads(settings.server.mcp_config)
-
-            agent_instance = DeepResearchAgent(
-                llm=research_llm,
-                browser_config=dr_browser_cfg,
-                mcp_server_config=mcp_server_config_for_agent,
-            )
-
             current_max_parallel_browsers = max_parallel_browsers_override if max_parallel_browsers_override is not None else settings.research_tool.max_parallel_browsers
+            async with admission_scheduler.admit("run_deep_research", settings.server.priority_deep_research, slots=current_max_parallel_browsers):
+                agent_instance = build_deep_research_agent(await get_cdp_fleet() if uses_cdp_fleet() else None)
+                save_dir_for_this_task = get_research_save_dir(task_id)
+                logger.info(f"Using max_parallel_browsers: {current_max_parallel_browsers}")
+
+                result_dict = await agent_instance.run(
+                    topic=research_task,
+                    save_dir=save_dir_for_this_task, # Can be None now
+                    task_id=task_id, # Pass the generated task_id
+                    max_parallel_browsers=current_max_parallel_browsers,
+                    progress_callback=ProgressNotifier(ctx, "run_deep_research").research_event,
+                )
+            report_content = format_research_report(task_id, result_dict, save_dir_for_this_task)
 
-            # Check if save_dir is provided, otherwise use in-memory approach
-            save_dir_for_this_task = None
-            if settings.research_tool.save_dir:
-                # If save_dir is provided, construct the full save directory path for this specific task
-                save_dir_for_this_task = str(Path(settings.research_tool.save_dir) / task_id)
-                logger.info(f"Deep research save directory for this task: {save_dir_for_this_task}")
-            else:
-                logger.info("No save_dir configured. Deep research will operate in memory-only mode.")
+        except Exception as e:
+            logger.error(f"Error in run_deep_research: {e}\n{traceback.format_exc()}")
+            report_content = f"Error: {e}"
 
-            logger.info(f"Using max_parallel_browsers: {current_max_parallel_browsers}")
+        record_tool_call("run_deep_research", started_at, report_content)
+        return report_content
 
-            result_dict = await agent_instance.run(
-                topic=research_task,
-                save_dir=save_dir_for_this_task, # Can be None now
-                task_id=task_id, # Pass the generated task_id
-                max_parallel_browsers=current_max_parallel_browsers
-            )
+    @server.tool()
+    async def start_deep_research(
+        ctx: Context,
+        research_task: str,
+        max_parallel_browsers_override: Optional[int] = None,
+    ) -> str:
+        """Starts deep research in the background and returns a job id to poll with get_research_status/get_research_result."""
+        logger.info(f"Received start_deep_research task: {research_task[:100]}...")
+        current_max_parallel_browsers = (
+            max_parallel_browsers_override if max_parallel_browsers_override is not None else settings.research_tool.max_parallel_browsers
+        )
 
-            # Handle the result based on if files were saved or not
-            if save_dir_for_this_task and result_dict.get("report_file_path") and Path(result_dict["report_file_path"]).exists():
-                with open(result_dict["report_file_path"], "r", encoding="utf-8") as f:
-                    markdown_content = f.read()
-                report_content = f"Deep research report generated successfully at {result_dict['report_file_path']}\n\n{markdown_content}"
-                logger.info(f"Deep research task {task_id} completed. Report at {result_dict['report_file_path']}")
-            elif result_dict.get("status") == "completed" and result_dict.get("final_report"):
-                report_content = f"Deep research completed. Report content:\n\n{result_dict['final_report']}"
-                if result_dict.get("report_file_path"):
-                     report_content += f"\n(Expected report file at: {result_dict['report_file_path']})"
-                logger.info(f"Deep research task {task_id} completed. Report content retrieved directly.")
-            else:
-                report_content = f"Deep research task {task_id} result: {result_dict}. Report file not found or content not available."
-                logger.warning(report_content)
+        async def research_job(job: Job) -> str:
+            async def record_progress(payload: Dict[str, Any]):
+                job.progress = payload # The starting request is long gone, so progress is exposed via get_research_status
+
+            async with admission_scheduler.admit("start_deep_research", settings.server.priority_deep_research, slots=current_max_parallel_browsers):
+                agent_instance = build_deep_research_agent(await get_cdp_fleet() if uses_cdp_fleet() else None)
+                job.stop_callback = agent_instance.stop # The job id doubles as the agent's task_id
+                save_dir_for_this_task = get_research_save_dir(job.job_id)
+                result_dict = await agent_instance.run(
+                    topic=research_task,
+                    save_dir=save_dir_for_this_task,
+                    task_id=job.job_id,
+                    max_parallel_browsers=current_max_parallel_browsers,
+                    progress_callback=record_progress,
+                )
+            if result_dict.get("status") == "error":
+                raise RuntimeError(result_dict.get("message") or "Deep research failed.")
+            return format_research_report(job.job_id, result_dict, save_dir_for_this_task)
 
+        try:
+            admission_scheduler.check_capacity() # Reject now rather than failing the job later
+        except SchedulerFullError as e:
+            return f"Error: {e}"
+        job = research_jobs.submit("deep_research", research_task, research_job)
+        return json.dumps({"job_id": job.job_id, "status": job.status})
 
-        except Exception as e:
-            logger.error(f"Error in run_deep_research: {e}\n{traceback.format_exc()}")
-            report_content = f"Error: {e}"
+    @server.tool()
+    async def get_research_status(ctx: Context, job_id: str) -> str:
+        """Returns the status of a deep research job started with start_deep_research."""
+        job = research_jobs.get(job_id)
+        if job is None:
+            return json.dumps({"job_id": job_id, "status": "not_found"})
+        return json.dumps(job.to_dict())
 
-        return report_content
+    @server.tool()
+    async def get_research_result(ctx: Context, job_id: str) -> str:
+        """Returns the report of a finished deep research job, or its current status if it is still running."""
+        job = research_jobs.get(job_id)
+        if job is None:
+            return f"Error: No research job with id {job_id} (it may have expired)."
+        if not job.finished:
+            return f"Research job {job_id} is still {job.status}. Poll get_research_status and try again later."
+        if job.status == JOB_FAILED:
+            return f"Error: {job.error}"
+        if job.result is None:
+            return f"Research job {job_id} was {job.status} before producing a report."
+        return job.result
+
+    @server.tool()
+    async def cancel_research(ctx: Context, job_id: str) -> str:
+        """Cancels a queued or running deep research job. Running jobs stop after their current browser tasks."""
+        job = await research_jobs.cancel(job_id)
+        if job is None:
+            return json.dumps({"job_id": job_id, "status": "not_found"})
+        return json.dumps(job.to_dict())
+
+    @server.tool()
+    async def get_queue_status(ctx: Context) -> str:
+        """
+        Returns the admission queue: running and queued agent runs, slot usage, Chrome memory,
+        per-browser process stats, background research jobs and agent control counts.
+        """
+        return json.dumps({
+            "scheduler": admission_scheduler.stats(),
+            "browsers": process_supervisor.stats(),
+            "research_jobs": research_jobs.stats(),
+            "agents": agent_registry.stats(),
+        })
+
+    @server.tool()
+    async def list_agents(ctx: Context) -> str:
+        """Lists running browser agents and deep research sub-agents with their task ids, status (running, paused, stopping) and step count."""
+        return json.dumps([entry.to_dict() for entry in agent_registry.list()])
+
+    @server.tool()
+    async def pause_agent(ctx: Context, task_id: str) -> str:
+        """Pauses a running agent before its next LLM call or browser action. Its browser stays open until resume_agent or stop_agent."""
+        entry = agent_registry.pause(task_id)
+        if entry is None:
+            return json.dumps({"task_id": task_id, "status": "not_found"})
+        return json.dumps(entry.to_dict())
+
+    @server.tool()
+    async def resume_agent(ctx: Context, task_id: str) -> str:
+        """Resumes an agent paused with pause_agent."""
+        entry = agent_registry.resume(task_id)
+        if entry is None:
+            return json.dumps({"task_id": task_id, "status": "not_found"})
+        return json.dumps(entry.to_dict())
+
+    @server.tool()
+    async def stop_agent(ctx: Context, task_id: str) -> str:
+        """Stops an agent: its in-flight LLM request and browser operation are cancelled and its browser released. Returns once the run has ended."""
+        entry = await agent_registry.stop(task_id)
+        if entry is None:
+            return json.dumps({"task_id": task_id, "status": "not_found"})
+        return json.dumps({**entry.to_dict(), "status": "stopped" if entry.finished.is_set() else "stopping"})
+
+    @server.tool()
+    async def get_metrics(ctx: Context, format: str = "json") -> str:
+        """
+        Returns server metrics: browser launch and context creation times, agent step phase latencies,
+        LLM latency and tokens per provider, pool occupancy, queue waits and deep research node timings.
+        format is 'json' (with p50/p90/p99) or 'prometheus'.
+        """
+        if format == "prometheus":
+            return metrics.render_prometheus()
+        if format != "json":
+            return f"Error: Unknown format '{format}'. Use 'json' or 'prometheus'."
+        return json.dumps(metrics.snapshot())
 
     return server
 
@@ -350,7 +916,12 @@ def main():
 
     logger.info(f"Loaded settings with LLM provider: {settings.llm.provider}, Model: {settings.llm.model_name}")
     logger.info(f"Browser keep_open: {settings.browser.keep_open}, Use own browser: {settings.browser.use_own_browser}")
-    if settings.browser.use_own_browser:
+    if uses_browser_pool():
+        logger.info(f"Browser pool enabled: min {settings.browser.pool_min_size}, max {settings.browser.pool_max_size}, "
+                    f"idle timeout {settings.browser.pool_idle_timeout}s, max uses {settings.browser.pool_max_uses}")
+    if uses_cdp_fleet():
+        logger.info(f"CDP fleet: {', '.join(parse_cdp_urls(settings.browser.cdp_urls))}")
+    elif settings.browser.use_own_browser:
         logger.info(f"Connecting to own browser via CDP: {settings.browser.cdp_url}")
     server_instance.run()
 
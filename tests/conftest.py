@@ -0,0 +1,4 @@
+import os
+
+# Importing the package imports browser_use, which would otherwise send telemetry
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "false")
@@ -0,0 +1,345 @@
+import asyncio
+from types import SimpleNamespace
+
+import psutil
+import pytest
+
+from mcp_server_browser_use._internal.browser import browser_pool
+from mcp_server_browser_use._internal.browser.browser_pool import BrowserPool, ContextPool, PooledBrowser
+from mcp_server_browser_use._internal.browser.custom_context import CustomBrowserContextConfig
+from mcp_server_browser_use._internal.browser.process_supervisor import ProcessSupervisor
+
+
+class FakeBrowser:
+    debugging_port = None
+
+    def __init__(self):
+        self.connected = True
+        self.closed = False
+
+    def is_connected(self) -> bool:
+        return self.connected and not self.closed
+
+    async def _close_without_httpxclients(self):
+        self.closed = True
+
+
+@pytest.fixture
+def supervisor(monkeypatch):
+    supervisor = ProcessSupervisor(interval=0)
+    monkeypatch.setattr(browser_pool, "get_process_supervisor", lambda: supervisor)
+    return supervisor
+
+
+@pytest.fixture
+def launched(monkeypatch, supervisor):
+    """Every browser the pools launch, in order."""
+    browsers = []
+
+    async def launch(self):
+        browsers.append(FakeBrowser())
+        return PooledBrowser(browser=browsers[-1])
+
+    monkeypatch.setattr(BrowserPool, "_launch", launch)
+    return browsers
+
+
+def test_acquire_waits_for_a_release_at_max_size(launched):
+    async def scenario():
+        pool = BrowserPool(browser_config=None, min_size=0, max_size=1, idle_timeout=0)
+        first = await pool.acquire()
+        waiter = asyncio.create_task(pool.acquire())
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        await pool.release(first)
+        assert await waiter is first
+        assert len(launched) == 1
+        assert pool.stats()["leased"] == 1
+        await pool.close()
+
+    asyncio.run(scenario())
+
+
+def test_close_wakes_waiters_and_closes_leased_browsers(launched):
+    async def scenario():
+        pool = BrowserPool(browser_config=None, min_size=0, max_size=1, idle_timeout=0)
+        await pool.acquire()
+        waiter = asyncio.create_task(pool.acquire())
+        await asyncio.sleep(0)
+        await pool.close()
+        with pytest.raises(RuntimeError, match="closed"):
+            await waiter
+        assert all(browser.closed for browser in launched)
+        with pytest.raises(RuntimeError, match="closed"):
+            await pool.acquire()
+
+    asyncio.run(scenario())
+
+
+def test_browsers_are_recycled_after_max_uses_and_the_pool_refilled(launched):
+    async def scenario():
+        pool = BrowserPool(browser_config=None, min_size=1, max_size=2, idle_timeout=0, max_uses=2)
+        await pool.start()
+        browser = await pool.acquire()
+        await pool.release(browser)
+        assert await pool.acquire() is browser
+        await pool.release(browser)
+        assert browser.closed
+        await asyncio.gather(*pool._refills)
+        assert pool.stats()["idle"] == 1
+        assert await pool.acquire() is launched[-1] is not browser
+        await pool.close()
+
+    asyncio.run(scenario())
+
+
+def test_disconnected_or_discarded_browsers_are_not_reused(launched):
+    async def scenario():
+        pool = BrowserPool(browser_config=None, min_size=0, max_size=2, idle_timeout=0)
+        first = await pool.acquire()
+        await pool.release(first, discard=True)
+        second = await pool.acquire()
+        await pool.release(second)
+        second.connected = False
+        third = await pool.acquire()
+        assert first.closed and second.closed and third is launched[2]
+        await pool.close()
+
+    asyncio.run(scenario())
+
+
+def test_supervisor_recycles_browsers_over_the_rss_limit(launched, supervisor):
+    supervisor.max_rss_mb = 100
+
+    def over_limit(browser):
+        supervisor.track(browser, psutil.Process(), "test")
+        supervisor._tracked[id(browser)].rss_bytes = 200 * 2**20
+
+    async def scenario():
+        pool = BrowserPool(browser_config=None, min_size=0, max_size=2, idle_timeout=0)
+        leased = await pool.acquire()
+        over_limit(leased)
+        await pool.release(leased)
+        assert leased.closed
+
+        idle = await pool.acquire()
+        await pool.release(idle)
+        over_limit(idle) # Crossed the limit while idle
+        assert await pool.acquire() is launched[-1] is not idle
+        assert idle.closed
+        assert supervisor.recycled == {"rss": 2}
+        await pool.close()
+
+    asyncio.run(scenario())
+
+
+def test_idle_browsers_above_min_size_are_reaped(launched):
+    async def scenario():
+        pool = BrowserPool(browser_config=None, min_size=1, max_size=2, idle_timeout=0.01)
+        await pool.start()
+        first, second = await pool.acquire(), await pool.acquire()
+        await pool.release(first)
+        await pool.release(second)
+        await asyncio.sleep(1.2) # The reaper checks at most once a second
+        assert pool.stats()["idle"] == 1
+        assert [browser.closed for browser in launched].count(True) == 1
+        await pool.close()
+
+    asyncio.run(scenario())
+
+
+class FakePage:
+    def __init__(self):
+        self.handlers = []
+        self.closed = False
+        self.healthy = True
+
+    def on(self, event, handler):
+        self.handlers.append(handler)
+
+    def navigate(self, url):
+        for handler in self.handlers:
+            handler(SimpleNamespace(url=url))
+
+    async def evaluate(self, expression):
+        if not self.healthy:
+            raise RuntimeError("Target crashed")
+        return 1
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeCdpSession:
+    def __init__(self, calls):
+        self.calls = calls
+
+    async def send(self, method, params):
+        self.calls.append((method, params))
+
+    async def detach(self):
+        pass
+
+
+class FakePlaywrightContext:
+    def __init__(self):
+        self.pages = [FakePage()]
+        self.page_handlers = []
+        self.cookies = []
+        self.cdp_calls = []
+        self.fail_reset = False
+
+    def on(self, event, handler):
+        self.page_handlers.append(handler)
+
+    async def new_page(self):
+        page = FakePage()
+        self.pages.append(page)
+        for handler in self.page_handlers:
+            handler(page)
+        return page
+
+    async def clear_cookies(self):
+        if self.fail_reset:
+            raise RuntimeError("Target closed")
+        self.cookies = []
+
+    async def clear_permissions(self):
+        pass
+
+    async def add_cookies(self, cookies):
+        self.cookies.extend(cookies)
+
+    async def new_cdp_session(self, page):
+        return FakeCdpSession(self.cdp_calls)
+
+
+class FakeContext:
+    def __init__(self, snapshot=None):
+        self.session = None
+        self.snapshot = snapshot
+        self.closed = False
+        self.active_tab = None
+        self.state = SimpleNamespace(target_id="old")
+        self.request_filter = SimpleNamespace(reset_stats=lambda: None)
+        self.screenshots = SimpleNamespace(reset_stats=lambda: None)
+
+    async def get_session(self):
+        if self.session is None:
+            self.session = SimpleNamespace(context=FakePlaywrightContext(), cached_state="state", cached_state_clickable_elements_hashes=None)
+        return self.session
+
+    def load_storage_state(self):
+        return self.snapshot
+
+    async def restart_trace(self):
+        pass
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeContextBrowser(FakeBrowser):
+    def __init__(self, snapshot=None):
+        super().__init__()
+        self.snapshot = snapshot
+        self.contexts = []
+
+    async def get_playwright_browser(self):
+        pass
+
+    async def new_context(self, config):
+        assert config.force_new_context
+        self.contexts.append(FakeContext(self.snapshot))
+        return self.contexts[-1]
+
+
+def context_pool(browser, **kwargs) -> ContextPool:
+    return ContextPool(browser, CustomBrowserContextConfig(), **kwargs)
+
+
+def test_context_acquire_waits_at_max_size_and_close_wakes_waiters():
+    async def scenario():
+        browser = FakeContextBrowser()
+        pool = context_pool(browser, min_size=0, max_size=1)
+        context = await pool.acquire()
+        waiter = asyncio.create_task(pool.acquire())
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        await pool.release(context)
+        assert await waiter is context
+        second_waiter = asyncio.create_task(pool.acquire())
+        await asyncio.sleep(0)
+        await pool.close()
+        with pytest.raises(RuntimeError, match="closed"):
+            await second_waiter
+        assert context.closed
+
+    asyncio.run(scenario())
+
+
+def test_release_resets_the_context_for_the_next_lease():
+    async def scenario():
+        cookie = {"name": "sid", "value": "1", "domain": "example.com", "path": "/"}
+        browser = FakeContextBrowser(snapshot={"cookies": [cookie]})
+        pool = context_pool(browser, min_size=1, max_size=1)
+        await pool.start()
+        context = await pool.acquire()
+        pw_context = context.session.context
+        old_page = pw_context.pages[0]
+        old_page.navigate("https://shop.example.com/cart")
+        (await pw_context.new_page()).navigate("https://login.example.org/")
+        pw_context.cookies.append({"name": "cart", "value": "3"})
+
+        await pool.release(context)
+        assert pw_context.cookies == [cookie]
+        assert sorted(params["origin"] for method, params in pw_context.cdp_calls if method == "Storage.clearDataForOrigin") == [
+            "https://login.example.org", "https://shop.example.com"]
+        assert old_page.closed and [page.closed for page in pw_context.pages].count(False) == 1
+        assert context.active_tab is pw_context.pages[-1]
+        assert context.state.target_id is None and context.session.cached_state is None
+        assert pool.stats()["idle"] == 1 and not context.closed
+        assert await pool.acquire() is context
+
+    asyncio.run(scenario())
+
+
+def test_context_is_evicted_when_its_reset_fails():
+    async def scenario():
+        browser = FakeContextBrowser()
+        pool = context_pool(browser, min_size=0, max_size=1)
+        context = await pool.acquire()
+        context.session.context.fail_reset = True
+        await pool.release(context)
+        assert context.closed
+        assert pool.stats()["idle"] == 0
+        assert await pool.acquire() is browser.contexts[-1] is not context
+
+    asyncio.run(scenario())
+
+
+def test_context_is_evicted_after_max_uses():
+    async def scenario():
+        browser = FakeContextBrowser()
+        pool = context_pool(browser, min_size=0, max_size=1, max_uses=1)
+        context = await pool.acquire()
+        await pool.release(context)
+        assert context.closed and pool.stats()["idle"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_unhealthy_idle_context_is_replaced_on_acquire():
+    async def scenario():
+        browser = FakeContextBrowser()
+        pool = context_pool(browser, min_size=0, max_size=1)
+        context = await pool.acquire()
+        await pool.release(context)
+        for page in context.session.context.pages:
+            page.healthy = False
+        replacement = await pool.acquire()
+        assert replacement is browser.contexts[-1] is not context
+        assert context.closed
+        assert pool.stats()["leased"] == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,170 @@
+import asyncio
+
+import pytest
+
+from mcp_server_browser_use._internal.browser import cdp_fleet
+from mcp_server_browser_use._internal.browser.cdp_fleet import CdpFleet, parse_cdp_urls
+from mcp_server_browser_use._internal.browser.custom_context import CustomBrowserContextConfig
+
+URLS = ["http://10.0.0.1:9222", "http://10.0.0.2:9222"]
+
+
+class FakeContext:
+    def __init__(self, browser):
+        self.browser = browser
+        self.closed = False
+
+    async def get_session(self):
+        if not self.browser.connected:
+            raise ConnectionError("Browser has been closed")
+
+    async def close(self):
+        self.closed = True
+
+
+class Endpoints:
+    """Remote browsers the fleet connects to, keyed by CDP URL."""
+
+    def __init__(self):
+        self.down = set()
+        self.browsers = []
+
+    def __call__(self, config):
+        endpoints = self
+
+        class FakeBrowser:
+            def __init__(self):
+                self.config = config
+                self.connected = True
+                self.contexts = []
+                endpoints.browsers.append(self)
+
+            async def get_playwright_browser(self):
+                if config.cdp_url in endpoints.down:
+                    raise ConnectionError("connect ECONNREFUSED")
+
+            def is_connected(self):
+                return self.connected
+
+            async def new_context(self, config):
+                assert config.force_new_context
+                self.contexts.append(FakeContext(self))
+                return self.contexts[-1]
+
+            async def close(self):
+                self.connected = False
+
+        return FakeBrowser()
+
+    def live(self, url):
+        return [browser for browser in self.browsers if browser.config.cdp_url == url and browser.connected]
+
+
+@pytest.fixture
+def endpoints(monkeypatch):
+    endpoints = Endpoints()
+
+    async def ready(url, timeout):
+        return True
+
+    monkeypatch.setattr(cdp_fleet, "CustomBrowser", endpoints)
+    monkeypatch.setattr(cdp_fleet, "cdp_endpoint_ready", ready)
+    return endpoints
+
+
+def url_of(context) -> str:
+    return context.browser.config.cdp_url
+
+
+def test_parse_cdp_urls():
+    assert parse_cdp_urls(" http://a:9222/, ws://b:9222 ,http://a:9222,,") == ["http://a:9222", "ws://b:9222"]
+    assert parse_cdp_urls(None) == []
+    with pytest.raises(ValueError):
+        CdpFleet([])
+
+
+def test_contexts_go_to_the_least_loaded_endpoint(endpoints):
+    async def scenario():
+        fleet = CdpFleet(URLS, probe_interval=0)
+        await fleet.start()
+        config = CustomBrowserContextConfig()
+        contexts = [await fleet.new_context(config) for _ in range(3)]
+        assert [url_of(context) for context in contexts] == [URLS[0], URLS[1], URLS[0]]
+        await fleet.close_context(contexts[0])
+        assert contexts[0].closed
+        assert url_of(await fleet.new_context(config)) == URLS[1] # Fewest open, then fewest placed
+        assert [endpoint["open_contexts"] for endpoint in fleet.stats()["endpoints"]] == [1, 2]
+        await fleet.close()
+        assert not any(browser.connected for browser in endpoints.browsers)
+
+    asyncio.run(scenario())
+
+
+def test_new_context_waits_while_every_endpoint_is_full(endpoints):
+    async def scenario():
+        fleet = CdpFleet(URLS[:1], max_contexts_per_endpoint=1, probe_interval=0)
+        await fleet.start()
+        config = CustomBrowserContextConfig()
+        first = await fleet.new_context(config)
+        waiter = asyncio.create_task(fleet.new_context(config))
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        await fleet.close_context(first)
+        assert fleet.endpoint_of(await waiter).url == URLS[0]
+        await fleet.close()
+
+    asyncio.run(scenario())
+
+
+def test_unreachable_endpoints_are_skipped_and_the_last_one_raises(endpoints):
+    async def scenario():
+        endpoints.down.add(URLS[0])
+        fleet = CdpFleet(URLS, probe_interval=0)
+        await fleet.start()
+        stats = fleet.stats()
+        assert stats["healthy"] == 1 and stats["endpoints"][0]["last_error"] == "connect ECONNREFUSED"
+        assert url_of(await fleet.new_context(CustomBrowserContextConfig())) == URLS[1]
+        await fleet.close()
+
+        endpoints.down.add(URLS[1])
+        fleet = CdpFleet(URLS, probe_interval=0)
+        await fleet.start()
+        with pytest.raises(RuntimeError, match="No healthy CDP endpoint"):
+            await fleet.new_context(CustomBrowserContextConfig())
+
+    asyncio.run(scenario())
+
+
+def test_dead_endpoint_is_evicted_and_the_context_placed_elsewhere(endpoints):
+    async def scenario():
+        fleet = CdpFleet(URLS, probe_interval=0)
+        await fleet.start()
+        config = CustomBrowserContextConfig()
+        on_first = await fleet.new_context(config)
+        endpoints.live(URLS[1])[0].connected = False # Dropped without the fleet noticing
+        await fleet.close_context(on_first)
+        context = await fleet.new_context(config)
+        assert url_of(context) == URLS[0]
+        first, second = fleet.stats()["endpoints"]
+        assert not second["healthy"] and second["evictions"] == 1
+        assert second["last_error"].startswith("context creation failed")
+        assert first["open_contexts"] == 1 and second["open_contexts"] == 0
+        await fleet.close()
+
+    asyncio.run(scenario())
+
+
+def test_prober_evicts_lost_connections_and_reconnects_recovered_endpoints(endpoints):
+    async def scenario():
+        endpoints.down.add(URLS[1])
+        fleet = CdpFleet(URLS, probe_interval=0.01)
+        await fleet.start()
+        endpoints.down.clear()
+        endpoints.live(URLS[0])[0].connected = False
+        await asyncio.sleep(0.1)
+        assert fleet.stats()["healthy"] == 2
+        assert fleet.stats()["endpoints"][0]["evictions"] == 1
+        assert endpoints.live(URLS[0]) and endpoints.live(URLS[1])
+        await fleet.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,20 @@
+from mcp_server_browser_use._internal.agent.browser_use.dom_diff import element_blocks
+
+
+def test_element_blocks_group_page_text_under_the_preceding_element():
+    listing = "Welcome\n[1]<a>Home</a>\nSome text\nMore text\n\t[2]<button>Buy</button>"
+    assert element_blocks(listing) == {
+        None: "Welcome",
+        1: "[1]<a>Home</a>\nSome text\nMore text",
+        2: "\t[2]<button>Buy</button>",
+    }
+
+
+def test_element_blocks_ignore_new_element_markers():
+    before = element_blocks("[1]<a>Home</a>\n\t[2]<button>Buy</button>")
+    after = element_blocks("[1]<a>Home</a>\n\t*[2]*<button>Buy</button>")
+    assert before == after
+
+
+def test_element_blocks_leave_bracketed_page_text_alone():
+    assert element_blocks("[1]<a>Home</a>\n[2] is not an element") == {1: "[1]<a>Home</a>\n[2] is not an element"}
@@ -0,0 +1,16 @@
+from mcp_server_browser_use._internal.agent.browser_use.history_compaction import missing_fact_lines
+
+
+def test_missing_fact_lines_keeps_lines_whose_values_the_summary_dropped():
+    summary = "Progress: on the product page.\nFacts: the mug costs 12.99, see https://shop.example.com/mug"
+    fact_texts = ["Price: 12.99\nPage: https://shop.example.com/mug\nOrder 5512 shipped on 2024-05-01\nNo values here"]
+    assert missing_fact_lines(summary, fact_texts) == ["Order 5512 shipped on 2024-05-01"]
+
+
+def test_missing_fact_lines_checks_every_value_on_a_line():
+    assert missing_fact_lines("Contact bob@example.com", ["bob@example.com, phone 5550100"]) == ["bob@example.com, phone 5550100"]
+
+
+def test_missing_fact_lines_deduplicates_lines_carried_over_from_earlier_blocks():
+    fact_texts = ["Order 5512 shipped", "Facts:\n- Order 5512 shipped\n- Total 40"]
+    assert missing_fact_lines("Total 40", fact_texts) == ["Order 5512 shipped"]
@@ -0,0 +1,139 @@
+import asyncio
+
+from mcp_server_browser_use._internal.utils.job_registry import (
+    JOB_CANCELLED,
+    JOB_COMPLETED,
+    JOB_FAILED,
+    JOB_QUEUED,
+    JOB_RUNNING,
+    JobRegistry,
+)
+
+
+def test_job_goes_from_queued_to_running_to_completed():
+    async def scenario():
+        registry = JobRegistry()
+        release = asyncio.Event()
+
+        async def work(job):
+            await release.wait()
+            return "report"
+
+        job = registry.submit("research", "topic", work)
+        assert job.status == JOB_QUEUED
+        await asyncio.sleep(0)
+        assert job.status == JOB_RUNNING and job.started_at is not None
+        release.set()
+        await job.task
+        assert job.status == JOB_COMPLETED
+        assert job.result == "report" and job.finished_at is not None
+        assert registry.stats()["jobs"] == {JOB_COMPLETED: 1}
+
+    asyncio.run(scenario())
+
+
+def test_failed_job_keeps_its_error():
+    async def scenario():
+        registry = JobRegistry()
+
+        async def work(job):
+            raise ValueError("no results")
+
+        job = registry.submit("research", "topic", work)
+        await job.task
+        assert job.status == JOB_FAILED and job.error == "no results"
+
+    asyncio.run(scenario())
+
+
+def test_running_job_is_stopped_through_its_stop_callback():
+    async def scenario():
+        registry = JobRegistry()
+        stop = asyncio.Event()
+
+        async def work(job):
+            job.stop_callback = stop_work
+            await stop.wait()
+            return "partial report"
+
+        async def stop_work():
+            stop.set()
+
+        job = registry.submit("research", "topic", work)
+        await asyncio.sleep(0)
+        assert await registry.cancel(job.job_id) is job
+        await job.task
+        assert job.status == JOB_CANCELLED
+        assert job.result == "partial report" # Stopped cooperatively, so what it had is kept
+        assert job.stop_callback is None
+
+    asyncio.run(scenario())
+
+
+def test_queued_job_is_cancelled_without_running():
+    async def scenario():
+        registry = JobRegistry(max_concurrent=1)
+        release = asyncio.Event()
+        started = []
+
+        async def work(job):
+            started.append(job.job_id)
+            await release.wait()
+
+        running = registry.submit("research", "first", work)
+        queued = registry.submit("research", "second", work)
+        await asyncio.sleep(0)
+        await registry.cancel(queued.job_id)
+        release.set()
+        await asyncio.gather(running.task, queued.task)
+        assert queued.status == JOB_CANCELLED and started == [running.job_id]
+        assert running.status == JOB_COMPLETED
+
+    asyncio.run(scenario())
+
+
+def test_at_most_max_concurrent_jobs_run_at_once():
+    async def scenario():
+        registry = JobRegistry(max_concurrent=2)
+        release = asyncio.Event()
+        running, peak = 0, 0
+
+        async def work(job):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await release.wait()
+            running -= 1
+
+        jobs = [registry.submit("research", str(i), work) for i in range(5)]
+        await asyncio.sleep(0)
+        assert [job.status for job in jobs].count(JOB_RUNNING) == 2
+        release.set()
+        await asyncio.gather(*(job.task for job in jobs))
+        assert peak == 2
+        assert all(job.status == JOB_COMPLETED for job in jobs)
+
+    asyncio.run(scenario())
+
+
+def test_prune_drops_finished_jobs_after_result_ttl():
+    async def scenario():
+        registry = JobRegistry(result_ttl=60)
+        release = asyncio.Event()
+
+        async def work(job):
+            await release.wait()
+
+        old = registry.submit("research", "old", work, job_id="old")
+        unfinished = registry.submit("research", "unfinished", work, job_id="unfinished")
+        old.task.cancel() # Before it ever ran
+        await asyncio.gather(old.task, return_exceptions=True)
+        assert old.status == JOB_CANCELLED
+        old.finished_at -= 61
+        unfinished.created_at -= 3600
+        assert registry.get("old") is None
+        assert registry.get("unfinished") is unfinished
+        release.set()
+        await unfinished.task
+
+    asyncio.run(scenario())
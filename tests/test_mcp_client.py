@@ -0,0 +1,131 @@
+import asyncio
+
+import anyio
+import pytest
+from langchain_core.tools import StructuredTool
+
+from mcp_server_browser_use._internal.utils import mcp_client
+from mcp_server_browser_use._internal.utils.mcp_client import McpSessionManager, close_mcp_session_managers, get_mcp_session_manager
+
+CONFIG = {"mcpServers": {"files": {"command": "files-server"}, "search": {"command": "search-server"}}}
+
+
+class FakeServers:
+    """Stands in for MultiServerMCPClient; every client it creates is one session to one server."""
+
+    def __init__(self):
+        self.clients = []
+        self.connect_errors = [] # Raised by the next connects, in order
+        self.call_errors = [] # Raised by the next tool calls, in order
+
+    def __call__(self, connections):
+        servers = self
+
+        class FakeClient:
+            def __init__(self):
+                self.name = next(iter(connections))
+                self.exited = False
+                self.server_name_to_tools = {}
+
+            async def __aenter__(self):
+                if servers.connect_errors:
+                    raise servers.connect_errors.pop(0)
+                session = len(servers.clients)
+
+                async def echo(text: str):
+                    if servers.call_errors:
+                        raise servers.call_errors.pop(0)
+                    return f"{self.name}#{session}: {text}", None
+
+                tool = StructuredTool(
+                    name=f"{self.name}_echo", description="Echo", coroutine=echo, response_format="content_and_artifact",
+                    args_schema={"type": "object", "properties": {"text": {"type": "string"}}, "required": ["text"]},
+                )
+                self.server_name_to_tools = {self.name: [tool]}
+                servers.clients.append(self)
+                return self
+
+            async def __aexit__(self, *exc_info):
+                self.exited = True
+
+        return FakeClient()
+
+
+@pytest.fixture
+def servers(monkeypatch):
+    servers = FakeServers()
+    monkeypatch.setattr(mcp_client, "MultiServerMCPClient", servers)
+    return servers
+
+
+def test_start_connects_every_server_and_exposes_proxies(servers):
+    async def scenario():
+        manager = McpSessionManager(CONFIG)
+        await manager.start()
+        assert sorted(tool.name for tool in manager.get_tools()) == ["files_echo", "search_echo"]
+        assert await manager.call_tool("files", "files_echo", {"text": "hi"}) == ("files#0: hi", None)
+        assert all(stats["connected"] and stats["connects"] == 1 for stats in manager.stats().values())
+        await manager.close()
+        assert all(client.exited for client in servers.clients)
+
+    asyncio.run(scenario())
+
+
+def test_dead_transport_is_reconnected_once_and_the_call_retried(servers):
+    async def scenario():
+        manager = McpSessionManager({"files": {"command": "files-server"}})
+        await manager.start()
+        proxy = manager.get_tools()[0]
+        servers.call_errors.append(anyio.ClosedResourceError())
+        result = await proxy.coroutine(text="again")
+        assert result == ("files#1: again", None) # Answered by the new session
+        assert manager.reconnects == 1 and servers.clients[0].exited
+        assert manager.get_tools()[0] is proxy # Proxies survive reconnects
+
+        servers.call_errors.extend([BrokenPipeError(), EOFError()])
+        with pytest.raises(EOFError):
+            await manager.call_tool("files", "files_echo", {"text": "x"})
+        await manager.close()
+
+    asyncio.run(scenario())
+
+
+def test_tool_errors_are_not_retried(servers):
+    async def scenario():
+        manager = McpSessionManager({"files": {"command": "files-server"}})
+        await manager.start()
+        servers.call_errors.append(ValueError("no such file"))
+        with pytest.raises(ValueError, match="no such file"):
+            await manager.call_tool("files", "files_echo", {"text": "x"})
+        assert manager.reconnects == 0 and len(servers.clients) == 1
+        await manager.close()
+
+    asyncio.run(scenario())
+
+
+def test_server_that_failed_to_start_is_retried_on_first_use(servers):
+    async def scenario():
+        servers.connect_errors.append(OSError("command not found"))
+        manager = McpSessionManager({"files": {"command": "files-server"}})
+        await manager.start()
+        assert manager.get_tools() == []
+        assert manager.stats()["files"]["last_error"] == "command not found"
+        assert await manager.call_tool("files", "files_echo", {"text": "x"}) == ("files#0: x", None)
+        assert [tool.name for tool in manager.get_tools()] == ["files_echo"]
+        await manager.close()
+
+    asyncio.run(scenario())
+
+
+def test_session_managers_are_shared_per_config_until_closed(servers):
+    async def scenario():
+        manager = await get_mcp_session_manager(CONFIG)
+        assert await get_mcp_session_manager(dict(CONFIG)) is manager
+        assert await get_mcp_session_manager({}) is None
+        await close_mcp_session_managers()
+        assert all(client.exited for client in servers.clients)
+        assert not any(stats["connected"] for stats in manager.stats().values())
+        assert await get_mcp_session_manager(CONFIG) is not manager
+        await close_mcp_session_managers()
+
+    asyncio.run(scenario())
@@ -0,0 +1,113 @@
+import asyncio
+import uuid
+
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from mcp_server_browser_use._internal.utils import metrics as metrics_module
+from mcp_server_browser_use._internal.utils.metrics import LLMMetricsCallback, MetricsRegistry, labels
+
+
+def test_histogram_buckets_are_cumulative_and_inclusive():
+    registry = MetricsRegistry(namespace="test")
+    histogram = registry.histogram("step_seconds", "Step latency.", buckets=(1.0, 0.1, 0.5))
+    for value in (0.05, 0.1, 0.3, 2.0):
+        histogram.observe(value, phase="llm")
+    samples = {(name, dict(key).get("le")): value for name, key, value in histogram.samples()}
+    assert samples == {
+        ("test_step_seconds_bucket", "0.1"): 2, # A value on a bound counts in that bucket
+        ("test_step_seconds_bucket", "0.5"): 3,
+        ("test_step_seconds_bucket", "1.0"): 3,
+        ("test_step_seconds_bucket", "+Inf"): 4,
+        ("test_step_seconds_sum", None): 2.45,
+        ("test_step_seconds_count", None): 4,
+    }
+
+
+def test_histogram_snapshot_reports_percentiles():
+    registry = MetricsRegistry(namespace="test")
+    histogram = registry.histogram("tool_seconds", "Tool latency.")
+    for value in range(1, 101):
+        histogram.observe(value / 100)
+    (series,) = histogram.snapshot()
+    assert series["count"] == 100 and series["avg"] == 0.505
+    assert (series["p50"], series["p90"], series["p99"], series["max"]) == (0.51, 0.9, 0.99, 1.0)
+
+
+def test_render_prometheus_text_format():
+    registry = MetricsRegistry(namespace="test")
+    calls = registry.counter("calls_total", "Calls by tool.")
+    calls.inc(tool="search")
+    calls.inc(2, tool='say "hi"\n')
+    registry.gauge("pool_idle", "Idle browsers.", callback=lambda: {labels(pool="shared"): 3})
+    registry.histogram("wait_seconds", "Queue wait.", buckets=(1.0,)).observe(0.5)
+    assert registry.render_prometheus() == (
+        "# HELP test_calls_total Calls by tool.\n"
+        "# TYPE test_calls_total counter\n"
+        'test_calls_total{tool="search"} 1.0\n'
+        'test_calls_total{tool="say \\"hi\\"\\n"} 2.0\n'
+        "# HELP test_pool_idle Idle browsers.\n"
+        "# TYPE test_pool_idle gauge\n"
+        'test_pool_idle{pool="shared"} 3\n'
+        "# HELP test_wait_seconds Queue wait.\n"
+        "# TYPE test_wait_seconds histogram\n"
+        'test_wait_seconds_bucket{le="1.0"} 1\n'
+        'test_wait_seconds_bucket{le="+Inf"} 1\n'
+        "test_wait_seconds_sum 0.5\n"
+        "test_wait_seconds_count 1\n"
+    )
+
+
+def test_registry_returns_existing_metrics_and_reset_keeps_callback_gauges():
+    registry = MetricsRegistry(namespace="test")
+    counter = registry.counter("calls_total", "Calls.")
+    assert registry.counter("calls_total", "Ignored.") is counter
+    counter.inc()
+    registry.gauge("live", "Live.", callback=lambda: {labels(): 1})
+    registry.reset()
+    snapshot = registry.snapshot()
+    assert snapshot["test_calls_total"] == {"type": "counter", "help": "Calls.", "series": []}
+    assert snapshot["test_live"]["series"] == [{"labels": {}, "value": 1}]
+
+
+def test_failing_gauge_callback_keeps_set_values():
+    registry = MetricsRegistry(namespace="test")
+    gauge = registry.gauge("broken", "Broken.", callback=lambda: 1 / 0)
+    gauge.set(5, pool="a")
+    assert gauge.snapshot() == [{"labels": {"pool": "a"}, "value": 5}]
+
+
+def test_llm_callback_records_latency_and_tokens(monkeypatch):
+    registry = MetricsRegistry(namespace="test")
+    for name in ("LLM_REQUEST_SECONDS", "LLM_TOKENS", "LLM_ERRORS"):
+        metric = getattr(metrics_module, name)
+        monkeypatch.setattr(metrics_module, name, getattr(registry, metric.kind)(name.lower(), metric.help))
+    callback = LLMMetricsCallback("openai", "gpt-4o")
+    message = AIMessage("done", usage_metadata={"input_tokens": 120, "output_tokens": 30, "total_tokens": 150})
+    run_id, failed_run_id = uuid.uuid4(), uuid.uuid4()
+    callback.on_chat_model_start({}, [], run_id=run_id)
+    callback.on_llm_end(LLMResult(generations=[[ChatGeneration(message=message)]]), run_id=run_id)
+    callback.on_llm_start({}, [], run_id=failed_run_id)
+    callback.on_llm_error(TimeoutError(), run_id=failed_run_id)
+
+    snapshot = registry.snapshot()
+    tokens = {series["labels"]["direction"]: series["value"] for series in snapshot["test_llm_tokens"]["series"]}
+    assert tokens == {"input": 120, "output": 30}
+    assert snapshot["test_llm_request_seconds"]["series"][0]["count"] == 2
+    assert snapshot["test_llm_errors"]["series"] == [{"labels": {"model": "gpt-4o", "provider": "openai"}, "value": 1.0}]
+
+
+def test_export_prometheus_writes_the_file(tmp_path, monkeypatch):
+    registry = MetricsRegistry(namespace="test")
+    registry.counter("calls_total", "Calls.").inc()
+    monkeypatch.setattr(metrics_module, "metrics", registry)
+    path = tmp_path / "out" / "metrics.prom"
+
+    async def scenario():
+        task = asyncio.create_task(metrics_module.export_prometheus(file_path=str(path), interval=60))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(scenario())
+    assert path.read_text() == registry.render_prometheus()
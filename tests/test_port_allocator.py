@@ -0,0 +1,67 @@
+import asyncio
+import socket
+
+import pytest
+
+from mcp_server_browser_use._internal.browser import port_allocator
+from mcp_server_browser_use._internal.browser.port_allocator import PortAllocator, get_port_allocator, parse_port_range, port_is_free
+
+
+@pytest.fixture
+def taken(monkeypatch):
+    """Ports other programs hold; every other port passes the bind test."""
+    ports = set()
+    monkeypatch.setattr(port_allocator, "port_is_free", lambda port, host="127.0.0.1": port not in ports)
+    return ports
+
+
+def acquire(allocator: PortAllocator, n: int = 1):
+    async def scenario():
+        return [await allocator.acquire() for _ in range(n)]
+
+    return asyncio.run(scenario())
+
+
+def test_leases_are_distinct_until_released(taken):
+    allocator = PortAllocator(9300, 9302)
+    assert acquire(allocator, 4) == [9300, 9301, 9302, None]
+    allocator.release(9301)
+    allocator.release(None)
+    assert acquire(allocator) == [9301]
+    assert allocator.stats() == {"range": "9300-9302", "leased": [9300, 9301, 9302]}
+
+
+def test_cursor_rotates_past_a_just_released_port(taken):
+    allocator = PortAllocator(9300, 9303)
+    first, second = acquire(allocator, 2)
+    allocator.release(first)
+    assert acquire(allocator, 3) == [9302, 9303, 9300] # Back to the start only after the end of the range
+
+
+def test_ports_bound_by_other_programs_are_skipped(taken):
+    taken.update({9300, 9302})
+    allocator = PortAllocator(9300, 9303)
+    assert acquire(allocator, 3) == [9301, 9303, None]
+
+
+def test_port_is_free_detects_a_bound_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        s.listen()
+        port = s.getsockname()[1]
+        assert not port_is_free(port)
+        assert acquire(PortAllocator(port, port)) == [None]
+
+
+def test_invalid_ranges_are_rejected():
+    with pytest.raises(ValueError):
+        PortAllocator(9400, 9300)
+    with pytest.raises(ValueError):
+        PortAllocator(0, 10)
+
+
+def test_parse_port_range_and_shared_allocators():
+    assert parse_port_range("9500-9510") == (9500, 9510)
+    assert parse_port_range("9500") == (9500, 9500)
+    assert parse_port_range(None) == (9222, 9321)
+    assert get_port_allocator([9500, 9510]) is get_port_allocator((9500, 9510)) is not get_port_allocator()
@@ -0,0 +1,81 @@
+import subprocess
+import sys
+
+import psutil
+import pytest
+
+from mcp_server_browser_use._internal.browser import process_supervisor
+from mcp_server_browser_use._internal.browser.process_supervisor import ProcessSupervisor
+
+
+@pytest.fixture
+def child():
+    """A real child process standing in for a browser's root process."""
+    proc = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+    yield proc
+    proc.kill()
+    proc.wait()
+
+
+def test_recycle_reason_checks_rss_before_age(child):
+    supervisor = ProcessSupervisor(interval=0, max_rss_mb=100, max_age=60)
+    browser = object()
+    assert supervisor.recycle_reason(browser) is None # Untracked
+    supervisor.track(browser, psutil.Process(child.pid), "test")
+    tracked = supervisor.browsers()[0]
+    assert supervisor.recycle_reason(browser) is None
+    tracked.started_at -= 61
+    assert supervisor.recycle_reason(browser) == "age"
+    tracked.rss_bytes = 101 * 2**20
+    assert supervisor.recycle_reason(browser) == "rss"
+    supervisor.configure(interval=0, max_rss_mb=None, max_age=None, reap_orphans=True)
+    assert supervisor.recycle_reason(browser) is None
+
+
+def test_record_recycle_counts_by_reason():
+    supervisor = ProcessSupervisor(interval=0)
+    supervisor.record_recycle("rss")
+    supervisor.record_recycle("rss")
+    supervisor.record_recycle("age")
+    assert supervisor.stats()["recycled"] == {"rss": 2, "age": 1}
+
+
+def test_sample_measures_the_tree(child):
+    supervisor = ProcessSupervisor(interval=0)
+    supervisor.track("browser", psutil.Process(child.pid), "test")
+    supervisor.sample()
+    (stats,) = supervisor.stats()["browsers"]
+    assert stats["pid"] == child.pid and stats["processes"] == 1
+    assert stats["rss_mb"] > 0 and stats["peak_rss_mb"] >= stats["rss_mb"]
+
+
+def test_browser_that_exited_unclosed_is_dropped(child):
+    supervisor = ProcessSupervisor(interval=0)
+    supervisor.track("browser", psutil.Process(child.pid), "test")
+    child.kill()
+    child.wait()
+    supervisor.sample()
+    assert supervisor.browsers() == []
+
+
+def test_processes_of_untracked_browsers_are_killed_after_the_grace_period(child, monkeypatch):
+    supervisor = ProcessSupervisor(interval=0)
+    supervisor.track("browser", psutil.Process(child.pid), "test")
+    supervisor.untrack("browser")
+    assert supervisor.reap() == 0 # Still within the grace period
+    assert supervisor.stats()["pending_reap"] == 1
+
+    monkeypatch.setattr(process_supervisor, "ORPHAN_GRACE_SECONDS", 0)
+    assert supervisor.reap() == 1
+    assert child.wait(timeout=5) == -9
+    assert supervisor.stats()["pending_reap"] == 0 and supervisor.orphans_reaped == 1
+
+
+def test_reap_orphans_off_only_forgets_the_processes(child, monkeypatch):
+    monkeypatch.setattr(process_supervisor, "ORPHAN_GRACE_SECONDS", 0)
+    supervisor = ProcessSupervisor(interval=0, reap_orphans=False)
+    supervisor.track("browser", psutil.Process(child.pid), "test")
+    supervisor.untrack("browser")
+    assert supervisor.reap() == 0
+    assert child.poll() is None
+    assert supervisor.stats()["pending_reap"] == 0
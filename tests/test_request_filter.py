@@ -0,0 +1,128 @@
+import asyncio
+
+import pytest
+
+from mcp_server_browser_use._internal.browser.request_filter import (
+    AD_AND_ANALYTICS_DOMAINS,
+    ESTIMATED_RESOURCE_BYTES,
+    RequestFilter,
+    resolve_request_policy,
+)
+
+
+class FakeRequest:
+    def __init__(self, url="https://example.com/a", resource_type="image", navigation=False):
+        self.url = url
+        self.resource_type = resource_type
+        self.navigation = navigation
+
+    def is_navigation_request(self) -> bool:
+        return self.navigation
+
+
+class FakeResponse:
+    def __init__(self, body: bytes, headers=None):
+        self._body = body
+        self.headers = headers or {}
+
+    async def body(self) -> bytes:
+        return self._body
+
+
+class FakeRoute:
+    def __init__(self, response=None, error=None):
+        self.response = response
+        self.error = error
+        self.outcome = None
+
+    async def abort(self, reason):
+        self.outcome = ("abort", reason)
+
+    async def fallback(self):
+        self.outcome = ("fallback",)
+
+    async def fetch(self):
+        if self.error:
+            raise self.error
+        return self.response
+
+    async def fulfill(self, response=None, **kwargs):
+        self.outcome = ("fulfill", response)
+
+
+def handle(request_filter: RequestFilter, request: FakeRequest, route=None) -> FakeRoute:
+    route = route or FakeRoute()
+    asyncio.run(request_filter.handle(route, request))
+    return route
+
+
+def test_presets():
+    full, vision_lite, text_only = RequestFilter("full"), RequestFilter("vision-lite"), RequestFilter("text-only")
+    assert not full.active
+    assert vision_lite.resource_types == {"media", "font", "texttrack"}
+    assert vision_lite.max_resource_bytes == 2 * 1024 * 1024
+    assert {"image", "media", "font"} <= text_only.resource_types and "script" not in text_only.resource_types
+    assert text_only.max_resource_bytes == 1024 * 1024
+    assert set(AD_AND_ANALYTICS_DOMAINS) <= vision_lite.domains == text_only.domains
+    assert not full.domains
+
+
+def test_preset_fields_can_be_overridden():
+    request_filter = RequestFilter("text-only", blocked_resource_types=["media"], blocked_domains=[".Example.COM"], max_resource_bytes=0)
+    assert request_filter.resource_types == {"media"}
+    assert "example.com" in request_filter.domains
+    assert request_filter.max_resource_bytes == 0
+
+
+def test_resolve_request_policy():
+    assert resolve_request_policy("auto", use_vision=True) == "vision-lite"
+    assert resolve_request_policy(" Auto ", use_vision=False) == "text-only"
+    assert resolve_request_policy(None, use_vision=False) == "full"
+    with pytest.raises(ValueError, match="Unknown request policy"):
+        resolve_request_policy("images-off", use_vision=False)
+
+
+def test_blocked_resource_type_is_aborted_and_counted():
+    request_filter = RequestFilter("text-only")
+    assert handle(request_filter, FakeRequest(resource_type="image")).outcome == ("abort", "blockedbyclient")
+    assert handle(request_filter, FakeRequest(resource_type="script")).outcome == ("fallback",)
+    stats = request_filter.stats.snapshot()
+    assert stats["blocked"] == {"resource_type": 1} and stats["allowed"] == 1
+    assert stats["estimated_saved_bytes"] == ESTIMATED_RESOURCE_BYTES["image"]
+
+
+def test_domain_blocklist_matches_subdomains_only():
+    request_filter = RequestFilter("full", blocked_domains=["tracker.io"])
+    assert handle(request_filter, FakeRequest("https://cdn.eu.tracker.io/t.js", "script")).outcome == ("abort", "blockedbyclient")
+    assert handle(request_filter, FakeRequest("https://TRACKER.io/t.js", "script")).outcome == ("abort", "blockedbyclient")
+    assert handle(request_filter, FakeRequest("https://nottracker.io/t.js", "script")).outcome == ("fallback",)
+    assert request_filter.stats.blocked == {"domain": 2}
+
+
+def test_navigation_requests_are_never_blocked():
+    request_filter = RequestFilter("text-only", blocked_domains=["example.com"])
+    route = handle(request_filter, FakeRequest("https://example.com/", "document", navigation=True))
+    assert route.outcome == ("fallback",)
+    assert request_filter.stats.allowed == 1
+
+
+def test_size_limit_uses_content_length_or_the_body():
+    request_filter = RequestFilter("full", max_resource_bytes=100)
+    small = FakeResponse(b"x" * 500, {"content-length": "50"}) # Trusted over the body
+    large = FakeResponse(b"x" * 500)
+    assert handle(request_filter, FakeRequest(), FakeRoute(small)).outcome == ("fulfill", small)
+    assert handle(request_filter, FakeRequest(), FakeRoute(large)).outcome == ("abort", "blockedbyclient")
+    assert request_filter.stats.blocked == {"size": 1} and request_filter.stats.blocked_bytes == 500
+
+
+def test_size_limit_skips_resources_the_page_needs_to_run():
+    request_filter = RequestFilter("full", max_resource_bytes=100)
+    route = FakeRoute(error=AssertionError("must not be fetched"))
+    assert handle(request_filter, FakeRequest(resource_type="script"), route).outcome == ("fallback",)
+
+
+def test_failed_fetch_aborts_the_request():
+    request_filter = RequestFilter("full", max_resource_bytes=100)
+    route = handle(request_filter, FakeRequest(), FakeRoute(error=ConnectionResetError("reset")))
+    assert route.outcome == ("abort", "failed")
+    assert request_filter.stats.failed == 1 and request_filter.stats.allowed == 0
@@ -0,0 +1,50 @@
+import time
+from email.utils import formatdate
+
+import pytest
+
+from mcp_server_browser_use._internal.browser.response_cache import ResponseCache, cache_control_ttl
+
+
+@pytest.mark.parametrize(
+    "headers, ttl",
+    [
+        ({"cache-control": "public, max-age=600"}, 600),
+        ({"cache-control": "max-age=600, s-maxage=60"}, 60),
+        ({"cache-control": 'max-age="30"'}, 30),
+        ({"cache-control": "no-cache, max-age=600"}, 0),
+        ({"cache-control": "private, max-age=600"}, 0),
+        ({"expires": "not a date"}, 0),
+        ({}, None),
+    ],
+)
+def test_cache_control_ttl(headers, ttl):
+    assert cache_control_ttl(headers) == ttl
+
+
+def test_cache_control_ttl_from_expires():
+    assert cache_control_ttl({"expires": formatdate(0, usegmt=True)}) == 0
+    assert 590 < cache_control_ttl({"expires": formatdate(time.time() + 600, usegmt=True)}) <= 600
+
+
+def test_ttl_for_follows_cache_control(tmp_path):
+    cache = ResponseCache(cache_dir=str(tmp_path))
+    assert cache._ttl_for("script", 200, {"cache-control": "max-age=120"}) == 120
+    assert cache._ttl_for("script", 200, {}) == 0
+    assert cache._ttl_for("script", 404, {"cache-control": "max-age=120"}) == 0
+    assert cache._ttl_for("script", 200, {"cache-control": "max-age=120", "set-cookie": "a=b"}) == 0
+    assert cache._ttl_for("script", 200, {"cache-control": "max-age=120", "vary": "Accept-Encoding"}) == 120
+    assert cache._ttl_for("script", 200, {"cache-control": "max-age=120", "vary": "Cookie"}) == 0
+
+
+def test_ttl_for_static_override_applies_to_static_assets_only(tmp_path):
+    cache = ResponseCache(cache_dir=str(tmp_path), static_ttl=3600)
+    assert cache._ttl_for("stylesheet", 200, {"cache-control": "no-cache"}) == 3600
+    assert cache._ttl_for("document", 200, {"cache-control": "max-age=60"}) == 60
+    assert cache._ttl_for("image", 200, {"cache-control": "no-store"}) == 0
+
+
+def test_ttl_for_ignoring_cache_control_uses_default_ttl(tmp_path):
+    cache = ResponseCache(cache_dir=str(tmp_path), respect_cache_control=False, default_ttl=42)
+    assert cache._ttl_for("fetch", 200, {"cache-control": "no-cache"}) == 42
+    assert cache._ttl_for("fetch", 200, {"cache-control": "private"}) == 0
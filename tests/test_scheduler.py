@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from mcp_server_browser_use._internal.utils.scheduler import AdmissionScheduler, SchedulerFullError
+
+
+async def admission_order(scheduler: AdmissionScheduler, runs):
+    """Queues runs (name, priority, slots) behind one holding the whole budget and returns the order they are admitted in."""
+    admitted = []
+    blocker = await scheduler.acquire("blocker", slots=scheduler.max_slots)
+
+    async def run(name, priority, slots):
+        admission = await scheduler.acquire(name, priority, slots)
+        admitted.append(name)
+        await asyncio.sleep(0)
+        scheduler.release(admission)
+
+    tasks = []
+    for name, priority, slots in runs:
+        tasks.append(asyncio.create_task(run(name, priority, slots)))
+        await asyncio.sleep(0) # Enqueue in order
+    scheduler.release(blocker)
+    await asyncio.gather(*tasks)
+    return admitted
+
+
+def test_higher_priority_first_then_fifo():
+    scheduler = AdmissionScheduler(max_slots=1)
+    order = asyncio.run(admission_order(scheduler, [("low-1", 0, 1), ("high", 5, 1), ("low-2", 0, 1), ("mid", 1, 1)]))
+    assert order == ["high", "mid", "low-1", "low-2"]
+    assert scheduler.stats()["used_slots"] == 0
+
+
+def test_smaller_runs_do_not_jump_the_head_of_the_queue():
+    async def scenario():
+        scheduler = AdmissionScheduler(max_slots=2)
+        holder = await scheduler.acquire("holder")
+        large = asyncio.create_task(scheduler.acquire("large", priority=5, slots=2))
+        small = asyncio.create_task(scheduler.acquire("small", priority=0, slots=1))
+        await asyncio.sleep(0)
+        assert not large.done() and not small.done() # One slot is free, but the large run is first in line
+        scheduler.release(holder)
+        scheduler.release(await large)
+        scheduler.release(await small)
+
+    asyncio.run(scenario())
+
+
+def test_runs_larger_than_the_budget_run_alone():
+    async def scenario():
+        scheduler = AdmissionScheduler(max_slots=2)
+        admission = await scheduler.acquire("research", slots=5)
+        assert admission.slots == 2
+        scheduler.release(admission)
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_rejects_new_runs():
+    async def scenario():
+        scheduler = AdmissionScheduler(max_slots=1, max_queue_depth=1)
+        holder = await scheduler.acquire("holder")
+        queued = asyncio.create_task(scheduler.acquire("queued"))
+        await asyncio.sleep(0)
+        with pytest.raises(SchedulerFullError):
+            await scheduler.acquire("rejected")
+        assert scheduler.rejected == 1
+        scheduler.release(holder)
+        scheduler.release(await queued)
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        scheduler = AdmissionScheduler(max_slots=1)
+        holder = await scheduler.acquire("holder")
+        cancelled = asyncio.create_task(scheduler.acquire("cancelled", priority=5))
+        queued = asyncio.create_task(scheduler.acquire("queued"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        assert [run["tool"] for run in scheduler.stats()["queued"]] == ["queued"]
+        scheduler.release(holder)
+        admission = await queued
+        assert admission.tool == "queued"
+        scheduler.release(admission)
+
+    asyncio.run(scenario())
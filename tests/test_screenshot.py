@@ -0,0 +1,142 @@
+import asyncio
+import base64
+import struct
+import zlib
+from types import SimpleNamespace
+
+import pytest
+
+from mcp_server_browser_use._internal.browser.screenshot import (
+    MAX_CONSECUTIVE_DUPLICATES,
+    ScreenshotPipeline,
+    difference_hash,
+    estimate_image_tokens,
+)
+
+
+def make_png(width: int, height: int, pixel, sub_filter: bool = False) -> bytes:
+    """An 8-bit RGB PNG of pixel(x, y) -> (r, g, b), with every row filtered as None or Sub."""
+    raw = bytearray()
+    for y in range(height):
+        line = [channel for x in range(width) for channel in pixel(x, y)]
+        if sub_filter:
+            raw.append(1)
+            raw.extend((value - (line[i - 3] if i >= 3 else 0)) & 0xFF for i, value in enumerate(line))
+        else:
+            raw.append(0)
+            raw.extend(line)
+
+    def chunk(kind: bytes, body: bytes) -> bytes:
+        return struct.pack(">I", len(body)) + kind + body + struct.pack(">I", zlib.crc32(kind + body))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(bytes(raw))) + chunk(b"IEND", b"")
+
+
+def gradient(x, y):
+    return (x * 4, x * 4, x * 4)
+
+
+def reverse_gradient(x, y):
+    return (255 - x * 4, 255 - x * 4, 255 - x * 4)
+
+
+class FakeCdpSession:
+    def __init__(self, page):
+        self.page = page
+
+    async def send(self, method, params):
+        self.page.requests.append(params)
+        if params["format"] == "png" and "clip" not in params:
+            return {"data": "A" * 4000} # Full-resolution PNG, measured once per run
+        if params["format"] == "png" and params["clip"]["scale"] < 0.5:
+            return {"data": base64.b64encode(self.page.thumbnails.pop(0)).decode()}
+        return {"data": "A" * 400}
+
+    async def detach(self):
+        pass
+
+
+class FakePage:
+    def __init__(self, thumbnails=None, dpr=2):
+        self.requests = []
+        self.thumbnails = list(thumbnails or [])
+        self.dpr = dpr
+        self.context = SimpleNamespace(new_cdp_session=self.new_cdp_session)
+
+    async def new_cdp_session(self, page):
+        return FakeCdpSession(self)
+
+    async def evaluate(self, expression):
+        return {"x": 0, "y": 300, "width": 1280, "height": 720, "windowWidth": 1280, "windowHeight": 720, "dpr": self.dpr}
+
+
+def capture(pipeline: ScreenshotPipeline, page: FakePage, frames: int = 1):
+    async def scenario():
+        return [await pipeline.capture(page) for _ in range(frames)]
+
+    return asyncio.run(scenario())
+
+
+def test_estimate_image_tokens_applies_the_long_edge_resize():
+    assert estimate_image_tokens(750, 100) == 100
+    assert estimate_image_tokens(3136, 1568) == estimate_image_tokens(1568, 784) == 1640
+    assert estimate_image_tokens(0, 100) == 0
+
+
+def test_difference_hash_decodes_filtered_rows():
+    assert difference_hash(make_png(64, 40, gradient)) == difference_hash(make_png(64, 40, gradient, sub_filter=True))
+    assert difference_hash(make_png(64, 40, gradient)) == 2**64 - 1 # Every cell brighter than its left neighbour
+    assert difference_hash(make_png(64, 40, reverse_gradient)) == 0
+    with pytest.raises(ValueError):
+        difference_hash(b"GIF89a")
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError, match="Unknown screenshot format"):
+        ScreenshotPipeline(image_format="avif")
+
+
+def test_frames_are_encoded_and_downscaled_in_the_browser():
+    pipeline = ScreenshotPipeline(image_format="jpeg", quality=150, max_width=1024)
+    page = FakePage()
+    capture(pipeline, page)
+    frame, full_png = page.requests
+    assert frame == {"format": "jpeg", "quality": 100, "clip": {"x": 0, "y": 300, "width": 1280, "height": 720, "scale": 0.4}}
+    assert full_png == {"format": "png"}
+    assert (pipeline.last_frame.mime_type, pipeline.last_frame.width, pipeline.last_frame.height) == ("image/jpeg", 1024, 576)
+    stats = pipeline.stats.snapshot()
+    assert stats["bytes_sent"] == 300 and stats["estimated_saved_bytes"] == 2700
+    assert stats["tokens_saved"] == estimate_image_tokens(2560, 1440) - estimate_image_tokens(1024, 576)
+
+
+def test_default_png_pipeline_is_inactive_and_needs_no_reference_capture():
+    pipeline = ScreenshotPipeline()
+    page = FakePage(dpr=1)
+    capture(pipeline, page)
+    assert not pipeline.active
+    assert len(page.requests) == 1 and "quality" not in page.requests[0]
+    assert pipeline.stats.snapshot()["estimated_saved_bytes"] == 0
+
+
+def test_dedupe_skips_frames_within_the_threshold():
+    unchanged, changed = make_png(64, 36, gradient), make_png(64, 36, reverse_gradient)
+    pipeline = ScreenshotPipeline(image_format="webp", dedupe=True, dedupe_threshold=2)
+    page = FakePage(thumbnails=[unchanged, unchanged, changed])
+    capture(pipeline, page, frames=3)
+    assert pipeline.last_frame.duplicate is False
+    stats = pipeline.stats
+    assert (stats.frames, stats.sent, stats.duplicates) == (3, 2, 1)
+    assert stats.duplicate_bytes == 300
+
+
+def test_unchanged_page_is_resent_after_max_consecutive_duplicates():
+    unchanged = make_png(64, 36, gradient)
+    pipeline = ScreenshotPipeline(dedupe=True)
+    frames = MAX_CONSECUTIVE_DUPLICATES + 2
+    page = FakePage(thumbnails=[unchanged] * frames)
+    capture(pipeline, page, frames=frames)
+    assert pipeline.stats.duplicates == MAX_CONSECUTIVE_DUPLICATES
+    assert pipeline.stats.sent == 2 and not pipeline.last_frame.duplicate
+    pipeline.reset_stats()
+    assert pipeline.stats.frames == 0 and pipeline.last_frame is None
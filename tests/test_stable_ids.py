@@ -0,0 +1,58 @@
+from browser_use.dom.views import DOMElementNode
+
+from mcp_server_browser_use._internal.browser.stable_ids import StableElementIds
+
+BODY = DOMElementNode(is_visible=True, parent=None, tag_name="body", xpath="body", attributes={}, children=[])
+
+
+def element(xpath: str, index: int) -> DOMElementNode:
+    return DOMElementNode(
+        is_visible=True, parent=BODY, tag_name=xpath.split("/")[-1].split("[")[0], xpath=xpath, attributes={}, children=[],
+        highlight_index=index,
+    )
+
+
+def capture(*xpaths: str):
+    return {index: element(xpath, index) for index, xpath in enumerate(xpaths)}
+
+
+def test_first_capture_keeps_browser_use_indices():
+    ids = StableElementIds()
+    selector_map = capture("div/a[1]", "div/a[2]")
+    assert ids.assign(selector_map, "https://example.com") == {}
+    assert {index: node.xpath for index, node in selector_map.items()} == {0: "div/a[1]", 1: "div/a[2]"}
+
+
+def test_inserted_element_does_not_shift_existing_ones():
+    ids = StableElementIds()
+    ids.assign(capture("div/a[1]", "div/a[2]"), "https://example.com")
+    selector_map = capture("ul/button", "div/a[1]", "div/a[2]") # A dropdown opened above the links
+    renames = ids.assign(selector_map, "https://example.com")
+    assert renames == {0: 2, 1: 0, 2: 1}
+    assert {index: node.xpath for index, node in selector_map.items()} == {0: "div/a[1]", 1: "div/a[2]", 2: "ul/button"}
+    assert all(node.highlight_index == index for index, node in selector_map.items())
+
+
+def test_removed_index_is_not_reused():
+    ids = StableElementIds()
+    ids.assign(capture("div/a[1]", "div/a[2]"), "https://example.com")
+    ids.assign(capture("div/a[2]"), "https://example.com")
+    selector_map = capture("div/a[2]", "div/a[3]")
+    ids.assign(selector_map, "https://example.com")
+    assert {index: node.xpath for index, node in selector_map.items()} == {1: "div/a[2]", 2: "div/a[3]"}
+
+
+def test_duplicate_keys_get_their_own_indices():
+    ids = StableElementIds()
+    ids.assign(capture("div/a", "div/a"), "https://example.com")
+    selector_map = capture("div/a", "div/a")
+    assert ids.assign(selector_map, "https://example.com") == {}
+    assert sorted(selector_map) == [0, 1]
+
+
+def test_indices_restart_on_navigation():
+    ids = StableElementIds()
+    ids.assign(capture("div/a[1]", "div/a[2]"), "https://example.com")
+    selector_map = capture("ul/button", "div/a[1]")
+    assert ids.assign(selector_map, "https://example.com/next") == {}
+    assert {index: node.xpath for index, node in selector_map.items()} == {0: "ul/button", 1: "div/a[1]"}
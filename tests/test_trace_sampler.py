@@ -0,0 +1,104 @@
+import asyncio
+import itertools
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from mcp_server_browser_use._internal.browser import trace_sampler
+from mcp_server_browser_use._internal.browser.trace_sampler import ContextTracer, sample_run
+
+
+class FakeTracing:
+    """Playwright's Tracing: every stop with a path writes what was recorded since the last start."""
+
+    def __init__(self):
+        self.calls = []
+
+    async def start(self, **options):
+        self.calls.append(("start", options))
+
+    async def start_chunk(self):
+        self.calls.append(("start_chunk",))
+
+    async def stop_chunk(self, path=None):
+        self.calls.append(("stop_chunk", path))
+        if path:
+            with open(path, "w") as f:
+                f.write("chunk")
+
+    async def stop(self, path=None):
+        self.calls.append(("stop", path))
+        if path:
+            with open(path, "w") as f:
+                f.write("trace")
+
+
+@pytest.fixture
+def context():
+    return SimpleNamespace(tracing=FakeTracing())
+
+
+@pytest.fixture(autouse=True)
+def run_counter(monkeypatch):
+    monkeypatch.setattr(trace_sampler, "_run_counter", itertools.count())
+
+
+def run(tracer: ContextTracer, context, steps: int, failed: bool, trace_id: str = "run"):
+    async def scenario():
+        await tracer.start(context, trace_id)
+        for _ in range(steps):
+            await tracer.checkpoint()
+        return await tracer.finish(failed)
+
+    return asyncio.run(scenario())
+
+
+def test_sample_run_keeps_one_in_n():
+    assert [sample_run(3) for _ in range(7)] == [True, False, False, True, False, False, True]
+    assert all(sample_run(1) for _ in range(3))
+
+
+def test_unknown_mode_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match="Unknown trace mode"):
+        ContextTracer(str(tmp_path), mode="never")
+
+
+def test_always_saves_a_full_trace_even_for_healthy_runs(tmp_path, context):
+    tracer = ContextTracer(str(tmp_path), mode="always")
+    assert run(tracer, context, steps=3, failed=False) == [str(tmp_path / "run.zip")]
+    assert context.tracing.calls[0] == ("start", {"screenshots": True, "snapshots": True, "sources": True})
+
+
+def test_sampled_mode_skips_runs_that_are_not_sampled(tmp_path, context):
+    tracer = ContextTracer(str(tmp_path), mode="sampled", sample_rate=2)
+    saved = [run(tracer, context, steps=1, failed=False, trace_id=f"run{i}") for i in range(4)]
+    assert saved == [[str(tmp_path / "run0.zip")], [], [str(tmp_path / "run2.zip")], []]
+    assert [call[0] for call in context.tracing.calls].count("start") == 2
+
+
+def test_on_failure_keeps_the_last_ring_size_chunks_of_a_failed_run(tmp_path, context):
+    tracer = ContextTracer(str(tmp_path), mode="on-failure", ring_size=3)
+    saved = run(tracer, context, steps=5, failed=True)
+    assert saved == [str(tmp_path / f"run-{index:02d}.zip") for index in range(3)]
+    assert all(os.path.exists(path) for path in saved)
+    assert sorted(os.listdir(tmp_path)) == ["run-00.zip", "run-01.zip", "run-02.zip"] # Ring directory removed
+    assert context.tracing.calls[0] == ("start", {"screenshots": True, "snapshots": True})
+
+
+def test_on_failure_discards_healthy_runs(tmp_path, context):
+    tracer = ContextTracer(str(tmp_path), mode="on-failure", ring_size=3)
+    assert run(tracer, context, steps=5, failed=False) == []
+    assert os.listdir(tmp_path) == []
+    assert context.tracing.calls[-2:] == [("stop_chunk", None), ("stop", None)]
+    assert not tracer.has_steps
+
+
+def test_failed_start_records_nothing(tmp_path):
+    async def broken_start(**options):
+        raise RuntimeError("Tracing has been already started")
+
+    context = SimpleNamespace(tracing=SimpleNamespace(start=broken_start))
+    tracer = ContextTracer(str(tmp_path), mode="on-failure")
+    assert run(tracer, context, steps=2, failed=True) == []
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,45 @@
+from mcp_server_browser_use._internal.agent.browser_use.trajectory_cache import Trajectory, start_domain, task_template
+
+
+def test_task_template_extracts_parameters_in_order():
+    template, params = task_template('Go to https://shop.example.com/p/1234 and add 2 "Blue Mug" to the cart, email bob@x.com.')
+    assert template == "go to {} and add {} {} to the cart, email {}."
+    assert params == ["https://shop.example.com/p/1234", "2", "Blue Mug", "bob@x.com"]
+
+
+def test_task_template_matches_tasks_that_differ_only_in_parameters():
+    first, _ = task_template("Find  the price of 'red shoes' on example.com")
+    second, _ = task_template("find the price of 'green hats' on example.com")
+    assert first == second
+
+
+def test_task_template_keeps_numbers_inside_words():
+    template, params = task_template("Open tab2 and compare 3 offers")
+    assert template == "open tab2 and compare {} offers"
+    assert params == ["3"]
+
+
+def test_start_domain():
+    assert start_domain("Open https://www.example.com/search?q=1 and search") == "example.com"
+    assert start_domain("Search shop.example.org for mugs, reply to bob@mail.com") == "shop.example.org"
+    assert start_domain("Search the web for mugs") == ""
+
+
+def test_substitute_replaces_whole_values_only():
+    trajectory = Trajectory(key="k", steps=[], substitutions=[("2", "5")])
+    assert trajectory.substitute("add 2 items") == "add 5 items"
+    assert trajectory.substitute("12 items, 2.5kg") == "12 items, 2.5kg"
+
+
+def test_substitute_leaves_numbers_inside_urls():
+    trajectory = Trajectory(key="k", steps=[], substitutions=[("Blue Mug", "Red Cup"), ("2", "5")])
+    action = {"go_to_url": {"url": "https://shop.example.com/p/1234/v2"}, "input_text": {"index": 2, "text": "Blue Mug x2, qty 2"}}
+    assert trajectory.substitute(action) == {
+        "go_to_url": {"url": "https://shop.example.com/p/1234/v2"},
+        "input_text": {"index": 2, "text": "Red Cup x2, qty 5"},
+    }
+
+
+def test_substitute_replaces_non_numeric_parameters_inside_urls():
+    trajectory = Trajectory(key="k", steps=[], substitutions=[("mugs", "cups"), ("2", "5")])
+    assert trajectory.substitute(["https://example.com/search?q=mugs&page=2"]) == ["https://example.com/search?q=cups&page=2"]